@@ -0,0 +1,43 @@
+from rest_framework import authentication, exceptions
+
+from .tokens import session_tokens, InvalidToken
+
+
+class TokenUser:
+    """
+    The caller behind a session token. Only the id is known; nothing is
+    read from the database, so views that need the User row fetch it.
+    """
+
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, claims):
+        self.id = self.pk = claims.user_id
+        self.claims = claims
+
+    def __str__(self):
+        return str(self.id)
+
+
+class SessionTokenAuthentication(authentication.BaseAuthentication):
+    """``Authorization: Bearer <token>`` with a token issued by ``auth/auth0/``."""
+
+    keyword = 'Bearer'
+
+    def authenticate(self, request):
+        header = authentication.get_authorization_header(request).split()
+        if not header or header[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(header) != 2:
+            raise exceptions.AuthenticationFailed('Invalid Authorization header.')
+        try:
+            claims = session_tokens.verify(header[1].decode('ascii'))
+        except UnicodeDecodeError:
+            raise exceptions.AuthenticationFailed('Malformed token.')
+        except InvalidToken as e:
+            raise exceptions.AuthenticationFailed(str(e))
+        return TokenUser(claims), claims
+
+    def authenticate_header(self, request):
+        return self.keyword
@@ -0,0 +1,335 @@
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import BigIntegerField, Case, IntegerField, Value, When
+from django.db.models.functions import Now
+from rest_framework import serializers
+
+from . import search, stats, transitions
+from .caching import invalidate_community
+from .events import publish_event
+from .membership import memberships
+from .models import User, Community, Join, JoinRequest, Posts, Offers, Requests, SearchDocument, ACCEPTED
+from .permissions import IsCommunityMember
+from .serializer import PostsSerializer, OffersSerializer
+
+
+class BatchError(Exception):
+    pass
+
+
+class _ItemSerializer(serializers.ModelSerializer):
+    # Plain ids instead of PrimaryKeyRelatedFields, which would look up the
+    # user and community once per item; create_many checks them in bulk.
+    user_id = serializers.UUIDField()
+    comm_id = serializers.IntegerField()
+
+
+class PostItemSerializer(_ItemSerializer):
+    class Meta:
+        model = Posts
+        fields = ('user_id', 'comm_id', 'text_content')
+
+
+class OfferItemSerializer(_ItemSerializer):
+    class Meta:
+        model = Offers
+        fields = ('user_id', 'comm_id', 'offer_type', 'title', 'description', 'status')
+
+
+class OfferStatusSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    status = serializers.IntegerField()
+    expected = serializers.IntegerField(required=False)
+
+
+class RequestStatusSerializer(OfferStatusSerializer):
+    offer_id = serializers.IntegerField()
+
+
+# Kind -> (model, item serializer, response serializer, event type).
+CREATES = {
+    SearchDocument.POST: (Posts, PostItemSerializer, PostsSerializer, 'post.created'),
+    SearchDocument.OFFER: (Offers, OfferItemSerializer, OffersSerializer, 'offer.created'),
+}
+
+
+def get_items(data):
+    items = data.get('items') if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        raise BatchError('Expected a non-empty "items" list.')
+    if len(items) > settings.BATCH_MAX_ITEMS:
+        raise BatchError(f'At most {settings.BATCH_MAX_ITEMS} items per batch.')
+    return items
+
+
+def _validate(serializer_class, items, results):
+    valid = []
+    for index, item in enumerate(items):
+        serializer = serializer_class(data=item)
+        if serializer.is_valid():
+            valid.append((index, serializer.validated_data))
+        else:
+            results[index] = {'code': 400, 'errors': serializer.errors}
+    return valid
+
+
+def _existing(model, ids):
+    return set(model.objects.filter(pk__in=ids).values_list('pk', flat=True)) if ids else set()
+
+
+def _missing(pk):
+    return [f'Invalid pk "{pk}" - object does not exist.']
+
+
+
+
+def create_many(kind, items, user_id=None):
+    """
+    Validate every item and insert the valid ones with one bulk INSERT in
+    one transaction. With ``user_id``, items must be that user's, in one of
+    their communities. Returns a result per item, in order: ``code`` 201
+    and the created row, ``code`` 400 and the errors, or ``code`` 403.
+    """
+    model, item_serializer, response_serializer, event = CREATES[kind]
+    results = [None] * len(items)
+    valid = _validate(item_serializer, items, results)
+    users = _existing(User, {data['user_id'] for _, data in valid})
+    communities = _existing(Community, {data['comm_id'] for _, data in valid})
+
+    pending = []
+    for index, data in valid:
+        errors = {}
+        if data['user_id'] not in users:
+            errors['user_id'] = _missing(data['user_id'])
+        if data['comm_id'] not in communities:
+            errors['comm_id'] = _missing(data['comm_id'])
+        if errors:
+            results[index] = {'code': 400, 'errors': errors}
+            continue
+        if user_id is not None and data['user_id'] != user_id:
+            results[index] = {'code': 403, 'error': 'You can only create rows as yourself.'}
+            continue
+        if user_id is not None and not memberships.is_member(user_id, data['comm_id']):
+            results[index] = {'code': 403, 'error': IsCommunityMember.message}
+            continue
+        values = {model._meta.get_field(name).attname: value for name, value in data.items()}
+        pending.append((index, model(**values)))
+    if not pending:
+        return results
+
+    with transaction.atomic():
+        # bulk_create sends no post_save, so index and invalidate here.
+        objects = model.objects.bulk_create([obj for _, obj in pending])
+        search.index_objects(kind, objects, created=True)
+        counts = defaultdict(Counter)
+        for obj in objects:
+            counts[obj.comm_id_id].update(stats.counted(obj))
+        for comm_id, deltas in counts.items():
+            stats.adjust(comm_id, **deltas)
+            invalidate_community(comm_id)
+        for (index, obj), data in zip(pending, response_serializer(objects, many=True).data):
+            results[index] = {'code': 201, 'data': data}
+            publish_event(obj.comm_id_id, event, data)
+    return results
+
+
+def _per_row(values, output_field):
+    distinct = set(values.values())
+    if len(distinct) == 1:
+        return Value(distinct.pop())
+    return Case(*[When(pk=pk, then=Value(value)) for pk, value in values.items()], output_field=output_field)
+
+
+def _status_updates(machine, serializer_class, items, not_found, results, columns=(), written=(), user_id=None):
+    """
+    Validate status items and check each against its row's current status,
+    and with ``user_id`` that the row is in one of that user's communities.
+    The rows stay locked until the caller's transaction ends, so the checks
+    still hold when the UPDATE runs. Items that leave the status alone
+    (see StatusMachine.is_noop) succeed without a write, or conflict when
+    they would change the ``written`` columns. Returns the items that may
+    go ahead and, for every row found, ``{id: {column: value}}`` with its
+    community, status, counted columns, ``columns`` and ``written``.
+    """
+    valid = []
+    seen = set()
+    for index, data in _validate(serializer_class, items, results):
+        if data['id'] in seen:
+            results[index] = {'id': data['id'], 'code': 400, 'error': 'Duplicate id in batch'}
+            continue
+        seen.add(data['id'])
+        valid.append((index, data))
+    rows = machine.model.objects.select_for_update().filter(pk__in=seen).values(
+        'id', 'comm_id', machine.field, *machine.counted, *columns, *written)
+    current = {row['id']: row for row in rows} if seen else {}
+    found = []
+    for index, data in valid:
+        row = current.get(data['id'])
+        if row is None:
+            results[index] = {'id': data['id'], 'code': 404, 'error': not_found}
+            continue
+        if user_id is not None and not memberships.is_member(user_id, row['comm_id']):
+            results[index] = {'id': data['id'], 'code': 403, 'error': IsCommunityMember.message}
+            continue
+        status = row[machine.field]
+        try:
+            allowed = machine.allowed(status, data['status'], data.get('expected'))
+        except transitions.InvalidTransition as e:
+            results[index] = {'id': data['id'], 'code': 400, 'error': str(e)}
+            continue
+        if allowed and machine.is_noop(status, data['status'], data.get('expected')):
+            differing = [name for name in written if row[name] != data[name]]
+            if differing:
+                results[index] = {'id': data['id'], 'code': 409, 'status': status,
+                                  'error': f'Status is already {status} with another {" and ".join(differing)}.'}
+            else:
+                results[index] = {'id': data['id'], 'code': 200}
+        elif allowed:
+            found.append((index, data))
+        else:
+            results[index] = {'id': data['id'], 'code': 409, 'error': f'Status is {status}.', 'status': status}
+    return found, current
+
+
+def _counter_deltas(machine, moves, current, written=()):
+    """Counter changes per community for ``moves``, which also set the ``written`` columns."""
+    deltas = defaultdict(Counter)
+    for _, data in moves:
+        before = current[data['id']]
+        after = {**before, machine.field: data['status'], **{name: data[name] for name in written}}
+        deltas[before['comm_id']][machine.counter] += machine.delta(before, after)
+    return deltas
+
+
+def _adjust_counters(deltas):
+    for comm_id, counts in deltas.items():
+        stats.adjust(comm_id, **counts)
+        invalidate_community(comm_id)
+
+
+def update_offer_statuses(items, user_id=None):
+    """
+    Set the status of many offers with a single UPDATE ... WHERE id IN.
+    With ``user_id``, only offers in that user's communities. Returns a
+    result per item: ``code`` 200 (also when the offer already had the
+    status), 400, 403, 404, or 409 when the offer's current status cannot
+    move to the new one.
+    """
+    results = [None] * len(items)
+    with transaction.atomic():
+        found, current = _status_updates(transitions.offer_statuses, OfferStatusSerializer, items,
+                                         'Offer not found', results, user_id=user_id)
+        if not found:
+            return results
+        statuses = {data['id']: data['status'] for _, data in found}
+        Offers.objects.filter(pk__in=statuses).update(status=_per_row(statuses, IntegerField()), updated_at=Now())
+        _adjust_counters(_counter_deltas(transitions.offer_statuses, found, current))
+        for index, data in found:
+            comm_id = current[data['id']]['comm_id']
+            publish_event(comm_id, 'offer.updated', {'id': data['id'], 'status': data['status']})
+            results[index] = {'id': data['id'], 'code': 200}
+    return results
+
+
+def update_request_statuses(items, user_id=None):
+    """
+    Set the status and offer of many requests with a single UPDATE ...
+    WHERE id IN. A request with an offer no longer counts as open, whatever
+    its status. With ``user_id``, only requests in that user's communities.
+    Returns a result per item: ``code`` 200, 400, 403, 404 or 409.
+    """
+    results = [None] * len(items)
+    with transaction.atomic():
+        found, current = _status_updates(transitions.request_statuses, RequestStatusSerializer, items,
+                                         'Request not found', results, written=('offer_id',), user_id=user_id)
+        offers = _existing(Offers, {data['offer_id'] for _, data in found})
+        updates = []
+        for index, data in found:
+            if data['offer_id'] in offers:
+                updates.append((index, data))
+            else:
+                results[index] = {'id': data['id'], 'code': 404, 'error': 'Offer not found'}
+        if not updates:
+            return results
+        statuses = {data['id']: data['status'] for _, data in updates}
+        offer_ids = {data['id']: data['offer_id'] for _, data in updates}
+        Requests.objects.filter(pk__in=statuses).update(
+            status=_per_row(statuses, IntegerField()), offer_id=_per_row(offer_ids, BigIntegerField()),
+            updated_at=Now(),
+        )
+        _adjust_counters(_counter_deltas(transitions.request_statuses, updates, current, written=('offer_id',)))
+        for index, data in updates:
+            comm_id = current[data['id']]['comm_id']
+            publish_event(comm_id, 'request.updated',
+                          {'id': data['id'], 'status': data['status'], 'offer_id': data['offer_id']})
+            results[index] = {'id': data['id'], 'code': 200}
+    return results
+
+
+def _add_members(pairs):
+    """
+    Join every ``(comm_id, user_id)`` in ``pairs`` that isn't a member yet,
+    with one bulk INSERT. Returns the pairs that were added.
+    """
+    if not pairs:
+        return set()
+    existing = Join.objects.filter(comm_id__in={comm_id for comm_id, _ in pairs},
+                                   user_id__in={user_id for _, user_id in pairs})
+    added = pairs - set(existing.values_list('comm_id', 'user_id'))
+    # bulk_create sends no post_save, so forget the memberships here.
+    Join.objects.bulk_create([Join(comm_id_id=comm_id, user_id_id=user_id, referral_code='0')
+                              for comm_id, user_id in added])
+    memberships.invalidate(*{user_id for _, user_id in added})
+    return added
+
+
+def review_join_requests(items, admin_id=None):
+    """
+    Accept or decline many join requests with a single UPDATE ... WHERE id
+    IN, and add the accepted members with one bulk INSERT in the same
+    transaction; members already in the community are skipped. With
+    ``admin_id`` only that admin's requests may be reviewed. Returns a
+    result per item: ``code`` 200 with whether a member was ``joined``
+    (also for a repeat of an earlier review), 400, 403, 404, or 409 when
+    the request was settled the other way.
+    """
+    machine = transitions.join_request_statuses
+    results = [None] * len(items)
+    with transaction.atomic():
+        found, current = _status_updates(machine, OfferStatusSerializer, items, 'Join request not found', results,
+                                         columns=('member_id', 'admin_id'))
+        for index, result in enumerate(results):
+            # Already reviewed the same way, so nobody joins this time.
+            if result is None or result['code'] != 200:
+                continue
+            if admin_id is None or current[result['id']]['admin_id'] == admin_id:
+                result['joined'] = False
+            else:
+                results[index] = {'id': result['id'], 'code': 403, 'error': 'Not the admin of this join request'}
+        reviews = []
+        for index, data in found:
+            if admin_id is None or current[data['id']]['admin_id'] == admin_id:
+                reviews.append((index, data))
+            else:
+                results[index] = {'id': data['id'], 'code': 403, 'error': 'Not the admin of this join request'}
+        if not reviews:
+            return results
+        statuses = {data['id']: data['status'] for _, data in reviews}
+        JoinRequest.objects.filter(pk__in=statuses).update(
+            accepted=_per_row(statuses, IntegerField()), updated_at=Now())
+        members = {data['id']: (current[data['id']]['comm_id'], current[data['id']]['member_id'])
+                   for _, data in reviews}
+        added = _add_members({members[data['id']] for _, data in reviews if data['status'] == ACCEPTED})
+
+        deltas = _counter_deltas(machine, reviews, current)
+        for comm_id, _ in added:
+            deltas[comm_id]['members'] += 1
+        _adjust_counters(deltas)
+
+        for index, data in reviews:
+            member = members[data['id']]
+            results[index] = {'id': data['id'], 'code': 200, 'joined': member in added}
+            added.discard(member)
+    return results
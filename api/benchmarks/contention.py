@@ -0,0 +1,86 @@
+import threading
+import time
+from collections import Counter
+
+from django.db import connections
+from django.test import Client
+
+from api import transitions
+from api.models import Offers
+
+
+def _conditional_accept(offer_id):
+    # Accepting an accepted offer again is a no-op that succeeds, so each
+    # acceptor says the offer must still be open.
+    return Client().put(
+        f'/api/update_offer_status/{offer_id}/{transitions.ACCEPTED}?expected={transitions.OPEN}').status_code
+
+
+def _read_check_save_accept(offer_id):
+    # The shape of the old update_offer_status, plus the status check a
+    # client would do first: read the row, decide, save the whole row.
+    offer = Offers.objects.get(id=offer_id)
+    if offer.status != transitions.OPEN:
+        return 409
+    offer.status = transitions.ACCEPTED
+    offer.save()
+    return 200
+
+
+# Name -> accept(offer_id) returning an HTTP-style status code.
+STRATEGIES = {
+    'conditional-update': _conditional_accept,
+    'read-check-save': _read_check_save_accept,
+}
+
+
+class RaceResult:
+    def __init__(self, strategy, acceptors, wins, codes, elapsed):
+        self.strategy = strategy
+        self.acceptors = acceptors
+        self.wins = wins
+        self.codes = codes
+        self.elapsed = elapsed
+
+    @property
+    def offers(self):
+        return len(self.wins)
+
+    @property
+    def lost_updates(self):
+        """Acceptances that were reported as successful but overwritten by another."""
+        return sum(max(0, count - 1) for count in self.wins)
+
+
+def race(strategy, offer_ids, acceptors):
+    """
+    For each offer, release ``acceptors`` threads at once to accept it and
+    count how many were told they won. Exactly one should be.
+    """
+    accept = STRATEGIES[strategy]
+    wins, codes = [], Counter()
+    start = time.perf_counter()
+    for offer_id in offer_ids:
+        barrier = threading.Barrier(acceptors)
+        results = []
+        lock = threading.Lock()
+
+        def acceptor():
+            try:
+                barrier.wait()
+                code = accept(offer_id)
+            except Exception as e:
+                code = type(e).__name__
+            finally:
+                connections.close_all()
+            with lock:
+                results.append(code)
+
+        threads = [threading.Thread(target=acceptor) for _ in range(acceptors)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wins.append(results.count(200))
+        codes.update(results)
+    return RaceResult(strategy, acceptors, wins, codes, time.perf_counter() - start)
@@ -0,0 +1,152 @@
+import random
+import uuid
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+
+from api import clusters, geo, search, stats
+from api.models import User, Profile, Community, Join, JoinRequest, Posts, Offers, Requests
+
+WORDS = [
+    'drill', 'ladder', 'babysitter', 'plumber', 'carpool', 'garden', 'books', 'cycle',
+    'tutor', 'groceries', 'dog', 'walk', 'party', 'chairs', 'projector', 'tent',
+    'repair', 'laptop', 'cooking', 'festival', 'parking', 'water', 'power', 'cleanup',
+]
+PROFESSIONS = ['engineer', 'teacher', 'doctor', 'artist', 'student', 'retired', 'chef']
+BATCH_SIZE = 1000
+
+
+class Dataset:
+    def __init__(self):
+        self.users = []
+        self.communities = []
+        self.members = {}
+        self.admins = {}
+        self.offers = {}
+        self.requests = {}
+        self.join_requests = {}
+        # (kind, id) -> status the benchmarks last moved a row to.
+        self.statuses = {}
+        # Request id -> offer the benchmarks last gave it.
+        self.request_offers = {}
+
+
+def _sentence(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+def generate(communities=10, users=200, members=40, posts=100, offers=50, requests=50,
+             join_requests=10, seed=0, center=(12.9716, 77.5946), spread_km=20):
+    """
+    Seed the current database with a reproducible neighbourhood: ``users``
+    users with profiles spread over ``communities`` communities of about
+    ``members`` members each, and the given number of posts, offers,
+    requests and pending join requests per community.
+    """
+    rng = random.Random(seed)
+    dataset = Dataset()
+
+    user_rows = [User(id=uuid.UUID(int=rng.getrandbits(128), version=4), email=f'user{i}@bench.neighborly')
+                 for i in range(users)]
+    User.objects.bulk_create(user_rows, batch_size=BATCH_SIZE)
+    dataset.users = [user.id for user in user_rows]
+    Profile.objects.bulk_create([
+        Profile(uuid_id=user.id, email=user.email, name=f'Neighbour {i}', age=rng.randint(18, 80),
+                pno=f'{rng.randint(6000000000, 9999999999)}', profession=rng.choice(PROFESSIONS),
+                user_code=f'N{i:06d}')
+        for i, user in enumerate(user_rows)
+    ], batch_size=BATCH_SIZE)
+
+    spread = spread_km / geo.KM_PER_DEGREE
+    community_rows = []
+    for i in range(communities):
+        latitude = center[0] + rng.uniform(-spread, spread)
+        longtitude = center[1] + rng.uniform(-spread, spread)
+        community_rows.append(Community(
+            comm_name=f'Society {i}', admin_id_id=rng.choice(dataset.users), location=f'Block {i}',
+            latitude=latitude, longtitude=longtitude, geohash=geo.encode(latitude, longtitude),
+        ))
+    Community.objects.bulk_create(community_rows, batch_size=BATCH_SIZE)
+    community_rows = list(Community.objects.order_by('id'))
+    dataset.communities = [community.id for community in community_rows]
+
+    joins = []
+    for community in community_rows:
+        admin = community.admin_id_id
+        others = rng.sample([user for user in dataset.users if user != admin], min(members, users - 1))
+        dataset.admins[community.id] = admin
+        dataset.members[community.id] = [admin] + others
+        joins.append(Join(comm_id_id=community.id, user_id_id=admin, referral_code='0', is_admin=1))
+        joins.extend(Join(comm_id_id=community.id, user_id_id=user, referral_code='0') for user in others)
+    Join.objects.bulk_create(joins, batch_size=BATCH_SIZE)
+
+    start = date.today() - timedelta(days=365)
+    post_rows, offer_rows, request_rows, join_request_rows = [], [], [], []
+    for comm_id in dataset.communities:
+        community_members = dataset.members[comm_id]
+        for _ in range(posts):
+            post_rows.append(Posts(user_id_id=rng.choice(community_members), comm_id_id=comm_id,
+                                   text_content=_sentence(rng, 12)))
+        for _ in range(offers):
+            offer_rows.append(Offers(user_id_id=rng.choice(community_members), comm_id_id=comm_id,
+                                     offer_type=rng.choice(['lend', 'give', 'help']), title=_sentence(rng, 3),
+                                     description=_sentence(rng, 20)))
+        for _ in range(requests):
+            from_date = start + timedelta(days=rng.randint(0, 365))
+            from_hour = rng.randint(6, 20)
+            request_rows.append(Requests(
+                user_id_id=rng.choice(community_members), comm_id_id=comm_id,
+                request_type=rng.choice(['borrow', 'help']), title=_sentence(rng, 3),
+                description=_sentence(rng, 20), from_date=from_date,
+                to_date=from_date + timedelta(days=rng.randint(0, 7)),
+                from_time=time(from_hour), to_time=time(min(from_hour + rng.randint(1, 3), 23)),
+            ))
+        member_set = set(community_members)
+        outsiders = [user for user in dataset.users if user not in member_set]
+        for user in rng.sample(outsiders, min(join_requests, len(outsiders))):
+            join_request_rows.append(JoinRequest(admin_id_id=dataset.admins[comm_id], member_id_id=user,
+                                                 comm_id_id=comm_id))
+
+    Posts.objects.bulk_create(post_rows, batch_size=BATCH_SIZE)
+    Offers.objects.bulk_create(offer_rows, batch_size=BATCH_SIZE)
+    Requests.objects.bulk_create(request_rows, batch_size=BATCH_SIZE)
+    JoinRequest.objects.bulk_create(join_request_rows, batch_size=BATCH_SIZE)
+
+    # Post dates and times are auto_now_add; spread them out afterwards so
+    # keyset pagination sees a realistic history.
+    post_history = list(Posts.objects.only('id'))
+    for post in post_history:
+        post.date = start + timedelta(days=rng.randint(0, 365))
+        post.time = time(rng.randint(0, 23), rng.randint(0, 59), rng.randint(0, 59))
+        post.created_at = post.updated_at = datetime.combine(post.date, post.time, tzinfo=dt_timezone.utc)
+    Posts.objects.bulk_update(post_history, ['date', 'time', 'created_at', 'updated_at'], batch_size=BATCH_SIZE)
+    # bulk_create skips the signals that keep the search index current.
+    search.rebuild(batch_size=BATCH_SIZE)
+    stats.reconcile(dataset.communities)
+    clusters.rebuild()
+
+    for comm_id, offer_id in Offers.objects.values_list('comm_id', 'id'):
+        dataset.offers.setdefault(comm_id, []).append(offer_id)
+    for comm_id, request_id in Requests.objects.values_list('comm_id', 'id'):
+        dataset.requests.setdefault(comm_id, []).append(request_id)
+    for comm_id, join_request_id in JoinRequest.objects.values_list('comm_id', 'id'):
+        dataset.join_requests.setdefault(comm_id, []).append(join_request_id)
+    return dataset
+
+
+def login_token(email='bench@login.neighborly'):
+    """
+    An RS256 ID token signed by a throwaway key, and the JWKS that verifies
+    it, so logins can be exercised without Auth0.
+    """
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    from django.conf import settings
+    from jose import jwk, jwt
+
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = private_key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                    serialization.NoEncryption())
+    public_jwk = jwk.construct(pem, 'RS256').public_key().to_dict()
+    public_jwk.update(kid='bench', use='sig')
+    claims = {'email': email, 'iss': f'https://{settings.AUTH0_DOMAIN}/', 'exp': int(datetime.now().timestamp()) + 3600}
+    token = jwt.encode(claims, pem, algorithm='RS256', headers={'kid': 'bench'})
+    return token, {'keys': [public_jwk]}
@@ -0,0 +1,374 @@
+import itertools
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from api import stats, transitions
+from api.models import JoinRequest
+from api.profiles import profile_cache
+
+from .data import WORDS
+
+
+class Budget:
+    def __init__(self, queries, p95_ms):
+        self.queries = queries
+        self.p95_ms = p95_ms
+
+
+class Endpoint:
+    """
+    One route from api/urls.py. ``build`` takes the dataset, a random
+    generator and a counter and returns ``(path, body)``.
+    """
+
+    def __init__(self, name, method, build, budget, status=200):
+        self.name = name
+        self.method = method
+        self.build = build
+        self.budget = budget
+        self.status = status
+
+
+class Result:
+    def __init__(self, endpoint, latencies, queries, elapsed, failures):
+        self.endpoint = endpoint
+        self.latencies = sorted(latencies)
+        self.queries = queries
+        self.elapsed = elapsed
+        self.failures = failures
+
+    def percentile(self, pct):
+        if not self.latencies:
+            return 0.0
+        index = min(len(self.latencies) - 1, int(round(pct / 100 * (len(self.latencies) - 1))))
+        return self.latencies[index]
+
+    @property
+    def throughput(self):
+        return len(self.latencies) / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def max_queries(self):
+        return max(self.queries, default=0)
+
+    def violations(self, budget_scale=1.0):
+        budget = self.endpoint.budget
+        problems = []
+        if self.failures:
+            problems.append(f'{self.failures} unexpected responses')
+        if budget.queries is not None and self.max_queries > budget.queries:
+            problems.append(f'{self.max_queries} queries > budget {budget.queries}')
+        if budget.p95_ms is not None and self.percentile(95) > budget.p95_ms * budget_scale:
+            problems.append(f'p95 {self.percentile(95):.1f}ms > budget {budget.p95_ms * budget_scale:.0f}ms')
+        return problems
+
+
+def _community(data, rng):
+    return rng.choice(data.communities)
+
+
+def _member(data, rng, comm_id):
+    return rng.choice(data.members[comm_id])
+
+
+def _get_posts(data, rng, n):
+    return f'/api/get_posts/{_community(data, rng)}', None
+
+
+def _get_posts_page(data, rng, n):
+    return f'/api/get_posts/{_community(data, rng)}?page_size=20', None
+
+
+def _get_offers(data, rng, n):
+    return f'/api/get_offers/{_community(data, rng)}', None
+
+
+def _get_offers_for_user(data, rng, n):
+    comm_id = _community(data, rng)
+    return f'/api/get_offers_for_user/{_member(data, rng, comm_id)}/{comm_id}', None
+
+
+def _view_public_requests(data, rng, n):
+    return f'/api/view_public_requests/{_community(data, rng)}', None
+
+
+def _view_user_requests(data, rng, n):
+    comm_id = _community(data, rng)
+    return f'/api/view_user_requests/{comm_id}/{_member(data, rng, comm_id)}', None
+
+
+def _view_request_from_neighbours(data, rng, n):
+    return f'/api/view_request_from_neighbours/{rng.choice(data.offers[_community(data, rng)])}', None
+
+
+def _view_join_requests(data, rng, n):
+    comm_id = _community(data, rng)
+    return f'/api/view_join_requests/{comm_id}/{data.admins[comm_id]}', None
+
+
+def _get_user_communities(data, rng, n):
+    return f'/api/get_user_communities/{rng.choice(data.users)}', None
+
+
+def _community_summary(data, rng, n):
+    return f'/api/community_summary/{_community(data, rng)}', None
+
+
+def _dashboard(data, rng, n):
+    comm_id = _community(data, rng)
+    return f'/api/dashboard/{comm_id}?user_id={data.admins[comm_id]}', None
+
+
+def _home_feed(data, rng, n):
+    return f'/api/home_feed/{_member(data, rng, _community(data, rng))}', None
+
+
+def _get_profile(data, rng, n):
+    return f'/api/get_profile/{rng.choice(data.users)}', None
+
+
+def _get_communities(data, rng, n):
+    return f'/api/get_communities/{12.9716 + rng.uniform(-0.1, 0.1)}/{77.5946 + rng.uniform(-0.1, 0.1)}?radius=5', None
+
+
+def _get_community_map(data, rng, n):
+    # A city-wide view, clustered.
+    lat, lon = 12.9716 + rng.uniform(-0.1, 0.1), 77.5946 + rng.uniform(-0.1, 0.1)
+    return f'/api/get_community_map/10/{lat - 0.3}/{lon - 0.3}/{lat + 0.3}/{lon + 0.3}', None
+
+
+def _get_community_map_zoomed(data, rng, n):
+    lat, lon = 12.9716 + rng.uniform(-0.1, 0.1), 77.5946 + rng.uniform(-0.1, 0.1)
+    return f'/api/get_community_map/16/{lat - 0.02}/{lon - 0.02}/{lat + 0.02}/{lon + 0.02}', None
+
+
+def _search(data, rng, n):
+    return f'/api/search/{_community(data, rng)}?q={rng.choice(WORDS)}', None
+
+
+def _sync(data, rng, n):
+    return f'/api/sync/{_community(data, rng)}', None
+
+
+def _create_profile(data, rng, n):
+    return '/api/create_profile', {
+        'uuid': str(rng.choice(data.users)), 'email': f'bench{n}@profile.neighborly', 'name': f'Bench {n}',
+        'age': 30, 'pno': '9000000000', 'profession': 'tester', 'user_code': f'B{n}',
+    }
+
+
+def _create_community(data, rng, n):
+    user_id = rng.choice(data.users)
+    return f'/api/create_community/{user_id}', {
+        'comm_name': f'Bench {n}', 'admin_id': str(user_id), 'location': 'Bench',
+        'latitude': 12.9716 + rng.uniform(-0.1, 0.1), 'longtitude': 77.5946 + rng.uniform(-0.1, 0.1),
+    }
+
+
+def _create_join(data, rng, n):
+    return '/api/create_join', {
+        'comm_id': _community(data, rng), 'user_id': str(rng.choice(data.users)), 'referral_code': '0',
+    }
+
+
+def _create_post(data, rng, n):
+    comm_id = _community(data, rng)
+    return '/api/create_post', {
+        'comm_id': comm_id, 'user_id': str(_member(data, rng, comm_id)), 'text_content': f'Bench post {n}',
+    }
+
+
+def _create_offer(data, rng, n):
+    comm_id = _community(data, rng)
+    return '/api/create_offer', {
+        'comm_id': comm_id, 'user_id': str(_member(data, rng, comm_id)), 'offer_type': 'lend',
+        'title': f'Bench offer {n}', 'description': 'Benchmark offer',
+    }
+
+
+def _create_request(data, rng, n):
+    comm_id = _community(data, rng)
+    return '/api/create_request', {
+        'comm_id': comm_id, 'user_id': str(_member(data, rng, comm_id)), 'request_type': 'borrow',
+        'title': f'Bench request {n}', 'description': 'Benchmark request',
+        'from_date': '2025-01-01', 'to_date': '2025-01-02', 'from_time': '10:00', 'to_time': '11:00',
+    }
+
+
+def _send_join_request(data, rng, n):
+    comm_id = _community(data, rng)
+    return '/api/send_join_request', {
+        'comm_id': comm_id, 'admin_id': str(data.admins[comm_id]), 'member_id': str(rng.choice(data.users)),
+    }
+
+
+STATUS_MACHINES = {'offer': transitions.offer_statuses, 'request': transitions.request_statuses}
+
+
+def _next_status(data, rng, kind, pk, repeat=True):
+    # Seeded rows are open. Pick any move the status table allows, or the
+    # current status again when that is a no-op, as when the app declines a
+    # second neighbour; both have to succeed.
+    machine = STATUS_MACHINES[kind]
+    current = data.statuses.get((kind, pk), transitions.OPEN)
+    repeats = {current} if repeat and machine.is_noop(current, current) else set()
+    data.statuses[kind, pk] = rng.choice(sorted(machine.transitions.get(current, set()) | repeats))
+    return data.statuses[kind, pk]
+
+
+def _request_move(data, rng, comm_id, request_id):
+    # A request keeps its offer while its status stays; moves pick a new
+    # one. Seeded requests have none, so their first write has to move.
+    before = data.statuses.get(('request', request_id), transitions.OPEN)
+    status = _next_status(data, rng, 'request', request_id, repeat=request_id in data.request_offers)
+    if status != before:
+        data.request_offers[request_id] = rng.choice(data.offers[comm_id])
+    return status, data.request_offers[request_id]
+
+
+def _update_offer_status(data, rng, n):
+    offer_id = rng.choice(data.offers[_community(data, rng)])
+    return f'/api/update_offer_status/{offer_id}/{_next_status(data, rng, "offer", offer_id)}', None
+
+
+def _update_request_status(data, rng, n):
+    comm_id = _community(data, rng)
+    request_id = rng.choice(data.requests[comm_id])
+    status, offer_id = _request_move(data, rng, comm_id, request_id)
+    return f'/api/update_request_status/{request_id}/{status}/{offer_id}', None
+
+
+BATCH_ITEMS = 20
+
+
+def _batch_create_posts(data, rng, n):
+    comm_id = _community(data, rng)
+    return '/api/batch/create_posts', {'items': [
+        {'comm_id': comm_id, 'user_id': str(_member(data, rng, comm_id)), 'text_content': f'Bench post {n}.{i}'}
+        for i in range(BATCH_ITEMS)
+    ]}
+
+
+def _batch_update_offer_status(data, rng, n):
+    offers = rng.sample(data.offers[_community(data, rng)], BATCH_ITEMS)
+    return '/api/batch/update_offer_status', {'items': [
+        {'id': offer_id, 'status': _next_status(data, rng, 'offer', offer_id)} for offer_id in offers
+    ]}
+
+
+def _batch_update_request_status(data, rng, n):
+    comm_id = _community(data, rng)
+    items = []
+    for request_id in rng.sample(data.requests[comm_id], BATCH_ITEMS):
+        status, offer_id = _request_move(data, rng, comm_id, request_id)
+        items.append({'id': request_id, 'status': status, 'offer_id': offer_id})
+    return '/api/batch/update_request_status', {'items': items}
+
+
+def _batch_review_join_requests(data, rng, n):
+    # Settled join requests can't be reviewed again, so every call gets
+    # fresh pending ones; half are accepted, some from existing members.
+    comm_id = _community(data, rng)
+    join_requests = JoinRequest.objects.bulk_create([
+        JoinRequest(admin_id_id=data.admins[comm_id], member_id_id=user, comm_id_id=comm_id)
+        for user in rng.sample(data.users, BATCH_ITEMS)
+    ])
+    stats.adjust(comm_id, pending_join_requests=len(join_requests))
+    return '/api/batch/review_join_requests', {'items': [
+        {'id': join_request.id, 'status': transitions.ACCEPTED if i % 2 else transitions.DECLINED}
+        for i, join_request in enumerate(join_requests)
+    ]}
+
+
+def _auth0_login(data, rng, n):
+    return '/api/auth/auth0/', {'id_token': data.id_token}
+
+
+ENDPOINTS = [
+    Endpoint('get_posts', 'get', _get_posts, Budget(1, 50)),
+    Endpoint('get_posts_page', 'get', _get_posts_page, Budget(1, 50)),
+    Endpoint('get_offers', 'get', _get_offers, Budget(2, 50)),
+    Endpoint('get_offers_for_user', 'get', _get_offers_for_user, Budget(2, 50)),
+    Endpoint('view_public_requests', 'get', _view_public_requests, Budget(2, 50)),
+    Endpoint('view_user_requests', 'get', _view_user_requests, Budget(2, 50)),
+    Endpoint('view_request_from_neighbours', 'get', _view_request_from_neighbours, Budget(2, 50)),
+    Endpoint('view_join_requests', 'get', _view_join_requests, Budget(2, 50)),
+    # Memberships joined to their community and its counters.
+    Endpoint('get_user_communities', 'get', _get_user_communities, Budget(1, 50)),
+    Endpoint('community_summary', 'get', _community_summary, Budget(1, 20)),
+    # Community with counters, five listings, one profile lookup for all of them.
+    Endpoint('dashboard', 'get', _dashboard, Budget(7, 100)),
+    # Memberships (cached after the first call), one query per kind, profiles.
+    Endpoint('home_feed', 'get', _home_feed, Budget(5, 50)),
+    Endpoint('get_profile', 'get', _get_profile, Budget(1, 20)),
+    Endpoint('get_communities', 'get', _get_communities, Budget(1, 50)),
+    # Zoomed out: stored cells by primary key. Zoomed in: communities in the box.
+    Endpoint('get_community_map', 'get', _get_community_map, Budget(1, 20)),
+    Endpoint('get_community_map_zoomed', 'get', _get_community_map_zoomed, Budget(1, 50)),
+    # Term frequencies, document count, ranking, documents, profiles.
+    Endpoint('search', 'get', _search, Budget(5, 50)),
+    # A first sync: the whole community, one query per kind plus profiles.
+    Endpoint('sync', 'get', _sync, Budget(4, 100)),
+    # Writes that change a community's counters run in a transaction, and
+    # SQLite counts its BEGIN and COMMIT as queries.
+    # Profiles also look up the user's communities to invalidate their listings.
+    Endpoint('create_profile', 'post', _create_profile, Budget(4, 50), status=201),
+    # Also adds the community to its map cells: one INSERT and one UPDATE.
+    Endpoint('create_community', 'post', _create_community, Budget(11, 50), status=201),
+    Endpoint('create_join', 'post', _create_join, Budget(6, 50), status=201),
+    # Creates also write the search document and its terms in one transaction.
+    Endpoint('create_post', 'post', _create_post, Budget(7, 50), status=201),
+    Endpoint('create_offer', 'post', _create_offer, Budget(8, 50), status=201),
+    Endpoint('create_request', 'post', _create_request, Budget(8, 50), status=201),
+    Endpoint('send_join_request', 'post', _send_join_request, Budget(7, 50), status=201),
+    # A conditional UPDATE, the community id and its counter UPDATE.
+    Endpoint('update_offer_status', 'put', _update_offer_status, Budget(5, 50)),
+    Endpoint('update_request_status', 'put', _update_request_status, Budget(5, 50)),
+    # Batches of BATCH_ITEMS: the query count does not grow with the batch.
+    Endpoint('batch_create_posts', 'post', _batch_create_posts, Budget(9, 100)),
+    Endpoint('batch_update_offer_status', 'post', _batch_update_offer_status, Budget(5, 50)),
+    Endpoint('batch_update_request_status', 'post', _batch_update_request_status, Budget(6, 50)),
+    # Lock, UPDATE, existing members, bulk INSERT of Joins, counters.
+    Endpoint('batch_review_join_requests', 'post', _batch_review_join_requests, Budget(7, 50)),
+    Endpoint('auth0_login', 'post', _auth0_login, Budget(2, 50)),
+]
+
+
+def run_endpoint(endpoint, data, rng, iterations, warmup=3, cold_cache=True):
+    """
+    Drive ``endpoint`` through the test client. With ``cold_cache`` the
+    response and profile caches are cleared before every call so budgets
+    describe the work a cache miss costs.
+    """
+    client = Client()
+    response_cache = caches[settings.RESPONSE_CACHE_ALIAS]
+    counter = itertools.count()
+    latencies, queries = [], []
+    failures = 0
+    elapsed = 0.0
+    for i in range(warmup + iterations):
+        path, body = endpoint.build(data, rng, next(counter))
+        if cold_cache:
+            response_cache.clear()
+            profile_cache.clear()
+        call = getattr(client, endpoint.method)
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            if body is None:
+                response = call(path)
+            else:
+                response = call(path, body, content_type='application/json')
+            duration = time.perf_counter() - start
+        if i < warmup:
+            continue
+        elapsed += duration
+        latencies.append(duration * 1000)
+        queries.append(len(captured))
+        if response.status_code != endpoint.status:
+            failures += 1
+    return Result(endpoint, latencies, queries, elapsed, failures)
@@ -0,0 +1,77 @@
+import time
+
+from rest_framework.renderers import JSONRenderer
+
+from api.enrichment import (format_posts, format_offers, format_requests,
+                            POST_COLUMNS, OFFER_COLUMNS, REQUEST_COLUMNS)
+from api.models import Posts, Offers, Requests
+from api.renderers import FastJSONRenderer, MessagePackRenderer, orjson
+from api.serializer import PostsSerializer, OffersSerializer, RequestsSerializer
+
+# (queryset, ordering, serializer, .values() columns, formatter) per listing.
+LISTINGS = {
+    'posts': (Posts.objects.all(), ('-date', '-time', '-id'), PostsSerializer, POST_COLUMNS, format_posts),
+    'offers': (Offers.objects.all(), ('-id',), OffersSerializer, OFFER_COLUMNS, format_offers),
+    'requests': (Requests.objects.all(), ('-id',), RequestsSerializer, REQUEST_COLUMNS, format_requests),
+}
+
+
+def _serializer_rows(listing, rows):
+    queryset, ordering, serializer, _, formatter = LISTINGS[listing]
+    data = serializer(queryset.order_by(*ordering)[:rows], many=True).data
+    # get_posts returned serializer output as is; the others reformatted it.
+    return data if formatter is format_posts else formatter(data)
+
+
+def _values_rows(listing, rows):
+    queryset, ordering, _, columns, formatter = LISTINGS[listing]
+    return formatter(queryset.order_by(*ordering).values(*columns)[:rows])
+
+
+# (name, build, renderer): the first is the path the list views used before.
+PATHS = [
+    ('serializer+json', _serializer_rows, JSONRenderer()),
+    ('values+json', _values_rows, JSONRenderer()),
+    ('values+fastjson', _values_rows, FastJSONRenderer()),
+    ('values+msgpack', _values_rows, MessagePackRenderer()),
+]
+
+
+class Measurement:
+    def __init__(self, listing, path, rows, size, cpu_seconds, iterations):
+        self.listing = listing
+        self.path = path
+        self.rows = rows
+        self.size = size
+        self.cpu_seconds = cpu_seconds
+        self.iterations = iterations
+
+    @property
+    def bytes_per_1000(self):
+        return self.size * 1000 / self.rows if self.rows else 0
+
+    @property
+    def cpu_ms_per_1000(self):
+        return self.cpu_seconds / self.iterations * 1000 * 1000 / self.rows if self.rows else 0
+
+
+def measure(listing, rows, iterations=20):
+    """
+    CPU time (process time, so waits don't count) to fetch, build and
+    render ``rows`` rows of ``listing`` along every path, and the size of
+    the rendered body.
+    """
+    results = []
+    for name, build, renderer in PATHS:
+        data = build(listing, rows)
+        content = renderer.render(data)
+        start = time.process_time()
+        for _ in range(iterations):
+            renderer.render(build(listing, rows))
+        cpu = time.process_time() - start
+        results.append(Measurement(listing, name, len(data), len(content), cpu, iterations))
+    return results
+
+
+def fast_json_backend():
+    return f'orjson {orjson.__version__}' if orjson is not None else 'stdlib json (orjson not installed)'
@@ -0,0 +1,70 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+
+# Run in a fresh interpreter: load the WSGI app and URLconf the way a new
+# worker does, then serve one request to the home page.
+SCRIPT = '''
+import io, json, os, time
+start = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'neighborly.settings')
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+from django.urls import get_resolver
+get_resolver().url_patterns
+ready = time.perf_counter()
+environ = {
+    'REQUEST_METHOD': 'GET', 'PATH_INFO': '/', 'SERVER_NAME': 'localhost', 'SERVER_PORT': '80',
+    'SERVER_PROTOCOL': 'HTTP/1.1', 'wsgi.input': io.BytesIO(), 'wsgi.url_scheme': 'http',
+}
+statuses = []
+b''.join(application(environ, lambda status, headers: statuses.append(status)))
+served = time.perf_counter()
+print(json.dumps({'ready_ms': (ready - start) * 1000, 'first_request_ms': (served - start) * 1000,
+                  'status': statuses[0]}))
+'''
+
+
+class Result:
+    def __init__(self, ready_ms, first_request_ms, imports):
+        self.ready_ms = ready_ms
+        self.first_request_ms = first_request_ms
+        self.imports = imports
+
+
+def _run(*flags):
+    completed = subprocess.run([sys.executable, *flags, '-c', SCRIPT], cwd=settings.BASE_DIR,
+                               env=os.environ.copy(), capture_output=True, text=True, check=True)
+    return json.loads(completed.stdout.strip().splitlines()[-1]), completed.stderr
+
+
+def top_imports(importtime, limit):
+    """``(cumulative ms, module)`` for the slowest top-level imports in ``-X importtime`` output."""
+    imports = []
+    for line in importtime.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Nested imports are indented; their time is already in their parent's.
+        if not name.startswith('  '):
+            imports.append((int(cumulative) / 1000, name.strip()))
+    return sorted(imports, reverse=True)[:limit]
+
+
+def measure(runs=10, imports=15):
+    """
+    Start ``runs`` fresh interpreters and time each to a loaded app and to
+    its first response, then profile the imports of one more.
+    """
+    ready, first = [], []
+    for _ in range(runs):
+        timings, _ = _run()
+        if not timings['status'].startswith('200'):
+            raise RuntimeError(f'First request failed: {timings["status"]}')
+        ready.append(timings['ready_ms'])
+        first.append(timings['first_request_ms'])
+    _, importtime = _run('-X', 'importtime')
+    return Result(ready, first, top_imports(importtime, imports))
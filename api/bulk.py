@@ -0,0 +1,265 @@
+import csv
+import json
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timezone as dt_timezone
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.core.management.color import no_style
+from django.db import DatabaseError, connection, reset_queries, transaction
+from django.utils import timezone
+
+from . import clusters, geo, search, stats
+from .caching import invalidate_community, invalidate_communities
+from .models import User, Profile, Community, Join, Posts, SearchDocument
+from .profiles import profile_cache
+
+FORMATS = ('csv', 'jsonl')
+BATCH_SIZE = 5000
+POST_TIMESTAMPS = ('date', 'time', 'created_at', 'updated_at')
+
+# Table -> (model, columns, optional columns). Columns are field names;
+# foreign keys take the raw id. Profiles without a ``uuid`` are matched to
+# users by email, and users that don't exist yet are created.
+TABLES = {
+    'users': (User, ('id', 'email'), {'id'}),
+    'profiles': (Profile, ('uuid', 'email', 'name', 'age', 'pno', 'profession', 'user_code'), {'uuid'}),
+    'communities': (Community, ('id', 'comm_name', 'admin_id', 'location', 'latitude', 'longtitude'), {'id'}),
+    'joins': (Join, ('id', 'comm_id', 'user_id', 'referral_code', 'is_admin'), {'id', 'is_admin'}),
+    'posts': (Posts, ('id', 'user_id', 'comm_id', 'text_content', 'date', 'time'), {'id', 'date', 'time'}),
+}
+# Lookup that limits an export to one community.
+COMMUNITY_FILTERS = {
+    'users': 'join__comm_id',
+    'profiles': 'uuid__join__comm_id',
+    'communities': 'pk',
+    'joins': 'comm_id',
+    'posts': 'comm_id',
+}
+
+
+class BulkError(Exception):
+    pass
+
+
+class Result:
+    def __init__(self, rows=0, skipped=0, seconds=0.0):
+        self.rows = rows
+        self.skipped = skipped
+        self.seconds = seconds
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0
+
+
+def read_rows(stream, fmt):
+    """Yield ``(line number, row dict)`` from a CSV or JSONL stream, one row at a time."""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            raise BulkError(f'line {line_number}: invalid JSON ({e})')
+        if not isinstance(row, dict):
+            raise BulkError(f'line {line_number}: expected an object')
+        yield line_number, row
+
+
+def build(model, columns, optional, row):
+    values = {}
+    for name in columns:
+        field = model._meta.get_field(name)
+        value = row.get(name)
+        if value is None or value == '':
+            if field.null:
+                values[field.attname] = None
+            elif name not in optional:
+                raise ValidationError(f'{name} is required')
+            continue
+        if field.is_relation:
+            values[field.attname] = field.target_field.to_python(value)
+        else:
+            value = field.to_python(value)
+            field.run_validators(value)
+            values[field.attname] = value
+    return model(**values)
+
+
+def _link_profiles(profiles):
+    emails = {profile.email for profile in profiles if profile.uuid_id is None}
+    if not emails:
+        return
+    users = dict(User.objects.filter(email__in=emails).values_list('email', 'id'))
+    missing = [User(email=email) for email in emails if email not in users]
+    User.objects.bulk_create(missing)
+    users.update((user.email, user.id) for user in missing)
+    for profile in profiles:
+        if profile.uuid_id is None:
+            profile.uuid_id = users[profile.email]
+
+
+def _set_geohashes(communities):
+    # Community.save() does this, but bulk_create never calls it.
+    for community in communities:
+        community.geohash = geo.encode(float(community.latitude), float(community.longtitude))
+
+
+def _stamp_posts(posts):
+    now = timezone.now()
+    for post in posts:
+        if post.date is None:
+            post.date = now.date()
+        if post.time is None:
+            post.time = now.time()
+        post.created_at = post.updated_at = datetime.combine(post.date, post.time, tzinfo=dt_timezone.utc)
+
+
+PREPARE = {
+    'profiles': _link_profiles,
+    'communities': _set_geohashes,
+    'posts': _stamp_posts,
+}
+
+
+@contextmanager
+def _keep_timestamps(model, names):
+    """
+    Let bulk_create keep the timestamps on the objects instead of stamping
+    every row with the import time. Only safe in a single-threaded command.
+    """
+    fields = [model._meta.get_field(name) for name in names]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def _chunks(rows, size):
+    rows = iter(rows)
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+
+def import_rows(table, stream, fmt, batch_size=BATCH_SIZE, ignore_conflicts=False, skip_invalid=False,
+                progress=None):
+    """
+    Stream rows from ``stream`` into ``table`` with one bulk INSERT per
+    ``batch_size`` rows, each batch in its own transaction, so memory stays
+    flat however big the file is. A bad row stops the import (earlier
+    batches stay committed) unless ``skip_invalid`` is set.
+
+    bulk_create skips save() and signals: geohashes and post timestamps are
+    filled in here, imported posts are indexed for search per batch, and
+    member counts, map cells, cached profiles and cached responses are
+    refreshed at the end.
+    """
+    model, columns, optional = TABLES[table]
+    prepare = PREPARE.get(table)
+    index = table == 'posts' and not ignore_conflicts
+    communities = set()
+    result = Result()
+    start = time.perf_counter()
+
+    try:
+        with _keep_timestamps(Posts, POST_TIMESTAMPS) if table == 'posts' else nullcontext():
+            for chunk in _chunks(read_rows(stream, fmt), batch_size):
+                objects = []
+                for line_number, row in chunk:
+                    try:
+                        objects.append(build(model, columns, optional, row))
+                    except ValidationError as e:
+                        if not skip_invalid:
+                            raise BulkError(f'line {line_number}: {"; ".join(e.messages)}')
+                        result.skipped += 1
+                try:
+                    with transaction.atomic():
+                        if prepare:
+                            prepare(objects)
+                        model.objects.bulk_create(objects, ignore_conflicts=ignore_conflicts)
+                        if index:
+                            search.index_objects(SearchDocument.POST, objects, created=True)
+                except (DatabaseError, ValueError) as e:
+                    raise BulkError(f'batch starting at line {chunk[0][0]}: {e}')
+                result.rows += len(objects)
+                # With DEBUG on every INSERT would otherwise be kept in connection.queries.
+                reset_queries()
+                if table in ('joins', 'posts'):
+                    communities.update(obj.comm_id_id for obj in objects)
+                if progress:
+                    progress(result.rows)
+    except BulkError as e:
+        e.result = result
+        raise
+    finally:
+        # Whatever was committed before a failure is live, so tidy up after it too.
+        _reset_sequences(model)
+        if table == 'communities' and result.rows:
+            clusters.rebuild()
+            invalidate_communities()
+        if table == 'joins':
+            stats.reconcile(communities)
+        if table == 'profiles' and result.rows:
+            profile_cache.clear()
+        for comm_id in communities:
+            invalidate_community(comm_id)
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+def _reset_sequences(model):
+    # Rows imported with explicit ids don't advance Postgres sequences.
+    statements = connection.ops.sequence_reset_sql(no_style(), [model])
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+
+def _json_default(value):
+    return str(value)
+
+
+def export_rows(table, stream, fmt, comm_id=None, batch_size=BATCH_SIZE, progress=None):
+    """
+    Write every row of ``table`` to ``stream`` in the format ``import_rows``
+    reads. Rows are streamed with ``.iterator()``, which uses a server-side
+    cursor on Postgres, so the table is never held in memory.
+    """
+    model, columns, _ = TABLES[table]
+    queryset = model.objects.order_by('pk')
+    if comm_id is not None:
+        queryset = queryset.filter(**{COMMUNITY_FILTERS[table]: comm_id})
+    rows = queryset.values_list(*columns).iterator(chunk_size=batch_size)
+
+    if fmt == 'csv':
+        writer = csv.writer(stream)
+        writer.writerow(columns)
+        write = writer.writerow
+    else:
+        encoder = json.JSONEncoder(default=_json_default, ensure_ascii=False, separators=(',', ':'))
+
+        def write(row):
+            stream.write(encoder.encode(dict(zip(columns, row))))
+            stream.write('\n')
+
+    result = Result()
+    start = time.perf_counter()
+    for row in rows:
+        write(row)
+        result.rows += 1
+        if progress and result.rows % batch_size == 0:
+            progress(result.rows)
+    result.seconds = time.perf_counter() - start
+    return result
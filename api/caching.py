@@ -0,0 +1,113 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+COMMUNITIES_SCOPE = 'communities'
+CACHED_HEADERS = ('Link', 'X-Next-Cursor', 'X-Prev-Cursor')
+
+
+def get_cache():
+    return caches[settings.RESPONSE_CACHE_ALIAS]
+
+
+def _version_key(scope):
+    return f'version:{scope}'
+
+
+def get_version(scope):
+    cache = get_cache()
+    version = cache.get(_version_key(scope))
+    if version is None:
+        # Seed from the clock so an evicted counter never comes back at a
+        # value that older cached responses were stored under.
+        cache.add(_version_key(scope), time.time_ns(), timeout=None)
+        version = cache.get(_version_key(scope))
+    return version
+
+
+def bump_version(scope):
+    cache = get_cache()
+    try:
+        cache.incr(_version_key(scope))
+    except ValueError:
+        cache.set(_version_key(scope), time.time_ns(), timeout=None)
+
+
+def invalidate_community(comm_id):
+    transaction.on_commit(lambda: bump_version(f'community:{comm_id}'))
+
+
+def invalidate_communities():
+    transaction.on_commit(lambda: bump_version(COMMUNITIES_SCOPE))
+
+
+def community_scope(kwargs):
+    return f"community:{kwargs['comm_id']}"
+
+
+def communities_scope(kwargs):
+    return COMMUNITIES_SCOPE
+
+
+def _etag_matches(request, etag):
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+    return header.strip() == '*' or etag in [tag.strip() for tag in header.split(',')]
+
+
+def _response_key(request, endpoint, version_scope, version, media_type):
+    variant = f'{request.get_full_path()}|{media_type}'
+    key = ':'.join([
+        'response', endpoint, version_scope, str(version), hashlib.md5(variant.encode()).hexdigest(),
+    ])
+    return key, f'"{hashlib.md5(key.encode()).hexdigest()}"'
+
+
+def _finish(response, etag):
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def cached_response(endpoint, scope=community_scope):
+    """
+    Cache a GET view's response data under its scope's current version.
+    Writes bump the version instead of deleting keys, so stale entries are
+    never served and simply age out. Responses carry an ETag derived from
+    the version and ``If-None-Match`` is answered with 304 without running
+    the view or reading the cached body.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET':
+                return view(request, *args, **kwargs)
+
+            version_scope = scope(kwargs)
+            key, etag = _response_key(request, endpoint, version_scope, get_version(version_scope),
+                                      request.accepted_media_type)
+            if _etag_matches(request, etag):
+                return _finish(Response(status=status.HTTP_304_NOT_MODIFIED), etag)
+
+            cache = get_cache()
+            cached = cache.get(key)
+            if cached is not None:
+                data, headers = cached
+                return _finish(Response(data, headers=headers), etag)
+
+            response = view(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            headers = {name: response[name] for name in CACHED_HEADERS if response.has_header(name)}
+            cache.set(key, (response.data, headers), settings.RESPONSE_CACHE_TIMEOUT)
+            return _finish(response, etag)
+        return wrapper
+    return decorator
+
@@ -0,0 +1,48 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, Warning, register
+
+from .events import broker_is_local, worker_count
+from .tokens import secret_is_usable, session_tokens
+
+
+@register(Tags.security, deploy=True)
+def check_session_token_secret(app_configs, **kwargs):
+    if settings.DEBUG or secret_is_usable(settings.SESSION_TOKEN_SECRET):
+        return []
+    return [Error(
+        'SESSION_TOKEN_SECRET is missing or equal to SECRET_KEY, so session tokens cannot be issued or '
+        'verified safely.',
+        hint='Set SESSION_TOKEN_SECRET in the environment to a random secret used only for session tokens.',
+        id='api.E001',
+    )]
+
+
+@register(Tags.security, deploy=True)
+def check_revocation_cache(app_configs, **kwargs):
+    if not session_tokens.get_revocation_cache() or session_tokens.revocation_is_shared():
+        return []
+    return [Warning(
+        'SESSION_TOKEN_REVOCATION_CACHE is a per-process cache, so a logout only revokes the token in the '
+        'worker that handled it.',
+        hint='Point it at a shared cache such as Redis, or run a single worker.',
+        id='api.W001',
+    )]
+
+
+@register(deploy=True)
+def check_event_broker(app_configs, **kwargs):
+    if not broker_is_local():
+        return []
+    if worker_count() > 1:
+        return [Error(
+            f'EVENT_BROKER is the in-process LocalBroker but WEB_CONCURRENCY asks for {worker_count()} workers, '
+            f'so streams would miss events written in other workers and replay ids would not line up.',
+            hint='Run a single worker, or set EVENT_BROKER to a cross-process broker.',
+            id='api.E002',
+        )]
+    return [Warning(
+        'EVENT_BROKER is the in-process LocalBroker, so every request has to be served by a single worker '
+        'process for event streams to see every write.',
+        hint='Run one uvicorn worker (no --workers), or set EVENT_BROKER to a cross-process broker.',
+        id='api.W002',
+    )]
@@ -0,0 +1,118 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Substr
+
+from . import geo
+from .models import Community, CommunityCell
+
+# Cells are kept for geohash prefixes of 1 to CLUSTER_PRECISION characters;
+# at 6 a cell is about 1.2 x 0.6 km.
+CLUSTER_PRECISION = 6
+# A map view is split into at most this many cells.
+MAX_CLUSTERS = 64
+
+
+def _deltas(communities, sign):
+    deltas = defaultdict(lambda: [0, 0.0, 0.0])
+    for community in communities:
+        if not community.geohash:
+            continue
+        latitude, longitude = float(community.latitude), float(community.longtitude)
+        for precision in range(1, CLUSTER_PRECISION + 1):
+            delta = deltas[community.geohash[:precision]]
+            delta[0] += sign
+            delta[1] += sign * latitude
+            delta[2] += sign * longitude
+    return deltas
+
+
+def _apply(deltas):
+    # A cell a community leaves may empty out and one it enters may not
+    # exist yet; cells that move by the same amount share an UPDATE, so a
+    # single community costs one UPDATE for all of its prefixes.
+    deltas = {cell: delta for cell, delta in deltas.items() if any(delta)}
+    if not deltas:
+        return
+    cells_by_delta = defaultdict(list)
+    for cell, delta in deltas.items():
+        cells_by_delta[tuple(delta)].append(cell)
+    entered = [cell for cell, (count, _, _) in deltas.items() if count > 0]
+    left = [cell for cell, (count, _, _) in deltas.items() if count < 0]
+    with transaction.atomic(savepoint=False):
+        if entered:
+            CommunityCell.objects.bulk_create([CommunityCell(cell=cell) for cell in entered], ignore_conflicts=True)
+        for (count, latitude, longitude), cells in cells_by_delta.items():
+            CommunityCell.objects.filter(cell__in=cells).update(
+                count=F('count') + count,
+                latitude_sum=F('latitude_sum') + latitude,
+                longitude_sum=F('longitude_sum') + longitude,
+            )
+        if left:
+            CommunityCell.objects.filter(cell__in=left, count__lte=0).delete()
+
+
+def add(communities):
+    _apply(_deltas(communities, 1))
+
+
+def remove(communities):
+    _apply(_deltas(communities, -1))
+
+
+def move(before, after):
+    """
+    Move a community from ``before`` to ``after``, anything with the old and
+    new ``geohash``, ``latitude`` and ``longtitude``. Prefixes both share
+    keep their count and only shift their coordinate sums.
+    """
+    deltas = _deltas([before], -1)
+    for cell, (count, latitude, longitude) in _deltas([after], 1).items():
+        delta = deltas[cell]
+        delta[0] += count
+        delta[1] += latitude
+        delta[2] += longitude
+    _apply(deltas)
+
+
+def rebuild():
+    """
+    Recompute every cell from the communities table, with one GROUP BY per
+    precision, e.g. after communities were bulk-loaded. Returns the number
+    of cells.
+    """
+    cells = 0
+    communities = Community.objects.exclude(geohash='').order_by()
+    with transaction.atomic():
+        CommunityCell.objects.all().delete()
+        for precision in range(1, CLUSTER_PRECISION + 1):
+            rows = communities.annotate(cell=Substr('geohash', 1, precision)).values('cell').annotate(
+                count=Count('pk'), latitude_sum=Sum('latitude'), longitude_sum=Sum('longtitude'))
+            cells += len(CommunityCell.objects.bulk_create([CommunityCell(**row) for row in rows], batch_size=1000))
+    return cells
+
+
+def precision_for(min_lat, min_lon, max_lat, max_lon):
+    """The finest cell precision that splits the box into no more than MAX_CLUSTERS cells."""
+    for precision in range(CLUSTER_PRECISION, 1, -1):
+        if geo.grid_span(min_lat, min_lon, max_lat, max_lon, precision) <= MAX_CLUSTERS:
+            return precision
+    return 1
+
+
+def in_box(min_lat, min_lon, max_lat, max_lon):
+    """
+    The non-empty cells covering the box, at the precision picked by
+    ``precision_for``, as ``(precision, clusters)``. Each cluster has its
+    community count and their centroid, read straight from the stored sums.
+    """
+    precision = precision_for(min_lat, min_lon, max_lat, max_lon)
+    cells = geo.covering_cells(min_lat, min_lon, max_lat, max_lon, precision=precision)
+    rows = CommunityCell.objects.filter(cell__in=cells, count__gt=0).order_by('cell').values_list(
+        'cell', 'count', 'latitude_sum', 'longitude_sum')
+    return precision, [
+        {'cell': cell, 'count': count, 'latitude': round(latitude_sum / count, 6),
+         'longtitude': round(longitude_sum / count, 6)}
+        for cell, count, latitude_sum, longitude_sum in rows
+    ]
@@ -0,0 +1,78 @@
+from .enrichment import (ProfileLoader, format_posts, format_offers, format_requests, format_join_requests,
+                         POST_COLUMNS, OFFER_COLUMNS, REQUEST_COLUMNS, JOIN_REQUEST_COLUMNS)
+from .models import Community, Posts, Offers, Requests, JoinRequest
+from .pagination import first_page, ID_ORDERING, POSTS_ORDERING
+from .stats import FIELDS as STATS_FIELDS
+
+SECTIONS = ('community', 'posts', 'offers', 'public_requests', 'user_requests', 'join_requests')
+# Sections about the caller: their own requests, and join requests if they are the admin.
+USER_SECTIONS = ('user_requests', 'join_requests')
+
+
+class InvalidSections(Exception):
+    pass
+
+
+def _listings(comm_id, user_id):
+    # Section -> (rows, ordering, formatter, owner column), matching the
+    # list endpoint each section stands in for.
+    return {
+        'posts': (Posts.objects.filter(comm_id=comm_id).values(*POST_COLUMNS), POSTS_ORDERING, format_posts,
+                  'user_id'),
+        'offers': (Offers.objects.filter(comm_id=comm_id).values(*OFFER_COLUMNS), ID_ORDERING, format_offers,
+                   'user_id'),
+        'public_requests': (Requests.objects.filter(comm_id=comm_id, offer_id=None).values(*REQUEST_COLUMNS),
+                            ID_ORDERING, format_requests, 'user_id'),
+        'user_requests': (Requests.objects.filter(comm_id=comm_id, user_id=user_id).values(*REQUEST_COLUMNS),
+                          ID_ORDERING, format_requests, 'user_id'),
+        'join_requests': (JoinRequest.objects.filter(comm_id=comm_id, admin_id=user_id).values(*JOIN_REQUEST_COLUMNS),
+                          ID_ORDERING, format_join_requests, 'member_id'),
+    }
+
+
+def get_sections(requested, user_id):
+    if not requested:
+        return [section for section in SECTIONS if user_id is not None or section not in USER_SECTIONS]
+    unknown = set(requested) - set(SECTIONS)
+    if unknown:
+        raise InvalidSections(f'Unknown section: {", ".join(sorted(unknown))}')
+    if user_id is None and set(requested) & set(USER_SECTIONS):
+        raise InvalidSections(f'{", ".join(USER_SECTIONS)} need a user.')
+    return list(dict.fromkeys(requested))
+
+
+def build(comm_id, user_id=None, sections=None, page_size=None):
+    """
+    Everything a community screen shows, in one response: the community
+    with its counters, and the first page of each listing with the cursor
+    for the next. Each section is one query and the authors of every
+    section are resolved together, so the whole screen takes at most seven
+    queries. Returns ``None`` if the community doesn't exist.
+    """
+    sections = get_sections(sections, user_id)
+    community = Community.objects.filter(pk=comm_id).values(
+        'id', 'comm_name', 'location', *(f'stats__{field}' for field in STATS_FIELDS)).first()
+    if community is None:
+        return None
+
+    data = {}
+    if 'community' in sections:
+        data['community'] = {
+            'id': community['id'],
+            'name': community['comm_name'],
+            'location': community['location'],
+            **{field: community[f'stats__{field}'] or 0 for field in STATS_FIELDS},
+        }
+
+    loader = ProfileLoader()
+    listings = _listings(comm_id, user_id)
+    pages = {}
+    for section in sections:
+        if section in listings:
+            rows, ordering, _, owner = listings[section]
+            pages[section] = first_page(rows, ordering, page_size)
+            loader.prime(row[owner] for row in pages[section].rows)
+    for section, page in pages.items():
+        formatter = listings[section][2]
+        data[section] = {'items': formatter(page.rows, loader), 'next_cursor': page.next_cursor}
+    return data
@@ -0,0 +1,153 @@
+from datetime import date, time
+
+from .models import Requests
+from .profiles import profile_cache
+from .stats import FIELDS as STATS_FIELDS
+
+OFFER_FIELDS = ['offer_type', 'title', 'description', 'status']
+REQUEST_FIELDS = ['request_type', 'title', 'description']
+REQUEST_OPTIONAL_FIELDS = Requests.WINDOW_FIELDS
+PROFILE_FIELDS = ['email', 'name', 'age', 'profession', 'pno']
+
+# Columns to pass to ``.values()`` for each listing, so rows go straight
+# from the database into the output dicts without a ModelSerializer.
+POST_COLUMNS = ('id', 'text_content', 'date', 'time', 'user_id', 'comm_id')
+OFFER_COLUMNS = ('id', 'user_id', *OFFER_FIELDS)
+REQUEST_COLUMNS = ('id', 'user_id', *REQUEST_FIELDS, *REQUEST_OPTIONAL_FIELDS, 'status')
+JOIN_REQUEST_COLUMNS = ('id', 'member_id', 'accepted')
+# A membership with its community and the community's counters, in one join.
+USER_COMMUNITY_COLUMNS = ('id', 'is_admin', 'comm_id__comm_name', 'comm_id__location',
+                          *(f'comm_id__stats__{field}' for field in STATS_FIELDS))
+
+
+class ProfileLoader:
+    """
+    Resolves user ids to profiles in batches. Ids are collected with
+    ``prime()`` and looked up together the first time one of them is
+    needed, so several listings share one ``IN`` query for the profiles
+    that aren't in the process-wide cache (api/profiles.py).
+    """
+
+    def __init__(self):
+        self._profiles = {}
+        self._pending = set()
+
+    def prime(self, user_ids):
+        for user_id in user_ids:
+            if user_id not in self._profiles:
+                self._pending.add(user_id)
+
+    def _take_pending(self):
+        pending, self._pending = self._pending, set()
+        return pending
+
+    def load(self):
+        if not self._pending:
+            return
+        self._profiles.update(profile_cache.get_many(self._take_pending()))
+
+    def get(self, user_id):
+        if user_id not in self._profiles:
+            self.prime([user_id])
+        self.load()
+        return self._profiles.get(user_id)
+
+    def get_many(self, user_ids):
+        self.prime(user_ids)
+        self.load()
+        return {user_id: self._profiles.get(user_id) for user_id in user_ids}
+
+
+def _user_name(profile):
+    return profile.name if profile else None
+
+
+def _iso(value):
+    # Same strings the serializers' DateField/TimeField produce.
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    return value
+
+
+def _window_value(value):
+    # HH:MM times, like RequestsSerializer.
+    if isinstance(value, time):
+        return value.strftime(Requests.WINDOW_TIME_FORMAT)
+    return _iso(value)
+
+
+def format_posts(rows, loader=None):
+    return [{
+        'id': row['id'],
+        'text_content': row['text_content'],
+        'date': _iso(row['date']),
+        'time': _iso(row['time']),
+        'user_id': row['user_id'],
+        'comm_id': row['comm_id'],
+    } for row in rows]
+
+
+def format_offers(rows, loader=None):
+    loader = loader or ProfileLoader()
+    loader.prime(row['user_id'] for row in rows)
+    offer_datas = []
+    for row in rows:
+        offer_data = {'id': row['id'], 'user_name': _user_name(loader.get(row['user_id']))}
+        for field in OFFER_FIELDS:
+            offer_data[field] = row[field]
+        offer_datas.append(offer_data)
+    return offer_datas
+
+
+def format_requests(rows, loader=None):
+    loader = loader or ProfileLoader()
+    loader.prime(row['user_id'] for row in rows)
+    request_datas = []
+    for row in rows:
+        request_data = {'id': row['id'], 'user_name': _user_name(loader.get(row['user_id']))}
+        for field in REQUEST_FIELDS:
+            request_data[field] = row[field]
+        for field in REQUEST_OPTIONAL_FIELDS:
+            if row[field]:
+                request_data[field] = _window_value(row[field])
+        request_data['status'] = row['status']
+        request_datas.append(request_data)
+    return request_datas
+
+
+def format_user_communities(rows):
+    # Communities whose counters were never computed show zeros until the
+    # first change or reconcile_community_stats fills them in.
+    return [{
+        'id': row['id'],
+        'name': row['comm_id__comm_name'],
+        'location': row['comm_id__location'],
+        'is_admin': row['is_admin'],
+        **{field: row[f'comm_id__stats__{field}'] or 0 for field in STATS_FIELDS},
+    } for row in rows]
+
+
+def format_join_requests(rows, loader=None):
+    loader = loader or ProfileLoader()
+    loader.prime(row['member_id'] for row in rows)
+    profile_infos = []
+    for row in rows:
+        profile = loader.get(row['member_id'])
+        profile_info = {'id': row['id'], 'accepted': row['accepted']}
+        for field in PROFILE_FIELDS:
+            profile_info[field] = getattr(profile, field) if profile else None
+        profile_infos.append(profile_info)
+    return profile_infos
+
+
+def format_search_results(rows, loader=None):
+    loader = loader or ProfileLoader()
+    loader.prime(row['user_id'] for row in rows)
+    return [{
+        'kind': row['kind'],
+        'id': row['object_id'],
+        'user_name': _user_name(loader.get(row['user_id'])),
+        'title': row['title'],
+        'text': row['body'],
+        'rank': row['rank'],
+    } for row in rows]
@@ -0,0 +1,203 @@
+import asyncio
+import itertools
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.utils.module_loading import import_string
+from rest_framework.utils.encoders import JSONEncoder
+
+from .metrics import registry
+
+RESET = 'reset'
+
+
+class Event:
+    __slots__ = ('id', 'comm_id', 'type', 'data')
+
+    def __init__(self, id, comm_id, type, data):
+        self.id = id
+        self.comm_id = comm_id
+        self.type = type
+        self.data = data
+
+    def encode(self):
+        payload = json.dumps(self.data, cls=JSONEncoder, separators=(',', ':'))
+        return f'id: {self.id}\nevent: {self.type}\ndata: {payload}\n\n'
+
+
+class Subscription:
+    def __init__(self, hub, comm_id, loop, queue_size):
+        self.hub = hub
+        self.comm_id = comm_id
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.overflowed = False
+
+    def offer(self, event):
+        # Runs on the subscriber's event loop. A consumer that cannot keep
+        # up is told to resync instead of buffering without limit.
+        if self.overflowed:
+            return
+        if self.queue.full():
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESET)
+            return
+        self.queue.put_nowait(event)
+
+    async def next(self, timeout):
+        """The next event, ``RESET``, or ``None`` if ``timeout`` passed first."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+
+def _deliver(subscriptions, event):
+    for subscription in subscriptions:
+        subscription.offer(event)
+
+
+class EventHub:
+    """
+    In-process fan-out of community events to async subscribers. Each
+    subscriber costs one small bounded queue on its event loop; publishing
+    from sync code hands events over with ``call_soon_threadsafe``.
+
+    Event ids start from the clock at process start so they keep
+    increasing across restarts, and the last ``history_size`` events per
+    community are kept so clients can resume from ``Last-Event-ID``.
+    """
+
+    def __init__(self, history_size=1000, queue_size=100):
+        self.history_size = history_size
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+        self._history = defaultdict(lambda: deque(maxlen=self.history_size))
+        self._first_id = time.time_ns() // 1000
+        self._ids = itertools.count(self._first_id + 1)
+        self._floors = {}
+
+    def dispatch(self, comm_id, type, data):
+        comm_id = str(comm_id)
+        with self._lock:
+            event = Event(next(self._ids), comm_id, type, data)
+            history = self._history[comm_id]
+            if len(history) == history.maxlen:
+                self._floors[comm_id] = history[0].id
+            history.append(event)
+            subscribers = list(self._subscribers.get(comm_id, ()))
+        by_loop = defaultdict(list)
+        for subscription in subscribers:
+            by_loop[subscription.loop].append(subscription)
+        for loop, batch in by_loop.items():
+            try:
+                loop.call_soon_threadsafe(_deliver, batch, event)
+            except RuntimeError:
+                for subscription in batch:
+                    self.unsubscribe(subscription)
+        return event
+
+    def subscribe(self, comm_id, last_event_id=None):
+        """
+        Register a subscriber on the running loop. Returns the subscription
+        and the events to replay first, or ``None`` in place of the replay
+        list when events after ``last_event_id`` are no longer known.
+        """
+        comm_id = str(comm_id)
+        subscription = Subscription(self, comm_id, asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            self._subscribers[comm_id].add(subscription)
+            if last_event_id is None:
+                return subscription, []
+            floor = self._floors.get(comm_id, self._first_id)
+            if last_event_id < floor:
+                return subscription, None
+            return subscription, [event for event in self._history.get(comm_id, ()) if event.id > last_event_id]
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.comm_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.comm_id]
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+
+class LocalBroker:
+    """
+    Delivers events straight to this process's hub. A cross-process broker
+    (Redis pub/sub, Postgres LISTEN/NOTIFY, ...) implements the same
+    ``publish`` and feeds received events into ``hub.dispatch``.
+
+    Event ids and replay history live in the hub, so with this broker one
+    server process has to handle every write and every stream: a second
+    worker would miss the first one's events and number its own.
+    """
+
+    def __init__(self, hub):
+        self.hub = hub
+
+    def publish(self, comm_id, type, data):
+        self.hub.dispatch(comm_id, type, data)
+
+
+hub = EventHub(history_size=settings.EVENT_HISTORY_SIZE)
+_broker = None
+
+
+def _collect_metrics(lines):
+    lines.append('# HELP neighborly_event_subscribers Open event stream subscriptions.')
+    lines.append('# TYPE neighborly_event_subscribers gauge')
+    lines.append(f'neighborly_event_subscribers {hub.subscriber_count()}')
+
+
+registry.register_collector(_collect_metrics)
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        _broker = import_string(settings.EVENT_BROKER)(hub)
+    return _broker
+
+
+def broker_is_local():
+    return import_string(settings.EVENT_BROKER) is LocalBroker
+
+
+def worker_count():
+    """Worker processes asked for through ``WEB_CONCURRENCY``, which uvicorn and gunicorn both read."""
+    try:
+        return int(os.environ.get('WEB_CONCURRENCY', 1))
+    except ValueError:
+        return 1
+
+
+def require_single_worker():
+    if broker_is_local() and worker_count() > 1:
+        raise ImproperlyConfigured(
+            f'EVENT_BROKER is {settings.EVENT_BROKER}, which only reaches streams in its own process, but '
+            f'WEB_CONCURRENCY asks for {worker_count()} workers. Run a single worker or configure a '
+            f'cross-process broker.'
+        )
+
+
+def publish_event(comm_id, type, data):
+    """Publish once the surrounding transaction (if any) commits."""
+    transaction.on_commit(lambda: get_broker().publish(comm_id, type, data))
@@ -0,0 +1,76 @@
+import heapq
+from itertools import islice
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from .enrichment import (ProfileLoader, format_posts, format_offers, format_requests,
+                         POST_COLUMNS, OFFER_COLUMNS, REQUEST_COLUMNS)
+from .models import Posts, Offers, Requests, PENDING
+from .pagination import encode_cursor, decode_cursor, keyset_filter, InvalidCursor, Page
+
+FEED_ORDERING = ('-created_at', '-id')
+
+# Kind -> (rank, model, columns, formatter, filter). Items are ordered by
+# (created_at, rank, id), newest first; the rank orders kinds created in
+# the same instant.
+KINDS = {
+    'post': (0, Posts, POST_COLUMNS, format_posts, {}),
+    'offer': (1, Offers, OFFER_COLUMNS, format_offers, {}),
+    'request': (2, Requests, REQUEST_COLUMNS, format_requests, {'offer_id': None, 'status': PENDING}),
+}
+
+
+def decode_position(token):
+    direction, (created_at, rank, pk) = decode_cursor(token, 3)
+    created_at = parse_datetime(created_at) if isinstance(created_at, str) else None
+    if direction != 'next' or created_at is None or not isinstance(rank, int) or not isinstance(pk, int):
+        raise InvalidCursor()
+    return created_at, rank, pk
+
+
+def _after(rank, position):
+    """Rows of the kind ranked ``rank`` that come after ``position`` in feed order."""
+    created_at, position_rank, pk = position
+    if rank < position_rank:
+        return Q(created_at__lte=created_at)
+    if rank > position_rank:
+        return Q(created_at__lt=created_at)
+    return keyset_filter(FEED_ORDERING, (created_at, pk))
+
+
+def page(comm_ids, token=None, page_size=50):
+    """
+    One page of posts, offers and open requests from ``comm_ids``, newest
+    first. Each kind is read with one ``comm_id IN (...)`` query of at most
+    ``page_size + 1`` rows in (created_at, id) order, backed by the kind's
+    (comm_id, created_at, id) index, and the three sorted runs are merged
+    with a heap, so a page costs three queries plus one for author names
+    however many communities there are.
+    """
+    if not comm_ids:
+        return Page([])
+    position = decode_position(token) if token else None
+    runs = []
+    for kind, (rank, model, columns, _, condition) in KINDS.items():
+        rows = model.objects.filter(comm_id__in=comm_ids, **condition)
+        if position is not None:
+            rows = rows.filter(_after(rank, position))
+        rows = rows.order_by(*FEED_ORDERING).values(*dict.fromkeys((*columns, 'comm_id', 'created_at')))
+        runs.append([((row['created_at'], rank, row['id']), kind, row) for row in rows[:page_size + 1]])
+    merged = list(islice(heapq.merge(*runs, key=lambda item: item[0], reverse=True), page_size + 1))
+    has_more = len(merged) > page_size
+    merged = merged[:page_size]
+
+    loader = ProfileLoader()
+    loader.prime(row['user_id'] for _, _, row in merged)
+    formatted = {}
+    for kind, (_, _, _, formatter, _) in KINDS.items():
+        rows = [row for _, item_kind, row in merged if item_kind == kind]
+        for row, item in zip(rows, formatter(rows, loader)):
+            formatted[kind, row['id']] = {
+                'kind': kind, **item, 'comm_id': row['comm_id'], 'created_at': row['created_at'].isoformat(),
+            }
+    items = [formatted[kind, row['id']] for _, kind, row in merged]
+    next_cursor = encode_cursor('next', list(merged[-1][0])) if has_more else None
+    return Page(items, next_cursor)
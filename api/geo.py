@@ -0,0 +1,112 @@
+from math import pi, radians, cos, sin, asin, sqrt
+
+EARTH_RADIUS_KM = 6371
+# Along a meridian on the same sphere haversine() measures on, so a box built
+# from it never cuts off a point that haversine() puts inside the radius.
+KM_PER_DEGREE = pi * EARTH_RADIUS_KM / 180
+GEOHASH_PRECISION = 9
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
+
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
+    c = 2 * asin(sqrt(a))
+    return c * EARTH_RADIUS_KM
+
+
+def encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            mid = (lon_range[0] + lon_range[1]) / 2
+            if longitude >= mid:
+                bits = (bits << 1) | 1
+                lon_range[0] = mid
+            else:
+                bits = bits << 1
+                lon_range[1] = mid
+        else:
+            mid = (lat_range[0] + lat_range[1]) / 2
+            if latitude >= mid:
+                bits = (bits << 1) | 1
+                lat_range[0] = mid
+            else:
+                bits = bits << 1
+                lat_range[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(BASE32[bits])
+            bits = 0
+            bit_count = 0
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    """Return the (height, width) of a geohash cell in degrees."""
+    total_bits = 5 * precision
+    lon_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lon_bits)
+
+
+def bounding_box(latitude, longitude, radius_km):
+    dlat = radius_km / KM_PER_DEGREE
+    lat_scale = cos(radians(min(abs(latitude) + dlat, 89.9)))
+    dlon = min(radius_km / (KM_PER_DEGREE * lat_scale), 180.0)
+    return (
+        max(latitude - dlat, -90.0),
+        longitude - dlon,
+        min(latitude + dlat, 90.0),
+        longitude + dlon,
+    )
+
+
+def _wrap_longitude(longitude):
+    return ((longitude + 180.0) % 360.0) - 180.0
+
+
+def grid_span(min_lat, min_lon, max_lat, max_lon, precision):
+    """How many geohash cells of ``precision`` the box touches."""
+    height, width = cell_size(precision)
+    rows = int((max_lat + 90.0) // height) - int((min_lat + 90.0) // height) + 1
+    cols = int((max_lon + 180.0) // width) - int((min_lon + 180.0) // width) + 1
+    return rows * cols
+
+
+def covering_cells(min_lat, min_lon, max_lat, max_lon, max_cells=16, precision=None):
+    """
+    Geohash prefixes that together cover the box, using the finest precision
+    that needs no more than ``max_cells`` cells, or exactly ``precision``.
+    Longitudes outside [-180, 180) wrap around the antimeridian.
+    """
+    if max_lon - min_lon >= 360.0:
+        min_lon, max_lon = -180.0, 180.0
+    if precision is None:
+        for precision in range(GEOHASH_PRECISION, 0, -1):
+            if grid_span(min_lat, min_lon, max_lat, max_lon, precision) <= max_cells or precision == 1:
+                break
+    height, width = cell_size(precision)
+
+    cells = set()
+    lat = min_lat
+    while True:
+        lon = min_lon
+        while True:
+            cells.add(encode(min(lat, 90.0 - height / 2), _wrap_longitude(lon), precision))
+            if lon >= max_lon:
+                break
+            lon = min(lon + width, max_lon)
+        if lat >= max_lat:
+            break
+        lat = min(lat + height, max_lat)
+    return sorted(cells)
@@ -0,0 +1,96 @@
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class JWKSUnavailable(Exception):
+    pass
+
+
+def http_fetcher(url):
+    import requests
+
+    response = requests.get(url, timeout=5)
+    response.raise_for_status()
+    return response.json()
+
+
+def static_fetcher(jwks):
+    """Fetcher that always returns ``jwks``; handy for tests and benchmarks."""
+    return lambda url: jwks
+
+
+class JWKSCache:
+    """
+    Process-wide cache of parsed Auth0 signing keys, keyed by ``kid``.
+
+    Keys are refetched once ``ttl`` seconds have passed, or straight away when
+    a token names a ``kid`` we have not seen (Auth0 rotated its keys). Forced
+    refetches are rate limited so junk ``kid`` values cannot hammer Auth0.
+    """
+
+    def __init__(self, url=None, ttl=None, fetcher=http_fetcher, min_refresh_interval=30):
+        self.url = url
+        self.ttl = ttl
+        self.fetcher = fetcher
+        self.min_refresh_interval = min_refresh_interval
+        self._keys = {}
+        self._fetched_at = None
+        self._lock = threading.Lock()
+
+    def get_url(self):
+        return self.url or f'https://{settings.AUTH0_DOMAIN}/.well-known/jwks.json'
+
+    def get_ttl(self):
+        return self.ttl if self.ttl is not None else settings.AUTH0_JWKS_TTL
+
+    def get_key(self, kid):
+        now = time.monotonic()
+        keys, fetched_at = self._keys, self._fetched_at
+        if fetched_at is not None and now - fetched_at < self.get_ttl() and kid in keys:
+            return keys[kid]
+
+        with self._lock:
+            now = time.monotonic()
+            fetched_at = self._fetched_at
+            expired = fetched_at is None or now - fetched_at >= self.get_ttl()
+            unknown = kid not in self._keys
+            if expired or (unknown and now - fetched_at >= self.min_refresh_interval):
+                self._refresh()
+            return self._keys.get(kid)
+
+    def clear(self):
+        with self._lock:
+            self._keys = {}
+            self._fetched_at = None
+
+    def _refresh(self):
+        # jose pulls in cryptography; only logins need it, so keep it off startup.
+        from jose import jwk
+
+        try:
+            jwks = self.fetcher(self.get_url())
+        except Exception as e:
+            if not self._keys:
+                raise JWKSUnavailable(str(e)) from e
+            logger.warning('JWKS refresh failed, serving cached keys: %s', e)
+            self._fetched_at = time.monotonic()
+            return
+
+        keys = {}
+        for key in jwks.get('keys', []):
+            if key.get('kty') != 'RSA' or 'kid' not in key:
+                continue
+            try:
+                keys[key['kid']] = jwk.construct(key, algorithm='RS256')
+            except Exception as e:
+                logger.warning('Skipping unusable JWKS key %s: %s', key.get('kid'), e)
+        self._keys = keys
+        self._fetched_at = time.monotonic()
+
+
+jwks_cache = JWKSCache()
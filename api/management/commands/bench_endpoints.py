@@ -0,0 +1,91 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from api.benchmarks import data
+from api.benchmarks.endpoints import ENDPOINTS, run_endpoint
+from api.jwks import jwks_cache, static_fetcher
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway test database with synthetic communities and drive every API endpoint '
+        'through the Django test client, reporting latency percentiles, throughput and SQL query '
+        'counts. Exits non-zero when an endpoint exceeds its query or latency budget.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--communities', type=int, default=10)
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--members', type=int, default=40, help='Members per community.')
+        parser.add_argument('--posts', type=int, default=100, help='Posts per community.')
+        parser.add_argument('--offers', type=int, default=50, help='Offers per community.')
+        parser.add_argument('--requests', type=int, default=50, help='Requests per community.')
+        parser.add_argument('--join-requests', type=int, default=10, help='Pending join requests per community.')
+        parser.add_argument('--iterations', type=int, default=50, help='Measured calls per endpoint.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--only', nargs='*', help='Endpoint names to run.')
+        parser.add_argument('--warm-cache', action='store_true',
+                            help='Leave the response cache in place between calls.')
+        parser.add_argument('--budget-scale', type=float, default=1.0,
+                            help='Multiply latency budgets, e.g. for slow CI machines.')
+        parser.add_argument('--no-budgets', action='store_true', help='Report only; never fail.')
+
+    def handle(self, *args, **options):
+        endpoints = ENDPOINTS
+        if options['only']:
+            endpoints = [endpoint for endpoint in ENDPOINTS if endpoint.name in options['only']]
+            unknown = set(options['only']) - {endpoint.name for endpoint in endpoints}
+            if unknown:
+                raise CommandError(f'Unknown endpoints: {", ".join(sorted(unknown))}')
+
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        fetcher = jwks_cache.fetcher
+        try:
+            start = time.perf_counter()
+            dataset = data.generate(
+                communities=options['communities'], users=options['users'], members=options['members'],
+                posts=options['posts'], offers=options['offers'], requests=options['requests'],
+                join_requests=options['join_requests'], seed=options['seed'],
+            )
+            dataset.id_token, jwks = data.login_token()
+            jwks_cache.clear()
+            jwks_cache.fetcher = static_fetcher(jwks)
+            self.stdout.write(f'Seeded {connection.vendor} in {time.perf_counter() - start:.1f}s')
+
+            rng = random.Random(options['seed'])
+            results = [
+                run_endpoint(endpoint, dataset, rng, options['iterations'], cold_cache=not options['warm_cache'])
+                for endpoint in endpoints
+            ]
+        finally:
+            jwks_cache.fetcher = fetcher
+            jwks_cache.clear()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self.report(results, options)
+
+    def report(self, results, options):
+        header = f'{"endpoint":<30} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"req/s":>8} {"queries":>8}  budget'
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        failed = []
+        for result in results:
+            problems = [] if options['no_budgets'] else result.violations(options['budget_scale'])
+            line = (
+                f'{result.endpoint.name:<30} {result.percentile(50):>8.2f} {result.percentile(95):>8.2f} '
+                f'{result.percentile(99):>8.2f} {result.throughput:>8.0f} {result.max_queries:>8}  '
+            )
+            if problems:
+                failed.append(result.endpoint.name)
+                self.stdout.write(line + self.style.ERROR('; '.join(problems)))
+            else:
+                self.stdout.write(line + self.style.SUCCESS('ok'))
+        if failed:
+            raise CommandError(f'Budget exceeded: {", ".join(failed)}')
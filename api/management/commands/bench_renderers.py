@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from api.benchmarks import data
+from api.benchmarks.serialization import LISTINGS, fast_json_backend, measure
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the ModelSerializer list path with the .values() path and the JSON, fast JSON and '
+        'MessagePack renderers, reporting bytes on the wire and CPU time per 1,000 rows.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000, help='Rows per listing.')
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            data.generate(communities=1, users=200, members=200, posts=rows, offers=rows, requests=rows,
+                          join_requests=0, seed=options['seed'])
+            results = [result for listing in LISTINGS for result in measure(listing, rows, options['iterations'])]
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self.stdout.write(f'Fast JSON encoder: {fast_json_backend()}')
+        header = f'{"listing":<10} {"path":<18} {"bytes/1k rows":>14} {"CPU ms/1k rows":>15} {"vs serializer":>14}'
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        baseline = {}
+        for result in results:
+            base = baseline.setdefault(result.listing, result)
+            speedup = base.cpu_ms_per_1000 / result.cpu_ms_per_1000 if result.cpu_ms_per_1000 else 0
+            self.stdout.write(
+                f'{result.listing:<10} {result.path:<18} {result.bytes_per_1000:>14.0f} '
+                f'{result.cpu_ms_per_1000:>15.2f} {speedup:>13.1f}x'
+            )
@@ -0,0 +1,35 @@
+import statistics
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.benchmarks import startup
+
+
+class Command(BaseCommand):
+    help = (
+        'Start fresh interpreters the way a new worker starts and report the time to a loaded app and '
+        'to the first response, plus the slowest top-level imports. Exits non-zero over --budget-ms.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=10)
+        parser.add_argument('--imports', type=int, default=15, help='How many of the slowest imports to list.')
+        parser.add_argument('--budget-ms', type=float, default=None,
+                            help='Fail when the median time to the first response exceeds this.')
+
+    def handle(self, *args, **options):
+        result = startup.measure(options['runs'], options['imports'])
+        header = f'{"":<16} {"median ms":>10} {"min ms":>8} {"max ms":>8}'
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for label, samples in (('app loaded', result.ready_ms), ('first response', result.first_request_ms)):
+            self.stdout.write(f'{label:<16} {statistics.median(samples):>10.1f} {min(samples):>8.1f} '
+                              f'{max(samples):>8.1f}')
+        self.stdout.write('')
+        self.stdout.write('Slowest top-level imports (cumulative ms, under -X importtime):')
+        for cumulative_ms, module in result.imports:
+            self.stdout.write(f'{cumulative_ms:>10.1f}  {module}')
+
+        median = statistics.median(result.first_request_ms)
+        if options['budget_ms'] is not None and median > options['budget_ms']:
+            raise CommandError(f'Median first response {median:.1f} ms is over the {options["budget_ms"]:.0f} ms budget.')
@@ -0,0 +1,63 @@
+import logging
+import os
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from api.benchmarks import data
+from api.benchmarks.contention import STRATEGIES, race
+from api import transitions
+from api.models import Offers
+
+
+class Command(BaseCommand):
+    help = (
+        'Race concurrent acceptors for the same offers, once through update_offer_status (a conditional '
+        'UPDATE) and once with the old read-check-save, and count lost updates: acceptors told they won '
+        'when someone else did too.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--offers', type=int, default=50, help='Offers to race for, per strategy.')
+        parser.add_argument('--acceptors', type=int, default=8, help='Concurrent acceptors per offer.')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        if connection.vendor == 'sqlite':
+            # Every thread opens its own connection, which the in-memory
+            # test database can't share for writes.
+            connection.settings_dict['TEST']['NAME'] = os.path.join(tempfile.mkdtemp(), 'bench_transitions.sqlite3')
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            dataset = data.generate(communities=1, users=options['acceptors'] + 1, members=options['acceptors'],
+                                    posts=0, offers=options['offers'] * len(STRATEGIES), requests=0,
+                                    join_requests=0, seed=options['seed'])
+            offer_ids = dataset.offers[dataset.communities[0]]
+            results = []
+            for i, strategy in enumerate(STRATEGIES):
+                ids = offer_ids[i * options['offers']:(i + 1) * options['offers']]
+                results.append(race(strategy, ids, options['acceptors']))
+                accepted = Offers.objects.filter(id__in=ids, status=transitions.ACCEPTED).count()
+                if accepted != len(ids):
+                    raise CommandError(f'{strategy}: {accepted} of {len(ids)} offers ended up accepted')
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        header = f'{"strategy":<20} {"offers":>6} {"acceptors":>9} {"wins":>6} {"lost updates":>12} {"other":>14}'
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for result in results:
+            other = ', '.join(f'{code}x{count}' for code, count in sorted(result.codes.items(), key=str)
+                              if code != 200)
+            self.stdout.write(f'{result.strategy:<20} {result.offers:>6} {result.acceptors:>9} '
+                              f'{sum(result.wins):>6} {result.lost_updates:>12} {other:>14}')
+        conditional = next(result for result in results if result.strategy == 'conditional-update')
+        if conditional.lost_updates or any(count != 1 for count in conditional.wins):
+            raise CommandError('Conditional updates lost an update or accepted no one.')
+        self.stdout.write(self.style.SUCCESS('update_offer_status: exactly one acceptor won every offer.'))
@@ -0,0 +1,32 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate the OpenAPI schema once and write it to OPENAPI_SCHEMA_FILE, which schema/ then '
+        'serves as a static file. Run it as part of every build or deploy.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', default=None, help='Where to write it. Defaults to OPENAPI_SCHEMA_FILE.')
+
+    def handle(self, *args, **options):
+        from drf_spectacular.generators import SchemaGenerator
+        from drf_spectacular.renderers import OpenApiJsonRenderer
+
+        start = time.perf_counter()
+        path = str(options['file'] or settings.OPENAPI_SCHEMA_FILE)
+        schema = SchemaGenerator().get_schema(request=None, public=True)
+        content = OpenApiJsonRenderer().render(schema, renderer_context={})
+        # Write then rename, so a server never reads a half-written file.
+        partial = f'{path}.tmp'
+        with open(partial, 'wb') as f:
+            f.write(content)
+        os.replace(partial, path)
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {len(schema.get("paths", {}))} paths ({len(content)} bytes) to {path} '
+            f'in {time.perf_counter() - start:.1f}s'))
@@ -0,0 +1,45 @@
+import os
+import sys
+
+from django.core.management.base import BaseCommand
+
+from api import bulk
+
+
+class Command(BaseCommand):
+    help = (
+        'Write users, profiles, communities, joins or posts to CSV or JSONL (or - for stdout) in the '
+        'format import_data reads. Rows are streamed from the database, never held in memory.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('table', choices=sorted(bulk.TABLES))
+        parser.add_argument('path', nargs='?', default='-', help='File to write, or - (default) for stdout.')
+        parser.add_argument('--format', choices=bulk.FORMATS,
+                            help='Defaults to the file extension, or csv when writing stdout.')
+        parser.add_argument('--community', type=int, help='Only rows belonging to this community.')
+        parser.add_argument('--batch-size', type=int, default=bulk.BATCH_SIZE, help='Rows fetched per round trip.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+        # Keep stdout clean for the data when that's where it goes.
+        report = self.stderr if path == '-' else self.stdout
+        stream = sys.stdout if path == '-' else open(path, 'w', newline='', encoding='utf-8')
+
+        def progress(rows):
+            if options['verbosity'] > 1:
+                report.write(f'{rows} rows...', style_func=str)
+
+        try:
+            result = bulk.export_rows(options['table'], stream, fmt, options['community'],
+                                      options['batch_size'], progress)
+        except BrokenPipeError:
+            # The reader went away, e.g. piped into head; stop quietly.
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+            return
+        finally:
+            if stream is not sys.stdout:
+                stream.close()
+        report.write(f'Exported {result.rows} {options["table"]} in {result.seconds:.1f}s '
+                     f'({result.rows_per_second:,.0f} rows/s)', style_func=str)
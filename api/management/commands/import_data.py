@@ -0,0 +1,49 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import bulk
+
+
+class Command(BaseCommand):
+    help = (
+        'Load users, profiles, communities, joins or posts from a CSV or JSONL file (or - for stdin) in '
+        'chunked bulk inserts. The file is streamed, so memory use does not grow with its size.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('table', choices=sorted(bulk.TABLES))
+        parser.add_argument('path', help='File to read, or - for stdin.')
+        parser.add_argument('--format', choices=bulk.FORMATS,
+                            help='Defaults to the file extension, or csv when reading stdin.')
+        parser.add_argument('--batch-size', type=int, default=bulk.BATCH_SIZE, help='Rows per INSERT/transaction.')
+        parser.add_argument('--ignore-conflicts', action='store_true',
+                            help='Skip rows that clash with existing ones (e.g. an email already taken).')
+        parser.add_argument('--skip-invalid', action='store_true',
+                            help='Skip rows that fail validation instead of stopping.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+        stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+
+        def progress(rows):
+            if options['verbosity'] > 1:
+                self.stdout.write(f'{rows} rows...')
+
+        try:
+            result = bulk.import_rows(options['table'], stream, fmt, options['batch_size'],
+                                      options['ignore_conflicts'], options['skip_invalid'], progress)
+        except bulk.BulkError as e:
+            raise CommandError(f'{e} ({e.result.rows} rows were imported before it)')
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        message = (f'Imported {result.rows} {options["table"]} in {result.seconds:.1f}s '
+                   f'({result.rows_per_second:,.0f} rows/s)')
+        if result.skipped:
+            message += f', skipped {result.skipped} invalid'
+        self.stdout.write(self.style.SUCCESS(message))
+        if options['table'] == 'posts' and options['ignore_conflicts']:
+            self.stdout.write('Posts were not indexed for search; run rebuild_search_index --kind post.')
@@ -0,0 +1,22 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.models import Tombstone
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete tombstones older than SYNC_TOMBSTONE_RETENTION_DAYS. Clients whose sync token is older '
+        'than that get a full resync, so nothing still needs them.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None, help='Override the retention period.')
+
+    def handle(self, *args, **options):
+        days = options['days'] if options['days'] is not None else settings.SYNC_TOMBSTONE_RETENTION_DAYS
+        deleted, _ = Tombstone.objects.filter(deleted_at__lt=timezone.now() - timedelta(days=days)).delete()
+        self.stdout.write(f'Deleted {deleted} tombstones older than {days} days')
@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api import clusters
+from api.caching import invalidate_communities
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the map cells (community counts and coordinate sums per geohash prefix) from the '
+        'communities table, e.g. after communities were bulk-loaded or moved.'
+    )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        cells = clusters.rebuild()
+        invalidate_communities()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {cells} cells in {time.perf_counter() - start:.1f}s'))
@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the search index for posts, offers and requests, e.g. after rows were bulk-loaded.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', action='append', choices=sorted(search.SOURCES),
+                            help='Only rebuild this kind. May be repeated.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        counts = search.rebuild(options['kind'], options['batch_size'])
+        for kind, count in counts.items():
+            self.stdout.write(f'{kind}: {count} indexed')
+        self.stdout.write(self.style.SUCCESS(f'Done in {time.perf_counter() - start:.1f}s'))
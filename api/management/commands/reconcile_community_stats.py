@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api import stats
+from api.caching import invalidate_community
+from api.models import Community
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the per-community counters (open offers, open requests, members, pending join '
+        'requests) from the source tables and fix any that drifted, e.g. after rows were bulk-loaded.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--community', type=int, action='append', help='Only this community. May be repeated.')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Communities per transaction.')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        ids = options['community'] or Community.objects.order_by('pk').values_list('pk', flat=True)
+        checked, fixed = 0, []
+        batch = []
+        for comm_id in ids:
+            batch.append(comm_id)
+            if len(batch) == options['batch_size']:
+                fixed += stats.reconcile(batch)
+                checked += len(batch)
+                batch = []
+        if batch:
+            fixed += stats.reconcile(batch)
+            checked += len(batch)
+        for comm_id in fixed:
+            invalidate_community(comm_id)
+        if fixed and options['verbosity'] > 1:
+            self.stdout.write(f'Fixed: {", ".join(map(str, sorted(fixed)))}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Checked {checked} communities, fixed {len(fixed)} in {time.perf_counter() - start:.1f}s'))
@@ -0,0 +1,51 @@
+from django.conf import settings
+
+from .metrics import registry
+from .models import Join
+from .usercache import UserCache, user_key
+
+
+class MembershipCache(UserCache):
+    """
+    Each user's communities, as ``{comm_id: is_admin}``, read with one
+    query and then kept in a bounded LRU cache. Entries are dropped when
+    one of the user's Join rows is saved or deleted in this process.
+    """
+
+    metric = 'neighborly_membership_cache'
+    description = 'Membership'
+
+    def __init__(self, maxsize=None, ttl=None):
+        super().__init__(maxsize or settings.MEMBERSHIP_CACHE_SIZE, ttl or settings.MEMBERSHIP_CACHE_TTL)
+
+    def get(self, user_id):
+        user_id = user_key(user_id)
+        found, missing, generation = self.cached([user_id])
+        if not missing:
+            return found[user_id]
+        communities = dict(Join.objects.filter(user_id=user_id).values_list('comm_id', 'is_admin'))
+        self.store({user_id: communities}, generation)
+        return communities
+
+    async def aget(self, user_id):
+        user_id = user_key(user_id)
+        found, missing, generation = self.cached([user_id])
+        if not missing:
+            return found[user_id]
+        rows = Join.objects.filter(user_id=user_id).values_list('comm_id', 'is_admin')
+        communities = {comm_id: is_admin async for comm_id, is_admin in rows}
+        self.store({user_id: communities}, generation)
+        return communities
+
+    def is_member(self, user_id, comm_id):
+        return comm_id in self.get(user_id)
+
+    async def ais_member(self, user_id, comm_id):
+        return comm_id in await self.aget(user_id)
+
+    def is_admin(self, user_id, comm_id):
+        return bool(self.get(user_id).get(comm_id))
+
+
+memberships = MembershipCache()
+registry.register_collector(memberships.collect)
@@ -0,0 +1,104 @@
+import threading
+from bisect import bisect_left
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self._series = {}
+
+    def observe(self, labels, value):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self, lines):
+        lines.append(f'# HELP {self.name} {self.help_text}')
+        lines.append(f'# TYPE {self.name} histogram')
+        for labels, (counts, total) in sorted(self._series.items()):
+            label_text = _labels(labels)
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+            cumulative += counts[-1]
+            lines.append(f'{self.name}_bucket{{{label_text},le="+Inf"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{label_text}}} {total}')
+            lines.append(f'{self.name}_count{{{label_text}}} {cumulative}')
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self._series = {}
+
+    def inc(self, labels, value=1):
+        self._series[labels] = self._series.get(labels, 0) + value
+
+    def render(self, lines):
+        lines.append(f'# HELP {self.name} {self.help_text}')
+        lines.append(f'# TYPE {self.name} counter')
+        for labels, value in sorted(self._series.items()):
+            lines.append(f'{self.name}{{{_labels(labels)}}} {value}')
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels):
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in labels)
+
+
+class Registry:
+    """
+    In-process request metrics. Series are labelled by view name, method
+    and status class only, so the number of series stays bounded however
+    many distinct URLs are served.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency = Histogram('neighborly_request_duration_seconds', 'Request latency by view.', LATENCY_BUCKETS)
+        self.queries = Histogram('neighborly_request_queries', 'SQL queries per request by view.', QUERY_BUCKETS)
+        self.response_size = Histogram('neighborly_response_size_bytes', 'Response body size by view.', SIZE_BUCKETS)
+        self.sql_time = Counter('neighborly_sql_seconds_total', 'Time spent in SQL by view.')
+        self.requests = Counter('neighborly_requests_total', 'Requests by view, method and status class.')
+        self._metrics = [self.requests, self.latency, self.queries, self.sql_time, self.response_size]
+        self._collectors = []
+
+    def record(self, view, method, status_code, duration, query_count, sql_duration, size):
+        labels = (('view', view), ('method', method), ('status', f'{status_code // 100}xx'))
+        view_labels = (('view', view),)
+        with self._lock:
+            self.requests.inc(labels)
+            self.latency.observe(view_labels, duration)
+            self.queries.observe(view_labels, query_count)
+            self.sql_time.inc(view_labels, sql_duration)
+            if size is not None:
+                self.response_size.observe(view_labels, size)
+
+    def register_collector(self, collector):
+        """``collector(lines)`` appends extra Prometheus text lines on every scrape."""
+        self._collectors.append(collector)
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for metric in self._metrics:
+                metric.render(lines)
+        for collector in self._collectors:
+            collector(lines)
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
@@ -0,0 +1,124 @@
+import heapq
+import logging
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from .metrics import registry
+
+slow_logger = logging.getLogger('api.slow_requests')
+KNOWN_METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+# The recorder for the request being served. Context variables follow the
+# request into sync_to_async threads, so queries issued by the async ORM are
+# attributed to the right request too.
+current_recorder = ContextVar('current_recorder', default=None)
+
+
+class QueryRecorder:
+    """Counts and times every SQL statement issued while it is current."""
+
+    def __init__(self, keep=3):
+        self.keep = keep
+        self.count = 0
+        self.duration = 0.0
+        self.slowest = []
+
+    def add(self, duration, sql):
+        self.count += 1
+        self.duration += duration
+        entry = (duration, self.count, sql)
+        if len(self.slowest) < self.keep:
+            heapq.heappush(self.slowest, entry)
+        else:
+            heapq.heappushpop(self.slowest, entry)
+
+    def worst(self):
+        return sorted(self.slowest, reverse=True)
+
+
+def record_query(execute, sql, params, many, context):
+    recorder = current_recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        recorder.add(time.perf_counter() - start, sql)
+
+
+def install_query_recorder(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+connection_created.connect(install_query_recorder)
+
+
+def view_label(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return '<unmatched>'
+    return match.view_name
+
+
+class MetricsMiddleware:
+    """
+    Records latency, SQL query count and time, and response size per view
+    into ``api.metrics.registry``, and logs requests slower than
+    ``SLOW_REQUEST_THRESHOLD_MS`` together with their worst queries.
+    Works in both sync and async stacks so async views stay on the loop.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        for alias in connections:
+            install_query_recorder(connections[alias])
+        recorder = QueryRecorder()
+        token = current_recorder.set(recorder)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        self.record(request, response, recorder, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        recorder = QueryRecorder()
+        token = current_recorder.set(recorder)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        self.record(request, response, recorder, time.perf_counter() - start)
+        return response
+
+    def record(self, request, response, recorder, duration):
+        view = view_label(request)
+        method = request.method if request.method in KNOWN_METHODS else 'OTHER'
+        size = None if response.streaming else len(response.content)
+        registry.record(view, method, response.status_code, duration,
+                        recorder.count, recorder.duration, size)
+
+        if duration * 1000 >= settings.SLOW_REQUEST_THRESHOLD_MS:
+            worst = '; '.join(f'{query_time * 1000:.1f}ms {sql[:300]}' for query_time, _, sql in recorder.worst())
+            slow_logger.warning('Slow request %s %s (%s): %.0fms, %d queries, %.0fms SQL. Worst: %s',
+                                request.method, request.path, view, duration * 1000, recorder.count,
+                                recorder.duration * 1000, worst or 'none')
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.5 on 2026-10-18 17:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_community_geohash'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='offers',
+            index=models.Index(fields=['comm_id', 'id'], name='offers_comm_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='posts',
+            index=models.Index(fields=['comm_id', 'date', 'time', 'id'], name='posts_comm_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='requests',
+            index=models.Index(fields=['comm_id', 'id'], name='requests_comm_keyset_idx'),
+        ),
+    ]
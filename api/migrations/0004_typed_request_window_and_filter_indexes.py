@@ -0,0 +1,113 @@
+from datetime import datetime
+
+from django.db import migrations, models
+
+WINDOW_FIELDS = {
+    'from_time': models.TimeField,
+    'to_time': models.TimeField,
+    'from_date': models.DateField,
+    'to_date': models.DateField,
+}
+TIME_FORMATS = ['%H:%M', '%H:%M:%S', '%H:%M:%S.%f', '%I:%M %p', '%I:%M:%S %p']
+DATE_FORMATS = ['%Y-%m-%d', '%d-%m-%Y', '%d/%m/%Y', '%Y/%m/%d']
+
+
+def _parse(value, formats, convert):
+    value = (value or '').strip()
+    if not value:
+        return None
+    for fmt in formats:
+        try:
+            return convert(datetime.strptime(value, fmt))
+        except ValueError:
+            continue
+    return None
+
+
+def backfill_typed_window(apps, schema_editor):
+    Requests = apps.get_model('api', 'Requests')
+    fields = ['from_time', 'to_time', 'from_date', 'to_date']
+    batch = []
+    for request in Requests.objects.only('id', *fields).iterator(chunk_size=2000):
+        request.typed_from_time = _parse(request.from_time, TIME_FORMATS, lambda d: d.time())
+        request.typed_to_time = _parse(request.to_time, TIME_FORMATS, lambda d: d.time())
+        request.typed_from_date = _parse(request.from_date, DATE_FORMATS, lambda d: d.date())
+        request.typed_to_date = _parse(request.to_date, DATE_FORMATS, lambda d: d.date())
+        batch.append(request)
+        if len(batch) >= 2000:
+            Requests.objects.bulk_update(batch, [f'typed_{field}' for field in fields])
+            batch = []
+    if batch:
+        Requests.objects.bulk_update(batch, [f'typed_{field}' for field in fields])
+
+
+def restore_text_window(apps, schema_editor):
+    Requests = apps.get_model('api', 'Requests')
+    fields = ['from_time', 'to_time', 'from_date', 'to_date']
+    batch = []
+    for request in Requests.objects.only('id', *[f'typed_{field}' for field in fields]).iterator(chunk_size=2000):
+        for field in fields:
+            value = getattr(request, f'typed_{field}')
+            if value is not None:
+                value = value.strftime('%H:%M') if field.endswith('time') else value.isoformat()
+            setattr(request, field, value)
+        batch.append(request)
+        if len(batch) >= 2000:
+            Requests.objects.bulk_update(batch, fields)
+            batch = []
+    if batch:
+        Requests.objects.bulk_update(batch, fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_keyset_indexes'),
+    ]
+
+    operations = [
+        *[
+            migrations.AddField(
+                model_name='requests',
+                name=f'typed_{name}',
+                field=field(blank=True, null=True),
+            )
+            for name, field in WINDOW_FIELDS.items()
+        ],
+        migrations.RunPython(backfill_typed_window, restore_text_window),
+        *[
+            migrations.RemoveField(
+                model_name='requests',
+                name=name,
+            )
+            for name in WINDOW_FIELDS
+        ],
+        *[
+            migrations.RenameField(
+                model_name='requests',
+                old_name=f'typed_{name}',
+                new_name=name,
+            )
+            for name in WINDOW_FIELDS
+        ],
+        migrations.AddIndex(
+            model_name='requests',
+            index=models.Index(condition=models.Q(('offer_id__isnull', True)), fields=['comm_id', 'id'], name='requests_public_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='requests',
+            index=models.Index(condition=models.Q(('offer_id__isnull', True)), fields=['comm_id', 'from_date', 'to_date'], name='requests_public_window_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='requests',
+            index=models.Index(fields=['comm_id', 'user_id', 'id'], name='requests_comm_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='offers',
+            index=models.Index(fields=['comm_id', 'user_id', 'id'], name='offers_comm_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='joinrequest',
+            index=models.Index(fields=['comm_id', 'admin_id', 'id'], name='joinrequest_comm_admin_idx'),
+        ),
+    ]
@@ -0,0 +1,137 @@
+# Generated by Django 5.1.5 on 2026-10-18 17:22
+
+import re
+from collections import Counter
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', body), 'B')"
+)
+
+
+def add_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        f'ALTER TABLE api_searchdocument ADD COLUMN search_vector tsvector '
+        f'GENERATED ALWAYS AS ({SEARCH_VECTOR}) STORED'
+    )
+    schema_editor.execute(
+        'CREATE INDEX searchdocument_vector_idx ON api_searchdocument USING GIN (search_vector)'
+    )
+
+
+def drop_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS searchdocument_vector_idx')
+    schema_editor.execute('ALTER TABLE api_searchdocument DROP COLUMN IF EXISTS search_vector')
+
+
+# A frozen copy of api.search's tokenizer and weights as they were when this
+# migration was written, so later changes there can't break it.
+TOKEN_RE = re.compile(r'[^\W_]+')
+STOPWORDS = frozenset(
+    'a an and are as at be but by for from has have i in is it me my of on or our so that the this to was we '
+    'will with you your'.split()
+)
+
+
+def _stem(token):
+    if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+        return token[:-1]
+    return token
+
+
+def tokenize(text):
+    return [
+        _stem(token)[:64]
+        for token in TOKEN_RE.findall(text.lower())
+        if (len(token) > 1 or token.isdigit()) and token not in STOPWORDS
+    ]
+
+
+def term_weights(title, body):
+    counts = Counter()
+    for token in tokenize(title):
+        counts[token] += 2.0
+    for token in tokenize(body):
+        counts[token] += 1
+    norm = 1.2 * (1 - 0.75 + 0.75 * sum(counts.values()) / 30.0)
+    return {term: tf * 2.2 / (tf + norm) for term, tf in counts.items()}
+
+
+def backfill_documents(apps, schema_editor):
+    SearchDocument = apps.get_model('api', 'SearchDocument')
+    SearchTerm = apps.get_model('api', 'SearchTerm')
+    with_terms = schema_editor.connection.vendor != 'postgresql'
+    sources = [
+        ('post', apps.get_model('api', 'Posts'), lambda obj: ('', obj.text_content)),
+        ('offer', apps.get_model('api', 'Offers'), lambda obj: (obj.title, obj.description)),
+        ('request', apps.get_model('api', 'Requests'), lambda obj: (obj.title, obj.description)),
+    ]
+
+    def flush(documents):
+        SearchDocument.objects.bulk_create(documents)
+        if with_terms:
+            SearchTerm.objects.bulk_create([
+                SearchTerm(document_id=document.pk, comm_id_id=document.comm_id_id, term=term, weight=weight)
+                for document in documents
+                for term, weight in term_weights(document.title, document.body).items()
+            ], batch_size=1000)
+
+    for kind, model, text in sources:
+        documents = []
+        for obj in model.objects.iterator(chunk_size=1000):
+            title, body = text(obj)
+            documents.append(SearchDocument(kind=kind, object_id=obj.pk, comm_id_id=obj.comm_id_id,
+                                            user_id_id=obj.user_id_id, title=title, body=body))
+            if len(documents) == 1000:
+                flush(documents)
+                documents = []
+        flush(documents)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_typed_request_window_and_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('post', 'Post'), ('offer', 'Offer'), ('request', 'Request')], max_length=10)),
+                ('object_id', models.BigIntegerField()),
+                ('title', models.CharField(blank=True, max_length=100)),
+                ('body', models.CharField(max_length=5000)),
+                ('comm_id', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.community')),
+                ('user_id', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.user')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('weight', models.FloatField()),
+                ('comm_id', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='api.community')),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='terms', to='api.searchdocument')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='searchdocument',
+            constraint=models.UniqueConstraint(fields=('kind', 'object_id'), name='searchdocument_object_uniq'),
+        ),
+        migrations.AddIndex(
+            model_name='searchterm',
+            index=models.Index(fields=['comm_id', 'term'], name='searchterm_comm_term_idx'),
+        ),
+        migrations.RunPython(add_search_vector, drop_search_vector),
+        migrations.RunPython(backfill_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,108 @@
+# Generated by Django 5.1.5 on 2026-10-18 17:31
+
+from datetime import datetime, timezone
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def backfill_post_timestamps(apps, schema_editor):
+    # Posts already record when they were made; other rows start from now.
+    Posts = apps.get_model('api', 'Posts')
+    posts = []
+    for post in Posts.objects.only('id', 'date', 'time').iterator(chunk_size=1000):
+        post.created_at = post.updated_at = datetime.combine(post.date, post.time, tzinfo=timezone.utc)
+        posts.append(post)
+        if len(posts) == 1000:
+            Posts.objects.bulk_update(posts, ['created_at', 'updated_at'])
+            posts = []
+    Posts.objects.bulk_update(posts, ['created_at', 'updated_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('comm_id', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='joinrequest',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='joinrequest',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='offers',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='offers',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='posts',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='posts',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='requests',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='requests',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(backfill_post_timestamps, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='joinrequest',
+            index=models.Index(fields=['comm_id', 'updated_at', 'id'], name='joinrequest_comm_sync_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='offers',
+            index=models.Index(fields=['comm_id', 'updated_at', 'id'], name='offers_comm_sync_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='posts',
+            index=models.Index(fields=['comm_id', 'updated_at', 'id'], name='posts_comm_sync_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='requests',
+            index=models.Index(fields=['comm_id', 'updated_at', 'id'], name='requests_comm_sync_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['comm_id', 'deleted_at', 'id'], name='tombstone_comm_sync_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['deleted_at'], name='tombstone_deleted_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.1.5 on 2026-10-18 17:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_community_stats(apps, schema_editor):
+    Community = apps.get_model('api', 'Community')
+    CommunityStats = apps.get_model('api', 'CommunityStats')
+    counters = {
+        'open_offers': (apps.get_model('api', 'Offers'), {'status': 1}),
+        'open_requests': (apps.get_model('api', 'Requests'), {'status': 1}),
+        'members': (apps.get_model('api', 'Join'), {}),
+        'pending_join_requests': (apps.get_model('api', 'JoinRequest'), {'accepted': 1}),
+    }
+    counts = {comm_id: {} for comm_id in Community.objects.values_list('pk', flat=True)}
+    for name, (model, condition) in counters.items():
+        rows = model.objects.filter(**condition).order_by().values('comm_id').annotate(count=Count('pk'))
+        for row in rows:
+            counts[row['comm_id']][name] = row['count']
+    CommunityStats.objects.bulk_create(
+        [CommunityStats(comm_id_id=comm_id, **values) for comm_id, values in counts.items()], batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_sync_timestamps_and_tombstones'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CommunityStats',
+            fields=[
+                ('comm_id', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='api.community')),
+                ('open_offers', models.IntegerField(default=0)),
+                ('open_requests', models.IntegerField(default=0)),
+                ('members', models.IntegerField(default=0)),
+                ('pending_join_requests', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(backfill_community_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.1.5 on 2026-10-18 17:57
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import Substr
+
+
+def backfill_community_cells(apps, schema_editor):
+    Community = apps.get_model('api', 'Community')
+    CommunityCell = apps.get_model('api', 'CommunityCell')
+    communities = Community.objects.exclude(geohash='').order_by()
+    for precision in range(1, 7):
+        rows = communities.annotate(cell=Substr('geohash', 1, precision)).values('cell').annotate(
+            count=Count('pk'), latitude_sum=Sum('latitude'), longitude_sum=Sum('longtitude'))
+        CommunityCell.objects.bulk_create([CommunityCell(**row) for row in rows], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_community_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CommunityCell',
+            fields=[
+                ('cell', models.CharField(max_length=12, primary_key=True, serialize=False)),
+                ('count', models.IntegerField(default=0)),
+                ('latitude_sum', models.FloatField(default=0)),
+                ('longitude_sum', models.FloatField(default=0)),
+            ],
+        ),
+        migrations.RunPython(backfill_community_cells, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.5 on 2026-10-18 18:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_community_cells'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='offers',
+            index=models.Index(fields=['comm_id', 'created_at', 'id'], name='offers_comm_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='posts',
+            index=models.Index(fields=['comm_id', 'created_at', 'id'], name='posts_comm_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='requests',
+            index=models.Index(condition=models.Q(('offer_id__isnull', True), ('status', 1)), fields=['comm_id', 'created_at', 'id'], name='requests_open_feed_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.5 on 2026-10-18 19:12
+
+from django.db import migrations
+from django.db.models import Count
+
+
+def recount_open_requests(apps, schema_editor):
+    # open_requests now only counts requests without an offer.
+    CommunityStats = apps.get_model('api', 'CommunityStats')
+    Requests = apps.get_model('api', 'Requests')
+    counts = dict(
+        Requests.objects.filter(status=1, offer_id__isnull=True).order_by().values('comm_id')
+        .annotate(count=Count('pk')).values_list('comm_id', 'count')
+    )
+    rows = list(CommunityStats.objects.all())
+    for row in rows:
+        row.open_requests = counts.get(row.comm_id_id, 0)
+    CommunityStats.objects.bulk_update(rows, ['open_requests'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(recount_open_requests, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,11 @@
 from django.db import models
 import uuid
+from . import geo
+
+# Offer and request ``status``, and join request ``accepted``, values.
+OPEN = PENDING = 1
+ACCEPTED = 2
+DECLINED = 0
 
 class User(models.Model):
     id = models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True)
@@ -25,6 +31,11 @@ class Community(models.Model):
     location = models.CharField(max_length=100)
     latitude = models.FloatField()
     longtitude = models.FloatField()
+    geohash = models.CharField(max_length=12, blank=True, editable=False, db_index=True)
+
+    def save(self, *args, **kwargs):
+        self.geohash = geo.encode(float(self.latitude), float(self.longtitude))
+        super().save(*args, **kwargs)
 
 class JoinRequest(models.Model):
     
@@ -32,6 +43,14 @@ class JoinRequest(models.Model):
     member_id = models.ForeignKey(User, on_delete=models.CASCADE, related_name="member")
     comm_id = models.ForeignKey(Community, on_delete=models.CASCADE)
     accepted = models.IntegerField(default=1)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['comm_id', 'admin_id', 'id'], name='joinrequest_comm_admin_idx'),
+            models.Index(fields=['comm_id', 'updated_at', 'id'], name='joinrequest_comm_sync_idx'),
+        ]
     
 
 class Join(models.Model):
@@ -48,6 +67,15 @@ class Posts(models.Model):
     text_content = models.CharField(max_length=5000)
     date = models.DateField(auto_now_add=True)
     time = models.TimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['comm_id', 'date', 'time', 'id'], name='posts_comm_keyset_idx'),
+            models.Index(fields=['comm_id', 'updated_at', 'id'], name='posts_comm_sync_idx'),
+            models.Index(fields=['comm_id', 'created_at', 'id'], name='posts_comm_feed_idx'),
+        ]
 
 class Offers(models.Model):
     
@@ -57,17 +85,131 @@ class Offers(models.Model):
     title = models.CharField(max_length=100)
     description = models.CharField(max_length=500)
     status = models.IntegerField(default=1)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['comm_id', 'id'], name='offers_comm_keyset_idx'),
+            models.Index(fields=['comm_id', 'updated_at', 'id'], name='offers_comm_sync_idx'),
+            models.Index(fields=['comm_id', 'user_id', 'id'], name='offers_comm_user_idx'),
+            models.Index(fields=['comm_id', 'created_at', 'id'], name='offers_comm_feed_idx'),
+        ]
     
 class Requests(models.Model):
+
+    WINDOW_FIELDS = ('from_time', 'to_time', 'from_date', 'to_date')
+    # The app shows and sends window times as HH:MM, as when they were text.
+    WINDOW_TIME_FORMAT = '%H:%M'
     
     user_id = models.ForeignKey(User, on_delete=models.CASCADE, related_name="user_request")
     comm_id = models.ForeignKey(Community, on_delete=models.CASCADE)
     request_type = models.CharField(max_length=30)
     title = models.CharField(max_length=100)
     description = models.CharField(max_length=500)
-    from_time = models.CharField(max_length=20,null=True,blank=True)
-    to_time = models.CharField(max_length=20,null=True,blank=True)
-    from_date = models.CharField(max_length=20,null=True,blank=True)
-    to_date = models.CharField(max_length=20,null=True,blank=True)
+    from_time = models.TimeField(null=True,blank=True)
+    to_time = models.TimeField(null=True,blank=True)
+    from_date = models.DateField(null=True,blank=True)
+    to_date = models.DateField(null=True,blank=True)
     offer_id = models.ForeignKey(Offers, on_delete=models.CASCADE,null=True,blank=True)
-    status = models.IntegerField(default=1)
\ No newline at end of file
+    status = models.IntegerField(default=1)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['comm_id', 'id'], name='requests_comm_keyset_idx'),
+            models.Index(fields=['comm_id', 'updated_at', 'id'], name='requests_comm_sync_idx'),
+            models.Index(fields=['comm_id', 'id'], condition=models.Q(offer_id__isnull=True), name='requests_public_idx'),
+            models.Index(fields=['comm_id', 'from_date', 'to_date'], condition=models.Q(offer_id__isnull=True), name='requests_public_window_idx'),
+            models.Index(fields=['comm_id', 'user_id', 'id'], name='requests_comm_user_idx'),
+            models.Index(fields=['comm_id', 'created_at', 'id'], condition=models.Q(offer_id__isnull=True, status=PENDING),
+                         name='requests_open_feed_idx'),
+        ]
+
+
+class CommunityStats(models.Model):
+    """
+    Per-community counts kept in step with the source rows by api/stats.py,
+    in the same transaction as each create, delete or status change, so
+    reading them is a primary key lookup. ``reconcile_community_stats``
+    recomputes them from the source tables.
+    """
+
+    comm_id = models.OneToOneField(Community, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    open_offers = models.IntegerField(default=0)
+    open_requests = models.IntegerField(default=0)
+    members = models.IntegerField(default=0)
+    pending_join_requests = models.IntegerField(default=0)
+
+
+class CommunityCell(models.Model):
+    """
+    How many communities lie in a geohash cell, and the sums of their
+    coordinates, for every cell prefix up to ``clusters.CLUSTER_PRECISION``
+    characters. api/clusters.py keeps the rows in step as communities are
+    created and deleted, so a map cluster and its centroid are one primary
+    key lookup. ``rebuild_community_cells`` recomputes them.
+    """
+
+    cell = models.CharField(max_length=12, primary_key=True)
+    count = models.IntegerField(default=0)
+    latitude_sum = models.FloatField(default=0)
+    longitude_sum = models.FloatField(default=0)
+
+
+class Tombstone(models.Model):
+    """
+    Marks a deleted post, offer, request or join request so delta syncs can
+    tell clients to drop it. ``comm_id`` is a plain column rather than a
+    foreign key: tombstones are written while a community's rows are being
+    deleted, possibly along with the community itself.
+    """
+
+    kind = models.CharField(max_length=20)
+    object_id = models.BigIntegerField()
+    comm_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['comm_id', 'deleted_at', 'id'], name='tombstone_comm_sync_idx'),
+            models.Index(fields=['deleted_at'], name='tombstone_deleted_idx'),
+        ]
+
+
+class SearchDocument(models.Model):
+    """
+    One searchable post, offer or request. On Postgres the migration adds a
+    generated ``search_vector`` tsvector column with a GIN index; elsewhere
+    the document's terms are kept in SearchTerm.
+    """
+
+    POST = 'post'
+    OFFER = 'offer'
+    REQUEST = 'request'
+    KINDS = [(POST, 'Post'), (OFFER, 'Offer'), (REQUEST, 'Request')]
+
+    kind = models.CharField(max_length=10, choices=KINDS)
+    object_id = models.BigIntegerField()
+    comm_id = models.ForeignKey(Community, on_delete=models.CASCADE)
+    user_id = models.ForeignKey(User, on_delete=models.CASCADE)
+    title = models.CharField(max_length=100, blank=True)
+    body = models.CharField(max_length=5000)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='searchdocument_object_uniq'),
+        ]
+
+
+class SearchTerm(models.Model):
+    document = models.ForeignKey(SearchDocument, on_delete=models.CASCADE, related_name='terms')
+    comm_id = models.ForeignKey(Community, on_delete=models.CASCADE, db_index=False)
+    term = models.CharField(max_length=64)
+    weight = models.FloatField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['comm_id', 'term'], name='searchterm_comm_term_idx'),
+        ]
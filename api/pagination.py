@@ -0,0 +1,214 @@
+import base64
+import json
+from datetime import date, time, datetime
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import ParseError
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+CURSOR_PARAM = 'cursor'
+PAGE_SIZE_PARAM = 'page_size'
+
+MAX_OFFSET = 1000
+
+POSTS_ORDERING = ('-date', '-time', '-id')
+ID_ORDERING = ('-id',)
+# The order list endpoints returned rows in before they were paginated.
+UNPAGED_ORDERING = ('id',)
+
+
+class InvalidCursor(ParseError):
+    default_detail = 'Invalid cursor.'
+
+
+class Page:
+    def __init__(self, rows, next_cursor=None, prev_cursor=None):
+        self.rows = rows
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+
+def _json_value(value):
+    if isinstance(value, (date, time, datetime)):
+        return value.isoformat()
+    return value
+
+
+def encode_cursor(direction, values):
+    payload = json.dumps([direction, [_json_value(value) for value in values]], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, size):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        direction, values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise InvalidCursor()
+    if direction not in ('next', 'prev') or not isinstance(values, list) or len(values) != size:
+        raise InvalidCursor()
+    return direction, values
+
+
+def _query_params(request):
+    return getattr(request, 'query_params', request.GET)
+
+
+def get_page_size(request):
+    try:
+        page_size = int(_query_params(request).get(PAGE_SIZE_PARAM, DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(page_size, MAX_PAGE_SIZE))
+
+
+def _row_values(row, fields):
+    if isinstance(row, dict):
+        return [row[field] for field in fields]
+    return [getattr(row, field) for field in fields]
+
+
+def keyset_filter(ordering, values):
+    """
+    Rows strictly after ``values`` in ``ordering``, written as the expanded
+    form of a row-value comparison so every backend can use the index:
+    ``a > x OR (a = x AND b > y) OR ...``.
+    """
+    condition = Q()
+    equal = Q()
+    for field, value in zip(ordering, values):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        condition |= equal & Q(**{f'{name}__{lookup}': value})
+        equal &= Q(**{name: value})
+    return condition
+
+
+def _reverse(ordering):
+    return tuple(field[1:] if field.startswith('-') else f'-{field}' for field in ordering)
+
+
+class Keyset:
+    """
+    Keyset pagination over ``ordering``, which must end in a unique field.
+    Each page costs one indexed range scan no matter how deep it is.
+    ``queryset`` is the slice to evaluate; ``page(rows)`` builds the result.
+    """
+
+    def __init__(self, queryset, request, ordering=ID_ORDERING, page_size=None):
+        self.ordering = ordering
+        self.page_size = page_size or get_page_size(request)
+        token = _query_params(request).get(CURSOR_PARAM) if request is not None else None
+        self.direction, self.values = decode_cursor(token, len(ordering)) if token else ('next', None)
+
+        try:
+            if self.direction == 'prev':
+                queryset = queryset.filter(keyset_filter(_reverse(ordering), self.values)).order_by(*_reverse(ordering))
+            else:
+                if self.values is not None:
+                    queryset = queryset.filter(keyset_filter(ordering, self.values))
+                queryset = queryset.order_by(*ordering)
+        except (ValidationError, ValueError, TypeError):
+            raise InvalidCursor()
+        self.queryset = queryset[:self.page_size + 1]
+
+    def page(self, rows):
+        fields = [field.lstrip('-') for field in self.ordering]
+        rows = list(rows)
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if self.direction == 'prev':
+            rows.reverse()
+
+        next_cursor = prev_cursor = None
+        if rows:
+            if has_more or self.direction == 'prev':
+                next_cursor = encode_cursor('next', _row_values(rows[-1], fields))
+            if self.values is not None and (has_more or self.direction == 'next'):
+                prev_cursor = encode_cursor('prev', _row_values(rows[0], fields))
+        return Page(rows, next_cursor, prev_cursor)
+
+
+class Offset:
+    """
+    Offset pagination for results with no stable keyset, such as ranked
+    search hits. Cursors carry the offset and stop at ``MAX_OFFSET``.
+    Fetch ``limit`` rows from ``offset`` and pass them to ``page(rows)``.
+    """
+
+    def __init__(self, request, page_size=None):
+        self.page_size = page_size or get_page_size(request)
+        self.offset = 0
+        token = _query_params(request).get(CURSOR_PARAM)
+        if token:
+            direction, (offset,) = decode_cursor(token, 1)
+            if direction != 'next' or not isinstance(offset, int) or not 0 <= offset <= MAX_OFFSET:
+                raise InvalidCursor()
+            self.offset = offset
+        self.limit = self.page_size + 1
+
+    def page(self, rows):
+        rows = list(rows)
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        next_offset = self.offset + self.page_size
+        next_cursor = prev_cursor = None
+        if has_more and next_offset <= MAX_OFFSET:
+            next_cursor = encode_cursor('next', [next_offset])
+        if self.offset:
+            prev_cursor = encode_cursor('next', [max(0, self.offset - self.page_size)])
+        return Page(rows, next_cursor, prev_cursor)
+
+
+def wants_page(request):
+    """
+    Whether the client asked for pages. The shipped app reads only the
+    body and expects every row, so list endpoints page only when a
+    ``cursor`` or ``page_size`` is sent.
+    """
+    params = _query_params(request)
+    return CURSOR_PARAM in params or PAGE_SIZE_PARAM in params
+
+
+def paginate(queryset, request, ordering=ID_ORDERING, page_size=None):
+    """
+    One page of ``queryset`` in ``ordering`` when the client asked for
+    pages, otherwise every row in id order as before pagination existed.
+    """
+    if not wants_page(request):
+        return Page(list(queryset.order_by(*UNPAGED_ORDERING)))
+    keyset = Keyset(queryset, request, ordering, page_size)
+    return keyset.page(keyset.queryset)
+
+
+def first_page(queryset, ordering=ID_ORDERING, page_size=None):
+    """The first page of ``queryset``, with a next cursor the list endpoints accept."""
+    keyset = Keyset(queryset, None, ordering, page_size or DEFAULT_PAGE_SIZE)
+    return keyset.page(keyset.queryset)
+
+
+def pagination_headers(request, page):
+    headers = {}
+    url = request.build_absolute_uri()
+    links = []
+    if page.next_cursor:
+        headers['X-Next-Cursor'] = page.next_cursor
+        links.append(f'<{replace_query_param(url, CURSOR_PARAM, page.next_cursor)}>; rel="next"')
+    if page.prev_cursor:
+        headers['X-Prev-Cursor'] = page.prev_cursor
+        links.append(f'<{replace_query_param(url, CURSOR_PARAM, page.prev_cursor)}>; rel="prev"')
+    if links:
+        headers['Link'] = ', '.join(links)
+    return headers
+
+
+def paginated_response(request, data, page):
+    """
+    The body stays a plain list either way; when paging, cursors travel in
+    ``Link`` and ``X-Next-Cursor``/``X-Prev-Cursor`` headers.
+    """
+    return Response(data, headers=pagination_headers(request, page))
@@ -0,0 +1,115 @@
+import uuid
+
+from django.conf import settings
+from rest_framework.exceptions import AuthenticationFailed, NotAuthenticated
+from rest_framework.permissions import BasePermission
+
+from .authentication import SessionTokenAuthentication
+from .membership import memberships
+
+
+def community_id(request, view):
+    """The community a request is about: the ``comm_id`` URL kwarg, or the body's for creates."""
+    comm_id = view.kwargs.get('comm_id')
+    if comm_id is None and request.method == 'POST' and hasattr(request.data, 'get'):
+        comm_id = request.data.get('comm_id')
+    try:
+        return int(comm_id) if comm_id is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class IsCommunityMember(BasePermission):
+    """
+    Callers with a session token must belong to the community they read or
+    write, and may only create rows as themselves. Callers without one are
+    let through unless ``COMMUNITY_MEMBERSHIP_REQUIRED`` is set, so older
+    clients keep working until they send tokens. Requests without a usable
+    community id are left for the view to reject.
+    """
+
+    message = 'You are not a member of this community.'
+    # Whether creates must name the caller as their user.
+    own_rows_only = True
+
+    def has_permission(self, request, view):
+        if not request.user or not request.user.is_authenticated:
+            return not settings.COMMUNITY_MEMBERSHIP_REQUIRED
+        if self.own_rows_only and not acts_as_caller(request):
+            self.message = 'You can only create rows as yourself.'
+            return False
+        comm_id = self.community(request, view)
+        return comm_id is None or self.check(request.user.id, comm_id)
+
+    def community(self, request, view):
+        return community_id(request, view)
+
+    def check(self, user_id, comm_id):
+        return memberships.is_member(user_id, comm_id)
+
+
+class IsCommunityAdmin(IsCommunityMember):
+    message = 'Only the community admin can do this.'
+    own_rows_only = False
+
+    def check(self, user_id, comm_id):
+        return memberships.is_admin(user_id, comm_id)
+
+
+def member_of_row(model, kwarg):
+    """
+    IsCommunityMember for views addressed by a row's id rather than a
+    community's: the community is read from the ``model`` row whose pk is
+    the ``kwarg`` URL kwarg. Missing rows are left for the view's 404.
+    """
+
+    class IsRowCommunityMember(IsCommunityMember):
+        def community(self, request, view):
+            try:
+                pk = int(view.kwargs[kwarg])
+            except (KeyError, ValueError):
+                return None
+            return model.objects.filter(pk=pk).values_list('comm_id', flat=True).first()
+
+    return IsRowCommunityMember
+
+
+def acts_as_caller(request):
+    """False when a create's body names a user other than the session token's."""
+    if request.method != 'POST' or not hasattr(request.data, 'get'):
+        return True
+    try:
+        return uuid.UUID(str(request.data['user_id'])) == request.user.id
+    except (KeyError, ValueError):
+        # No usable user id: the serializer rejects it.
+        return True
+
+
+
+def token_user(request):
+    """The session-token caller of a plain Django view, or None without a token."""
+    result = SessionTokenAuthentication().authenticate(request)
+    return result[0] if result else None
+
+
+async def acommunity_denied(request, comm_id):
+    """
+    IsCommunityMember for the async event stream, which DRF does not wrap.
+    Returns ``(status, detail)`` when the caller may not read ``comm_id``,
+    or None when they may.
+    """
+    try:
+        user = token_user(request)
+    except AuthenticationFailed as e:
+        return e.status_code, str(e.detail)
+    if user is None:
+        if settings.COMMUNITY_MEMBERSHIP_REQUIRED:
+            return NotAuthenticated.status_code, str(NotAuthenticated.default_detail)
+        return None
+    try:
+        comm_id = int(comm_id)
+    except (TypeError, ValueError):
+        return None
+    if not await memberships.ais_member(user.id, comm_id):
+        return 403, IsCommunityMember.message
+    return None
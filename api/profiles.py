@@ -0,0 +1,66 @@
+from django.conf import settings
+
+from .metrics import registry
+from .models import Profile
+from .usercache import UserCache, user_key
+
+
+class ProfileRecord:
+    """The columns of a Profile row, without a model instance around them."""
+
+    __slots__ = ('id', 'uuid_id', 'email', 'name', 'age', 'pno', 'profession', 'user_code')
+    COLUMNS = ('id', 'uuid_id', 'email', 'name', 'age', 'pno', 'profession', 'user_code')
+
+    def __init__(self, id, uuid_id, email, name, age, pno, profession, user_code):
+        self.id = id
+        self.uuid_id = uuid_id
+        self.email = email
+        self.name = name
+        self.age = age
+        self.pno = pno
+        self.profession = profession
+        self.user_code = user_code
+
+    def as_dict(self):
+        # Same keys, order and values as ProfileSerializer.
+        return {
+            'id': self.id, 'email': self.email, 'name': self.name, 'age': self.age, 'pno': self.pno,
+            'profession': self.profession, 'user_code': self.user_code, 'uuid': self.uuid_id,
+        }
+
+
+class ProfileCache(UserCache):
+    """
+    Profiles by user id, kept as ProfileRecords. Saving or deleting a
+    Profile drops its entry. Users without a profile are not cached, so a
+    profile created through another process is found straight away.
+    """
+
+    metric = 'neighborly_profile_cache'
+    description = 'Profile'
+
+    def __init__(self, maxsize=None, ttl=None):
+        super().__init__(maxsize or settings.PROFILE_CACHE_SIZE, ttl or settings.PROFILE_CACHE_TTL)
+
+    def _query(self, missing):
+        # Rows come newest first so a user's oldest profile is the one kept,
+        # as with Profile.objects.filter(uuid=...).first().
+        return Profile.objects.filter(uuid__in=missing).order_by('-id').values_list(*ProfileRecord.COLUMNS)
+
+    def get_many(self, user_ids):
+        """
+        ``{user_id: ProfileRecord or None}`` for ``user_ids``, with one
+        query for all the ids that aren't cached.
+        """
+        keys = {user_id: user_key(user_id) for user_id in user_ids}
+        found, missing, generation = self.cached(set(keys.values()))
+        loaded = {row[1]: ProfileRecord(*row) for row in self._query(missing)} if missing else {}
+        self.store(loaded, generation)
+        found.update(loaded)
+        return {user_id: found.get(key) for user_id, key in keys.items()}
+
+    def get(self, user_id):
+        return next(iter(self.get_many([user_id]).values()))
+
+profile_cache = ProfileCache()
+registry.register_collector(profile_cache.collect)
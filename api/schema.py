@@ -0,0 +1,51 @@
+import hashlib
+import os
+
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+
+CONTENT_TYPE = 'application/vnd.oai.openapi+json'
+
+# path -> (mtime, content, etag) of the last schema file read.
+_files = {}
+_generate = None
+
+
+def read_schema(path):
+    """The built schema and its ETag, re-read only when the file changes; ``None`` if it hasn't been built."""
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    cached = _files.get(path)
+    if cached is None or cached[0] != mtime:
+        with open(path, 'rb') as f:
+            content = f.read()
+        cached = _files[path] = (mtime, content, f'"{hashlib.sha256(content).hexdigest()[:32]}"')
+    return cached[1:]
+
+
+def schema(request):
+    """
+    Serve the schema written by ``manage.py build_schema``. Without one,
+    development servers generate it on every request as before; elsewhere
+    that would introspect every view per hit, so it's a 503 instead.
+    """
+    global _generate
+    found = read_schema(settings.OPENAPI_SCHEMA_FILE)
+    if found is None:
+        if not settings.DEBUG:
+            return JsonResponse({'error': 'Schema not built; run manage.py build_schema'}, status=503)
+        if _generate is None:
+            from drf_spectacular.views import SpectacularAPIView
+            _generate = SpectacularAPIView.as_view()
+        return _generate(request)
+
+    content, etag = found
+    if etag in [tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')]:
+        response = HttpResponse(status=304)
+    else:
+        response = HttpResponse(content, content_type=CONTENT_TYPE)
+    response['ETag'] = etag
+    response['Cache-Control'] = 'public, max-age=300'
+    return response
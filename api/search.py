@@ -0,0 +1,183 @@
+import math
+import re
+from collections import Counter
+
+from django.db import connection, transaction
+from django.db.models import BooleanField, Case, Count, F, FloatField, Sum, Value, When
+from django.db.models.expressions import RawSQL
+
+from .models import Posts, Offers, Requests, SearchDocument, SearchTerm
+
+TOKEN_RE = re.compile(r'[^\W_]+')
+STOPWORDS = frozenset(
+    'a an and are as at be but by for from has have i in is it me my of on or our so that the this to was we '
+    'will with you your'.split()
+)
+MAX_TERM_LENGTH = 64
+MAX_QUERY_TERMS = 8
+MAX_QUERY_LENGTH = 200
+
+# BM25 term-frequency saturation. The length normalisation uses a fixed
+# average so a document's weights never change when others are indexed.
+TITLE_WEIGHT = 2.0
+K1 = 1.2
+B = 0.75
+AVERAGE_LENGTH = 30.0
+
+SOURCES = {
+    SearchDocument.POST: (Posts, ('text_content',), lambda obj: ('', obj.text_content)),
+    SearchDocument.OFFER: (Offers, ('title', 'description'), lambda obj: (obj.title, obj.description)),
+    SearchDocument.REQUEST: (Requests, ('title', 'description'), lambda obj: (obj.title, obj.description)),
+}
+
+
+def uses_term_table():
+    return connection.vendor != 'postgresql'
+
+
+def _stem(token):
+    # Just enough to match "drills" with "drill"; Postgres does real stemming.
+    if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+        return token[:-1]
+    return token
+
+
+def tokenize(text):
+    return [
+        _stem(token)[:MAX_TERM_LENGTH]
+        for token in TOKEN_RE.findall(text.lower())
+        if (len(token) > 1 or token.isdigit()) and token not in STOPWORDS
+    ]
+
+
+def term_weights(title, body):
+    counts = Counter()
+    for token in tokenize(title):
+        counts[token] += TITLE_WEIGHT
+    for token in tokenize(body):
+        counts[token] += 1
+    norm = K1 * (1 - B + B * sum(counts.values()) / AVERAGE_LENGTH)
+    return {term: tf * (K1 + 1) / (tf + norm) for term, tf in counts.items()}
+
+
+def query_terms(query):
+    return list(dict.fromkeys(tokenize(query[:MAX_QUERY_LENGTH])))[:MAX_QUERY_TERMS]
+
+
+def _terms(documents):
+    return [
+        SearchTerm(document_id=document.pk, comm_id_id=document.comm_id_id, term=term, weight=weight)
+        for document in documents
+        for term, weight in term_weights(document.title, document.body).items()
+    ]
+
+
+def index_objects(kind, objects, created=False):
+    """
+    Add or refresh the documents for ``objects`` of one kind. Unchanged
+    documents are left alone; ``created`` skips looking for existing ones.
+    """
+    objects = list(objects)
+    if not objects:
+        return
+    text = SOURCES[kind][2]
+    existing = {}
+    if not created:
+        existing = {
+            document.object_id: document
+            for document in SearchDocument.objects.filter(kind=kind, object_id__in=[obj.pk for obj in objects])
+        }
+
+    new, changed = [], []
+    for obj in objects:
+        title, body = text(obj)
+        document = existing.get(obj.pk)
+        if document is None:
+            new.append(SearchDocument(kind=kind, object_id=obj.pk, comm_id_id=obj.comm_id_id,
+                                      user_id_id=obj.user_id_id, title=title, body=body))
+        elif (document.title, document.body, document.comm_id_id) != (title, body, obj.comm_id_id):
+            document.title, document.body, document.comm_id_id = title, body, obj.comm_id_id
+            changed.append(document)
+    if not new and not changed:
+        return
+
+    with transaction.atomic(savepoint=False):
+        SearchDocument.objects.bulk_create(new, batch_size=1000)
+        if changed:
+            SearchDocument.objects.bulk_update(changed, ['title', 'body', 'comm_id'], batch_size=1000)
+        if uses_term_table():
+            if changed:
+                SearchTerm.objects.filter(document__in=[document.pk for document in changed]).delete()
+            SearchTerm.objects.bulk_create(_terms(new + changed), batch_size=1000)
+
+
+def remove_objects(kind, object_ids):
+    SearchDocument.objects.filter(kind=kind, object_id__in=list(object_ids)).delete()
+
+
+def rebuild(kinds=None, batch_size=1000):
+    """Reindex every post, offer and request from scratch. Returns counts by kind."""
+    counts = {}
+    for kind in kinds or SOURCES:
+        model = SOURCES[kind][0]
+        counts[kind] = 0
+        with transaction.atomic():
+            SearchDocument.objects.filter(kind=kind).delete()
+            batch = []
+            for obj in model.objects.order_by('pk').iterator(chunk_size=batch_size):
+                batch.append(obj)
+                if len(batch) == batch_size:
+                    index_objects(kind, batch, created=True)
+                    counts[kind] += len(batch)
+                    batch = []
+            index_objects(kind, batch, created=True)
+            counts[kind] += len(batch)
+    return counts
+
+
+def search(comm_id, query, kinds=None, offset=0, limit=50):
+    """
+    Rank a community's documents against ``query`` and return the rows at
+    ``offset``..``offset + limit`` as dicts with a ``rank``.
+    """
+    documents = SearchDocument.objects.filter(comm_id=comm_id)
+    if kinds:
+        documents = documents.filter(kind__in=kinds)
+    fields = ('id', 'kind', 'object_id', 'user_id', 'title', 'body', 'rank')
+
+    if not uses_term_table():
+        query = query[:MAX_QUERY_LENGTH]
+        tsquery = "plainto_tsquery('english', %s)"
+        ranked = (documents
+                  .alias(hit=RawSQL(f'search_vector @@ {tsquery}', [query], output_field=BooleanField()))
+                  .filter(hit=True)
+                  .annotate(rank=RawSQL(f'ts_rank(search_vector, {tsquery})', [query], output_field=FloatField()))
+                  .order_by('-rank', '-id'))
+        return list(ranked.values(*fields)[offset:offset + limit])
+
+    terms = query_terms(query)
+    if not terms:
+        return []
+    postings = SearchTerm.objects.filter(comm_id=comm_id, term__in=terms)
+    frequencies = dict(postings.values_list('term').annotate(count=Count('id')).order_by())
+    if len(frequencies) < len(terms):
+        return []
+    total = SearchDocument.objects.filter(comm_id=comm_id).count()
+    score = Sum(Case(
+        *[When(term=term, then=Value(math.log(1 + (total - count + 0.5) / (count + 0.5))) * F('weight'))
+          for term, count in frequencies.items()],
+        output_field=FloatField(),
+    ))
+    if kinds:
+        postings = postings.filter(document__kind__in=kinds)
+    # Every term must match, as with plainto_tsquery on Postgres.
+    ranked = list(postings.values('document').annotate(rank=score, matched=Count('term'))
+                  .filter(matched=len(terms)).order_by('-rank', '-document')[offset:offset + limit])
+    rows = {row['id']: row for row in documents.filter(pk__in=[match['document'] for match in ranked])
+            .values(*fields[:-1])}
+    results = []
+    for match in ranked:
+        row = rows[match['document']]
+        row['rank'] = match['rank']
+        results.append(row)
+    return results
@@ -20,6 +20,8 @@ class JoinSerializer(serializers.ModelSerializer):
     class Meta:
         model = Join
         fields = '__all__'
+        # Only create_community makes admins; clients can't grant it.
+        read_only_fields = ('is_admin',)
         
 class PostsSerializer(serializers.ModelSerializer):
     class Meta:
@@ -32,11 +34,34 @@ class OffersSerializer(serializers.ModelSerializer):
         fields = '__all__'
         
 class RequestsSerializer(serializers.ModelSerializer):
+    from_time = serializers.TimeField(format=Requests.WINDOW_TIME_FORMAT, required=False, allow_null=True)
+    to_time = serializers.TimeField(format=Requests.WINDOW_TIME_FORMAT, required=False, allow_null=True)
+
     class Meta:
         model = Requests
         fields = '__all__'
+
+    def to_internal_value(self, data):
+        # The app sends "" for date/time pickers the user left untouched.
+        if hasattr(data, 'dict'):
+            data = data.dict()
+        data = {key: (None if key in Requests.WINDOW_FIELDS and value == '' else value) for key, value in data.items()}
+        return super().to_internal_value(data)
         
 class JoinRequestSerializer(serializers.ModelSerializer):
     class Meta:
         model = JoinRequest
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+class RequestWindowSerializer(serializers.Serializer):
+    from_date = serializers.DateField(required=False)
+    to_date = serializers.DateField(required=False)
+    from_time = serializers.TimeField(required=False)
+    to_time = serializers.TimeField(required=False)
+    status = serializers.IntegerField(required=False)
+
+    def validate(self, attrs):
+        for start, end in (('from_date', 'to_date'), ('from_time', 'to_time')):
+            if start in attrs and end in attrs and attrs[start] > attrs[end]:
+                raise serializers.ValidationError(f'{start} must not be after {end}')
+        return attrs
@@ -0,0 +1,102 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from . import clusters, search, stats
+from .caching import invalidate_communities, invalidate_community
+from .membership import memberships
+from .models import Community, CommunityStats, Join, Profile, Tombstone
+from .profiles import profile_cache
+from .sync import KINDS as SYNC_KINDS
+
+
+def _index(kind, text_fields):
+    def handler(sender, instance, created, update_fields=None, **kwargs):
+        if update_fields is not None and not set(update_fields) & {*text_fields, 'comm_id', 'user_id'}:
+            return
+        search.index_objects(kind, [instance], created=created)
+    return handler
+
+
+def _remove(kind):
+    def handler(sender, instance, **kwargs):
+        search.remove_objects(kind, [instance.pk])
+    return handler
+
+
+def _tombstone(kind):
+    def handler(sender, instance, **kwargs):
+        Tombstone.objects.create(kind=kind, object_id=instance.pk, comm_id=instance.comm_id_id)
+    return handler
+
+
+def _count(sign):
+    def handler(sender, instance, created=True, **kwargs):
+        # Status changes go through api/transitions.py, which adjusts the
+        # counters itself; here only creates and deletes count.
+        if not created:
+            return
+        names = stats.counted(instance)
+        if names:
+            stats.adjust(instance.comm_id_id, **{name: sign for name in names})
+    return handler
+
+
+def _create_stats(sender, instance, created, **kwargs):
+    if created:
+        CommunityStats.objects.create(comm_id=instance)
+
+
+def _remember_location(sender, instance, raw=False, update_fields=None, **kwargs):
+    # A moved community leaves its old cells, so note where it was.
+    if raw or instance._state.adding or (update_fields is not None and
+                                        not set(update_fields) & {'latitude', 'longtitude', 'geohash'}):
+        return
+    instance._stored_location = Community.objects.filter(pk=instance.pk).only(
+        'geohash', 'latitude', 'longtitude').first()
+
+
+def _update_cells(sender, instance, created, **kwargs):
+    if created:
+        clusters.add([instance])
+        return
+    before = instance.__dict__.pop('_stored_location', None)
+    if before is not None and (before.geohash, before.latitude, before.longtitude) != (
+            instance.geohash, float(instance.latitude), float(instance.longtitude)):
+        clusters.move(before, instance)
+        invalidate_communities()
+
+
+def _remove_from_cells(sender, instance, **kwargs):
+    clusters.remove([instance])
+
+
+def _forget_membership(sender, instance, **kwargs):
+    memberships.invalidate(instance.user_id_id)
+
+
+def _forget_profile(sender, instance, **kwargs):
+    profile_cache.invalidate(instance.uuid_id)
+    # Cached listings embed user names, so every community the user is in
+    # has to move to a new version (and a new ETag) when the profile changes.
+    for comm_id in Join.objects.filter(user_id=instance.uuid_id).values_list('comm_id', flat=True):
+        invalidate_community(comm_id)
+
+
+def connect():
+    for kind, (model, text_fields, _) in search.SOURCES.items():
+        post_save.connect(_index(kind, text_fields), sender=model, weak=False,
+                          dispatch_uid=f'search-index-{kind}')
+        post_delete.connect(_remove(kind), sender=model, weak=False, dispatch_uid=f'search-remove-{kind}')
+    for model, _, _, kind, _ in SYNC_KINDS.values():
+        post_delete.connect(_tombstone(kind), sender=model, weak=False, dispatch_uid=f'sync-tombstone-{kind}')
+    for model in {model for model, _ in stats.COUNTERS.values()}:
+        name = model._meta.model_name
+        post_save.connect(_count(1), sender=model, weak=False, dispatch_uid=f'stats-add-{name}')
+        post_delete.connect(_count(-1), sender=model, weak=False, dispatch_uid=f'stats-remove-{name}')
+    post_save.connect(_create_stats, sender=Community, dispatch_uid='stats-create')
+    pre_save.connect(_remember_location, sender=Community, dispatch_uid='clusters-remember')
+    post_save.connect(_update_cells, sender=Community, dispatch_uid='clusters-update')
+    post_delete.connect(_remove_from_cells, sender=Community, dispatch_uid='clusters-remove')
+    post_save.connect(_forget_membership, sender=Join, dispatch_uid='membership-save')
+    post_delete.connect(_forget_membership, sender=Join, dispatch_uid='membership-delete')
+    post_save.connect(_forget_profile, sender=Profile, dispatch_uid='profile-save')
+    post_delete.connect(_forget_profile, sender=Profile, dispatch_uid='profile-delete')
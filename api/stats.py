@@ -0,0 +1,76 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F
+
+from .models import Community, CommunityStats, Offers, Requests, Join, JoinRequest, OPEN, PENDING
+
+# Counter -> (model, filter for the rows it counts).
+COUNTERS = {
+    'open_offers': (Offers, {'status': OPEN}),
+    # Only requests still waiting for an offer, as view_public_requests lists.
+    'open_requests': (Requests, {'status': PENDING, 'offer_id': None}),
+    'members': (Join, {}),
+    'pending_join_requests': (JoinRequest, {'accepted': PENDING}),
+}
+FIELDS = tuple(COUNTERS)
+
+
+def counted(instance):
+    """The counters ``instance`` adds one to."""
+    return [
+        name for name, (model, condition) in COUNTERS.items()
+        if isinstance(instance, model) and all(getattr(instance, key) == value for key, value in condition.items())
+    ]
+
+
+def adjust(comm_id, **deltas):
+    """Add ``deltas`` to a community's counters with one UPDATE."""
+    deltas = {name: delta for name, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    updates = {name: F(name) + delta for name, delta in deltas.items()}
+    if CommunityStats.objects.filter(comm_id=comm_id).update(**updates):
+        return
+    # No counters yet, e.g. for a bulk-loaded community: the source rows
+    # already include this change, so compute them. A decrement with no
+    # row means the community itself is being deleted.
+    if any(delta > 0 for delta in deltas.values()):
+        reconcile([comm_id])
+
+
+def compute(comm_ids):
+    counts = defaultdict(lambda: dict.fromkeys(FIELDS, 0))
+    for name, (model, condition) in COUNTERS.items():
+        rows = model.objects.filter(comm_id__in=comm_ids, **condition).order_by()
+        for comm_id, count in rows.values('comm_id').annotate(count=Count('pk')).values_list('comm_id', 'count'):
+            counts[comm_id][name] = count
+    return counts
+
+
+def reconcile(comm_ids):
+    """
+    Recompute the counters of ``comm_ids`` from the source tables and store
+    the ones that were missing or wrong. Returns their community ids.
+    """
+    comm_ids = list(comm_ids)
+    with transaction.atomic():
+        existing = set(Community.objects.filter(pk__in=comm_ids).values_list('pk', flat=True))
+        counts = compute(existing)
+        stored = {row['comm_id']: row
+                  for row in CommunityStats.objects.filter(comm_id__in=existing).values('comm_id', *FIELDS)}
+        changed = [
+            CommunityStats(comm_id_id=comm_id, **counts[comm_id]) for comm_id in existing
+            if stored.get(comm_id) != {'comm_id': comm_id, **counts[comm_id]}
+        ]
+        CommunityStats.objects.bulk_create(changed, update_conflicts=True, unique_fields=['comm_id'],
+                                           update_fields=FIELDS)
+    return [row.comm_id_id for row in changed]
+
+
+def summary(comm_id):
+    """A community's counters, or ``None`` if there is no such community."""
+    row = CommunityStats.objects.filter(comm_id=comm_id).values(*FIELDS).first()
+    if row is None and reconcile([comm_id]):
+        row = CommunityStats.objects.filter(comm_id=comm_id).values(*FIELDS).first()
+    return row
@@ -0,0 +1,137 @@
+import base64
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .enrichment import (ProfileLoader, format_posts, format_offers, format_requests, format_join_requests,
+                         POST_COLUMNS, OFFER_COLUMNS, REQUEST_COLUMNS, JOIN_REQUEST_COLUMNS)
+from .models import Posts, Offers, Requests, JoinRequest, Tombstone
+from .pagination import keyset_filter
+
+SYNC_ORDERING = ('updated_at', 'id')
+DELETED = 'deleted'
+
+
+class InvalidSyncToken(Exception):
+    pass
+
+
+# Response key -> (model, columns, formatter, tombstone kind, owner column).
+KINDS = {
+    'posts': (Posts, POST_COLUMNS, format_posts, 'post', 'user_id'),
+    'offers': (Offers, OFFER_COLUMNS, format_offers, 'offer', 'user_id'),
+    'requests': (Requests, (*REQUEST_COLUMNS, 'offer_id'), format_requests, 'request', 'user_id'),
+    'join_requests': (JoinRequest, JOIN_REQUEST_COLUMNS, format_join_requests, 'join_request', 'member_id'),
+}
+TOMBSTONE_KINDS = {kind: key for key, (_, _, _, kind, _) in KINDS.items()}
+
+
+def _micros(moment):
+    return int(moment.timestamp() * 1_000_000)
+
+
+def _moment(micros):
+    return datetime.fromtimestamp(micros / 1_000_000, tz=dt_timezone.utc)
+
+
+def encode_token(comm_id, positions):
+    payload = {'c': str(comm_id), 'p': {key: [_micros(moment), pk] for key, (moment, pk) in positions.items()}}
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decode_token(token, comm_id):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode((token + '=' * (-len(token) % 4)).encode()))
+        if payload['c'] != str(comm_id):
+            raise InvalidSyncToken('Token is for another community.')
+        return {key: (_moment(int(micros)), int(pk)) for key, (micros, pk) in payload['p'].items()
+                if key in KINDS or key == DELETED}
+    except (ValueError, TypeError, KeyError, AttributeError, OverflowError):
+        raise InvalidSyncToken('Invalid sync token.')
+
+
+def _changed(queryset, position, limit, started_at, overlap):
+    """
+    Rows after ``position`` in (updated_at, id) order, at most ``limit``,
+    and the position to resume from. Once caught up, the next position
+    trails the query start by ``overlap`` so rows from transactions that
+    committed late are sent again rather than missed.
+    """
+    if position is not None:
+        queryset = queryset.filter(keyset_filter(SYNC_ORDERING, position))
+    rows = list(queryset.order_by(*SYNC_ORDERING)[:limit + 1])
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        return rows, (last['updated_at'], last['id']), True
+    caught_up = (started_at - overlap, 0)
+    if position is not None and position > caught_up:
+        caught_up = position
+    return rows, caught_up, False
+
+
+def changes(comm_id, token=None, admin_id=None, limit=None):
+    """
+    Everything in a community that changed since ``token``: upserted rows
+    per kind, tombstones for deletions, and the token for the next call.
+    Without a token, or with one older than the tombstone retention, the
+    whole community is returned with ``reset`` set and the client should
+    replace what it holds. Join requests are only synced for their admin.
+    """
+    limit = limit or settings.SYNC_LIMIT
+    overlap = timedelta(seconds=settings.SYNC_OVERLAP_SECONDS)
+    started_at = timezone.now()
+    positions = decode_token(token, comm_id) if token else {}
+    horizon = started_at - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS)
+    reset = not positions or any(moment < horizon for moment, _ in positions.values())
+    if reset:
+        positions = {}
+
+    loader = ProfileLoader()
+    result = {}
+    next_positions = {}
+    more = False
+    for key, (model, columns, formatter, _, owner) in KINDS.items():
+        if key == 'join_requests' and admin_id is None:
+            result[key] = []
+            continue
+        queryset = model.objects.filter(comm_id=comm_id)
+        if key == 'join_requests':
+            queryset = queryset.filter(admin_id=admin_id)
+        rows, next_positions[key], truncated = _changed(
+            queryset.values(*columns, 'updated_at'), positions.get(key), limit, started_at, overlap)
+        more = more or truncated
+        loader.prime(row[owner] for row in rows)
+        result[key] = rows
+
+    deleted = []
+    if reset:
+        next_positions[DELETED] = (started_at - overlap, 0)
+    else:
+        tombstones = Tombstone.objects.filter(comm_id=comm_id)
+        if admin_id is None:
+            tombstones = tombstones.exclude(kind='join_request')
+        tombstones = tombstones.annotate(updated_at=F('deleted_at')).values('id', 'kind', 'object_id', 'updated_at')
+        rows, next_positions[DELETED], truncated = _changed(
+            tombstones, positions.get(DELETED), limit, started_at, overlap)
+        more = more or truncated
+        deleted = [{'kind': TOMBSTONE_KINDS[row['kind']], 'id': row['object_id']} for row in rows]
+
+    for key, (_, _, formatter, _, _) in KINDS.items():
+        rows = result[key]
+        data = formatter(rows, loader)
+        if key == 'requests':
+            for item, row in zip(data, rows):
+                item['offer_id'] = row['offer_id']
+        result[key] = data
+
+    return {
+        'token': encode_token(comm_id, next_positions),
+        'reset': reset,
+        'more': more,
+        **result,
+        'deleted': deleted,
+    }
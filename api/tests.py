@@ -1,3 +1,1393 @@
-from django.test import TestCase
+import decimal
+import io
+import json
+import math
+import tempfile
+import uuid
+from datetime import date, datetime, time, timedelta
+from unittest import mock
 
-# Create your tests here.
+import msgpack
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+
+from .benchmarks import data as bench_data
+from .benchmarks.serialization import LISTINGS
+from . import bulk, checks, clusters, dashboard, enrichment, events, feed, geo, search, stats, sync, transitions
+from .jwks import JWKSCache, static_fetcher
+from .membership import memberships
+from .models import (User, Profile, Community, CommunityCell, CommunityStats, Join, JoinRequest, Posts, Offers, Requests,
+                     SearchDocument, OPEN, PENDING, ACCEPTED, DECLINED)
+from .profiles import profile_cache
+from .renderers import FastJSONRenderer, MessagePackRenderer
+from .serializer import ProfileSerializer
+from .tokens import session_tokens, ExpiredToken, InvalidToken, SessionTokens
+
+
+@override_settings(SESSION_TOKEN_SECRET='test-session-token-secret')
+class ApiTestCase(TestCase):
+    """Clears the per-process caches, which outlive each test's transaction."""
+
+    def setUp(self):
+        caches[settings.RESPONSE_CACHE_ALIAS].clear()
+        memberships.clear()
+        profile_cache.clear()
+        session_tokens.clear()
+
+    def make_user(self, name=None):
+        user = User.objects.create(email=f'user{User.objects.count()}@example.com')
+        if name is not None:
+            Profile.objects.create(uuid=user, email=user.email, name=name, age=30, pno='1', profession='p',
+                                   user_code='c')
+        return user
+
+    def make_community(self, admin, latitude=52.52, longtitude=13.40, members=()):
+        community = Community.objects.create(comm_name='Block', admin_id=admin, location='Here',
+                                             latitude=latitude, longtitude=longtitude)
+        Join.objects.create(comm_id=community, user_id=admin, referral_code='0', is_admin=1)
+        for member in members:
+            Join.objects.create(comm_id=community, user_id=member, referral_code='0')
+        return community
+
+
+class ProfileCacheTests(ApiTestCase):
+    def test_get_profile_matches_serializer(self):
+        user = self.make_user('Ada')
+        response = self.client.get(f'/api/get_profile/{user.id}')
+        self.assertEqual(response.status_code, 200)
+        expected = ProfileSerializer(Profile.objects.get(uuid=user)).data
+        self.assertEqual(response.json(), {**expected, 'uuid': str(user.id)})
+
+    def test_hits_skip_the_database(self):
+        user = self.make_user('Ada')
+        profile_cache.get(user.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(profile_cache.get(str(user.id)).name, 'Ada')
+
+    def test_saving_a_profile_invalidates_it(self):
+        user = self.make_user('Ada')
+        profile_cache.get(user.id)
+        profile = Profile.objects.get(uuid=user)
+        profile.name = 'Grace'
+        profile.save()
+        self.assertEqual(profile_cache.get(user.id).name, 'Grace')
+        profile.delete()
+        self.assertIsNone(profile_cache.get(user.id))
+
+    def test_missing_profiles_are_not_cached(self):
+        user = self.make_user()
+        self.assertEqual(self.client.get(f'/api/get_profile/{user.id}').status_code, 404)
+        # As if another worker created it: no signal reaches this process.
+        Profile.objects.bulk_create([Profile(uuid=user, email=user.email, name='Ada', age=30, pno='1',
+                                             profession='p', user_code='c')])
+        self.assertEqual(self.client.get(f'/api/get_profile/{user.id}').status_code, 200)
+
+    def test_invalid_user_id_is_not_found(self):
+        self.assertEqual(self.client.get('/api/get_profile/not-a-uuid').status_code, 404)
+
+
+class MetricsTests(ApiTestCase):
+    def test_allowed_ip_can_scrape(self):
+        with self.settings(METRICS_ALLOWED_IPS=['127.0.0.1']):
+            response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+
+    def test_others_need_the_token(self):
+        with self.settings(METRICS_ALLOWED_IPS=[], METRICS_TOKEN='s3cret'):
+            self.assertEqual(self.client.get('/metrics').status_code, 403)
+            self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+            response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer s3cret')
+        self.assertEqual(response.status_code, 200)
+
+    def test_no_token_configured_means_ips_only(self):
+        with self.settings(METRICS_ALLOWED_IPS=[], METRICS_TOKEN=None):
+            self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer ').status_code, 403)
+
+
+class JWKSTests(ApiTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        _, jwks = bench_data.login_token()
+        cls.key = jwks['keys'][0]
+
+    def setUp(self):
+        super().setUp()
+        self.now = 1000.0
+        clock = mock.patch('api.jwks.time')
+        clock.start().monotonic.side_effect = lambda: self.now
+        self.addCleanup(clock.stop)
+        self.jwks = {'keys': [{**self.key, 'kid': 'old'}]}
+        self.fetches = 0
+        self.cache = JWKSCache(url='https://auth.example/jwks.json', ttl=600, fetcher=self.fetch,
+                               min_refresh_interval=30)
+
+    def fetch(self, url):
+        self.fetches += 1
+        return static_fetcher(self.jwks)(url)
+
+    def test_hits_within_the_ttl_do_not_refetch(self):
+        key = self.cache.get_key('old')
+        self.assertIsNotNone(key)
+        self.now += 599
+        self.assertIs(self.cache.get_key('old'), key)
+        self.assertEqual(self.fetches, 1)
+
+    def test_refetches_after_the_ttl(self):
+        self.cache.get_key('old')
+        self.jwks = {'keys': [{**self.key, 'kid': 'new'}]}
+        self.now += 600
+        self.assertIsNone(self.cache.get_key('old'))
+        self.assertIsNotNone(self.cache.get_key('new'))
+        self.assertEqual(self.fetches, 2)
+
+    def test_rotated_kid_refetches_once(self):
+        self.cache.get_key('old')
+        self.jwks = {'keys': [{**self.key, 'kid': 'old'}, {**self.key, 'kid': 'new'}]}
+        self.now += 30
+        self.assertIsNotNone(self.cache.get_key('new'))
+        self.assertIsNotNone(self.cache.get_key('new'))
+        self.assertIsNotNone(self.cache.get_key('old'))
+        self.assertEqual(self.fetches, 2)
+
+    def test_unknown_kid_within_the_rate_limit_is_rejected_without_refetching(self):
+        self.cache.get_key('old')
+        self.jwks = {'keys': [{**self.key, 'kid': 'new'}]}
+        self.now += 29
+        self.assertIsNone(self.cache.get_key('new'))
+        self.assertIsNone(self.cache.get_key('junk'))
+        self.assertEqual(self.fetches, 1)
+
+
+class LogoutTests(ApiTestCase):
+    def logout(self, user):
+        token, _ = session_tokens.issue(user.id)
+        response = self.client.post('/api/auth/logout/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        return token, response
+
+    def test_logout_revokes_the_token(self):
+        user = self.make_user()
+        token, response = self.logout(user)
+        self.assertEqual(response.status_code, 200)
+        with self.assertRaises(InvalidToken):
+            session_tokens.verify(token)
+
+    def test_local_memory_revocation_says_so(self):
+        _, response = self.logout(self.make_user())
+        self.assertEqual(response.json()['revoked_everywhere'], False)
+        self.assertIn('warning', response.json())
+
+    def test_shared_revocation_cache(self):
+        shared = {**settings.CACHES, 'shared': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': tempfile.mkdtemp(),
+        }}
+        with self.settings(CACHES=shared, SESSION_TOKEN_REVOCATION_CACHE='shared'):
+            _, response = self.logout(self.make_user())
+        self.assertEqual(response.json(), {'success': True, 'revoked_everywhere': True})
+
+
+class SessionTokenTests(ApiTestCase):
+    def test_issued_tokens_verify(self):
+        user = self.make_user()
+        token, expires_at = session_tokens.issue(user.id)
+        claims = session_tokens.verify(token)
+        self.assertEqual((claims.user_id, claims.expires_at), (user.id, expires_at))
+
+    def test_expired_tokens_are_rejected(self):
+        token, _ = session_tokens.issue(self.make_user().id, ttl=-1)
+        with self.assertRaises(ExpiredToken):
+            session_tokens.verify(token)
+
+    def test_tampered_tokens_are_rejected(self):
+        token, _ = session_tokens.issue(self.make_user().id)
+        version, user_id, expires_at, token_id, signature = token.split('.')
+        for forged in (f'{version}.{uuid.uuid4().hex}.{expires_at}.{token_id}.{signature}',
+                       f'{version}.{user_id}.{int(expires_at) + 3600}.{token_id}.{signature}',
+                       f'{version}.{user_id}.{expires_at}.{token_id}.{signature[::-1]}',
+                       'nonsense'):
+            with self.subTest(forged=forged), self.assertRaises(InvalidToken):
+                session_tokens.verify(forged)
+
+    def test_tokens_signed_with_secret_key_are_rejected(self):
+        forged, _ = SessionTokens(secret=settings.SECRET_KEY).issue(self.make_user().id)
+        with self.assertRaises(InvalidToken):
+            session_tokens.verify(forged)
+        response = self.client.get('/api/home_feed/' + forged.split('.')[1],
+                                   HTTP_AUTHORIZATION=f'Bearer {forged}')
+        self.assertEqual(response.status_code, 401)
+
+    def test_rotation_keeps_old_tokens_until_the_fallback_goes(self):
+        user = self.make_user()
+        with self.settings(SESSION_TOKEN_SECRET='old-secret'):
+            token, _ = SessionTokens().issue(user.id)
+        with self.settings(SESSION_TOKEN_SECRET='new-secret', SESSION_TOKEN_SECRET_FALLBACKS=['old-secret']):
+            tokens = SessionTokens()
+            self.assertEqual(tokens.verify(token).user_id, user.id)
+            fresh, _ = tokens.issue(user.id)
+        with self.settings(SESSION_TOKEN_SECRET='new-secret', SESSION_TOKEN_SECRET_FALLBACKS=[]):
+            tokens = SessionTokens()
+            self.assertEqual(tokens.verify(fresh).user_id, user.id)
+            with self.assertRaises(InvalidToken):
+                tokens.verify(token)
+
+    def test_a_dedicated_secret_is_required_outside_debug(self):
+        for secret in ('', settings.SECRET_KEY):
+            with self.subTest(secret=secret), self.settings(SESSION_TOKEN_SECRET=secret):
+                with self.assertRaises(ImproperlyConfigured):
+                    SessionTokens().issue(uuid.uuid4())
+                self.assertEqual([error.id for error in checks.check_session_token_secret(None)], ['api.E001'])
+                with self.settings(DEBUG=True):
+                    tokens = SessionTokens()
+                    token, _ = tokens.issue(uuid.uuid4())
+                    tokens.verify(token)
+                    self.assertEqual(checks.check_session_token_secret(None), [])
+        self.assertEqual(checks.check_session_token_secret(None), [])
+
+
+class ClusterTests(ApiTestCase):
+    def cells(self):
+        return {cell.cell: (cell.count, round(cell.latitude_sum, 6), round(cell.longitude_sum, 6))
+                for cell in CommunityCell.objects.all()}
+
+    def rebuilt_cells(self):
+        current = self.cells()
+        clusters.rebuild()
+        return current, self.cells()
+
+    def test_moving_a_community_moves_its_cells(self):
+        admin = self.make_user()
+        self.make_community(admin, 52.52, 13.40)
+        moved = self.make_community(admin, 52.52, 13.41)
+        moved.latitude, moved.longtitude = 48.85, 2.35
+        moved.save()
+        incremental, rebuilt = self.rebuilt_cells()
+        self.assertEqual(incremental, rebuilt)
+        self.assertEqual(incremental[geo.encode(48.85, 2.35)[:6]][0], 1)
+        self.assertEqual(incremental['u'][0], 2)
+
+    def test_small_moves_keep_counts(self):
+        community = self.make_community(self.make_user(), 52.52, 13.40)
+        community.latitude = 52.5201
+        community.save()
+        incremental, rebuilt = self.rebuilt_cells()
+        self.assertEqual(incremental, rebuilt)
+
+    def test_saves_that_do_not_move_leave_cells_alone(self):
+        community = self.make_community(self.make_user(), 52.52, 13.40)
+        before = self.cells()
+        community.comm_name = 'Renamed'
+        with self.assertNumQueries(2):
+            community.save()
+        self.assertEqual(self.cells(), before)
+
+    def test_delete_empties_cells(self):
+        community = self.make_community(self.make_user())
+        community.delete()
+        self.assertEqual(self.cells(), {})
+
+
+class StatusTestCase(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = self.make_user('Owner')
+        self.neighbour = self.make_user('Neighbour')
+        self.community = self.make_community(self.owner, members=[self.neighbour])
+
+    def make_offer(self, status=OPEN):
+        return Offers.objects.create(user_id=self.owner, comm_id=self.community, offer_type='lend', title='Drill',
+                                     description='A drill', status=status)
+
+    def make_request(self, status=PENDING, offer=None):
+        return Requests.objects.create(user_id=self.neighbour, comm_id=self.community, request_type='borrow',
+                                       title='Drill', description='Need a drill', status=status, offer_id=offer)
+
+    def assertCountersConsistent(self):
+        self.assertEqual(stats.reconcile([self.community.id]), [])
+
+
+class NearbyTests(ApiTestCase):
+    def nearby(self, latitude, longtitude, radius):
+        caches[settings.RESPONSE_CACHE_ALIAS].clear()
+        response = self.client.get(f'/api/get_communities/{latitude}/{longtitude}?radius={radius}')
+        self.assertEqual(response.status_code, 200)
+        return {community['id']: community['distance'] for community in response.json()}
+
+    def offset(self, latitude, north_km=0.0, east_km=0.0):
+        # Degrees on the sphere haversine() uses.
+        km_per_degree = geo.EARTH_RADIUS_KM * math.pi / 180
+        return north_km / km_per_degree, east_km / (km_per_degree * math.cos(math.radians(latitude)))
+
+    def test_finds_communities_just_inside_the_radius(self):
+        admin = self.make_user()
+        for latitude, longtitude in ((52.52, 13.40), (0.0, 0.0), (70.0, -20.0), (-45.0, 170.0)):
+            for north_km, east_km in ((0.999, 0), (-0.999, 0), (0, 0.999), (0, -0.999)):
+                with self.subTest(latitude=latitude, north_km=north_km, east_km=east_km):
+                    dlat, dlon = self.offset(latitude, north_km, east_km)
+                    community = self.make_community(admin, latitude + dlat, longtitude + dlon)
+                    found = self.nearby(latitude, longtitude, 1)
+                    self.assertIn(community.id, found)
+                    self.assertAlmostEqual(found[community.id], 0.999, places=3)
+                    community.delete()
+
+    def test_leaves_out_communities_just_outside_the_radius(self):
+        admin = self.make_user()
+        dlat, _ = self.offset(52.52, north_km=1.001)
+        outside = self.make_community(admin, 52.52 + dlat, 13.40)
+        inside = self.make_community(admin, 52.52, 13.40)
+        self.assertEqual(list(self.nearby(52.52, 13.40, 1)), [inside.id])
+        self.assertIn(outside.id, self.nearby(52.52, 13.40, 1.01))
+
+    def test_box_holds_the_whole_circle(self):
+        for latitude in (0.0, 45.0, 80.0):
+            min_lat, min_lon, max_lat, max_lon = geo.bounding_box(latitude, 10.0, 5)
+            self.assertGreaterEqual(geo.haversine(latitude, 10.0, max_lat, 10.0), 5 - 1e-9)
+            self.assertGreaterEqual(geo.haversine(latitude, 10.0, latitude, max_lon), 5 - 1e-9)
+
+
+class TransitionTests(StatusTestCase):
+    def walk(self, machine, create, url):
+        for current in sorted(machine.statuses):
+            for target in sorted(machine.statuses):
+                with self.subTest(current=current, target=target):
+                    row = create(current)
+                    response = self.client.put(url(row, target))
+                    if machine.is_noop(current, target) or target in machine.transitions.get(current, ()):
+                        self.assertEqual(response.status_code, 200, response.content)
+                        row.refresh_from_db()
+                        self.assertEqual(row.status, target)
+                    else:
+                        self.assertEqual(response.status_code, 409, response.content)
+                        self.assertEqual(response.json()['status'], current)
+                    self.assertCountersConsistent()
+
+    def test_offer_transition_table(self):
+        self.walk(transitions.offer_statuses, self.make_offer,
+                  lambda offer, target: f'/api/update_offer_status/{offer.id}/{target}')
+
+    def test_request_transition_table(self):
+        offer = self.make_offer()
+        self.walk(transitions.request_statuses, lambda status: self.make_request(status, offer),
+                  lambda request, target: f'/api/update_request_status/{request.id}/{target}/{offer.id}')
+
+    def test_app_responses_to_several_neighbours(self):
+        # Activity.jsx sets the offer's status with every response.
+        offer = self.make_offer()
+        for status, code in ((DECLINED, 200), (DECLINED, 200), (ACCEPTED, 200), (ACCEPTED, 409), (DECLINED, 200),
+                             (ACCEPTED, 200), (OPEN, 409)):
+            response = self.client.put(f'/api/update_offer_status/{offer.id}/{status}')
+            self.assertEqual(response.status_code, code, (status, response.content))
+        self.assertCountersConsistent()
+
+    def test_racing_acceptors_conflict_without_expected(self):
+        offer = self.make_offer()
+        codes = [self.client.put(f'/api/update_offer_status/{offer.id}/{ACCEPTED}').status_code for _ in range(2)]
+        self.assertEqual(codes, [200, 409])
+        # A client that knows the offer is accepted may repeat itself.
+        response = self.client.put(f'/api/update_offer_status/{offer.id}/{ACCEPTED}?expected={ACCEPTED}')
+        self.assertEqual(response.status_code, 200)
+
+    def test_same_status_is_not_written(self):
+        offer = self.make_offer(DECLINED)
+        updated_at = offer.updated_at
+        self.client.put(f'/api/update_offer_status/{offer.id}/{DECLINED}')
+        offer.refresh_from_db()
+        self.assertEqual(offer.updated_at, updated_at)
+
+    def test_expected_status_is_compare_and_set(self):
+        offer = self.make_offer(ACCEPTED)
+        response = self.client.put(f'/api/update_offer_status/{offer.id}/{ACCEPTED}?expected={OPEN}')
+        self.assertEqual(response.status_code, 409)
+        response = self.client.put(f'/api/update_offer_status/{offer.id}/{DECLINED}?expected={OPEN}')
+        self.assertEqual(response.status_code, 409)
+        response = self.client.put(f'/api/update_offer_status/{offer.id}/{DECLINED}?expected={ACCEPTED}')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.put(f'/api/update_offer_status/{offer.id}/{OPEN}?expected={DECLINED}')
+        self.assertEqual(response.status_code, 400)
+
+    def test_competing_lenders_conflict(self):
+        first, second = self.make_offer(), self.make_offer()
+        request = self.make_request()
+        response = self.client.put(f'/api/update_request_status/{request.id}/{ACCEPTED}/{first.id}')
+        self.assertEqual(response.status_code, 200)
+        for url in (f'/api/update_request_status/{request.id}/{ACCEPTED}/{second.id}',
+                    f'/api/update_request_status/{request.id}/{ACCEPTED}/{second.id}?expected={ACCEPTED}',
+                    f'/api/update_request_status/{request.id}/{ACCEPTED}/{first.id}'):
+            with self.subTest(url=url):
+                response = self.client.put(url)
+                self.assertEqual(response.status_code, 409)
+                self.assertEqual(response.json()['status'], ACCEPTED)
+        request.refresh_from_db()
+        self.assertEqual(request.offer_id_id, first.id)
+
+    def test_activity_confirms_an_accepted_request(self):
+        # ExchangeHub.jsx accepts the request when lending; Activity.jsx then
+        # accepts or declines it again, expecting it to be accepted.
+        offer = self.make_offer()
+        accepted, declined = self.make_request(ACCEPTED, offer), self.make_request(ACCEPTED, offer)
+        response = self.client.put(f'/api/update_request_status/{accepted.id}/{ACCEPTED}/{offer.id}?expected={ACCEPTED}')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.put(f'/api/update_request_status/{declined.id}/{DECLINED}/{offer.id}?expected={ACCEPTED}')
+        self.assertEqual(response.status_code, 200)
+        self.assertCountersConsistent()
+
+    def test_same_status_with_another_offer_conflicts(self):
+        first, second = self.make_offer(), self.make_offer()
+        request = self.make_request(DECLINED, first)
+        response = self.client.put(f'/api/update_request_status/{request.id}/{DECLINED}/{second.id}')
+        self.assertEqual(response.status_code, 409)
+        response = self.client.put(f'/api/update_request_status/{request.id}/{DECLINED}/{first.id}')
+        self.assertEqual(response.status_code, 200)
+        request.refresh_from_db()
+        self.assertEqual(request.offer_id_id, first.id)
+
+    def test_unknown_status_and_row(self):
+        offer = self.make_offer()
+        self.assertEqual(self.client.put(f'/api/update_offer_status/{offer.id}/7').status_code, 400)
+        self.assertEqual(self.client.put(f'/api/update_offer_status/999999/{OPEN}').status_code, 404)
+
+
+class BatchTests(StatusTestCase):
+    def post(self, url, items):
+        response = self.client.post(url, {'items': items}, content_type='application/json')
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_batch_offer_statuses(self):
+        accepted, declined, opened = self.make_offer(ACCEPTED), self.make_offer(DECLINED), self.make_offer()
+        result = self.post('/api/batch/update_offer_status', [
+            {'id': accepted.id, 'status': DECLINED},
+            {'id': declined.id, 'status': DECLINED},
+            {'id': opened.id, 'status': ACCEPTED, 'expected': DECLINED},
+            {'id': 999999, 'status': OPEN},
+            {'id': accepted.id, 'status': OPEN},
+        ])
+        self.assertEqual([item['code'] for item in result['results']], [200, 200, 409, 404, 400])
+        self.assertEqual(Offers.objects.get(pk=accepted.pk).status, DECLINED)
+        self.assertCountersConsistent()
+
+    def test_batch_request_statuses(self):
+        offer = self.make_offer()
+        pending, declined = self.make_request(offer=offer), self.make_request(DECLINED, offer)
+        result = self.post('/api/batch/update_request_status', [
+            {'id': pending.id, 'status': ACCEPTED, 'offer_id': offer.id},
+            {'id': declined.id, 'status': DECLINED, 'offer_id': offer.id},
+            {'id': self.make_request(ACCEPTED, offer).id, 'status': DECLINED, 'offer_id': offer.id},
+            {'id': self.make_request().id, 'status': DECLINED, 'offer_id': 999999},
+            {'id': self.make_request(ACCEPTED, offer).id, 'status': ACCEPTED, 'offer_id': self.make_offer().id},
+            {'id': self.make_request(DECLINED).id, 'status': ACCEPTED, 'offer_id': offer.id},
+        ])
+        self.assertEqual([item['code'] for item in result['results']], [200, 200, 200, 404, 409, 409])
+        self.assertCountersConsistent()
+
+    def test_batch_create_reports_each_item(self):
+        result = self.post('/api/batch/create_posts', [
+            {'user_id': str(self.owner.id), 'comm_id': self.community.id, 'text_content': 'Hello'},
+            {'user_id': str(self.owner.id), 'comm_id': 999999, 'text_content': 'Lost'},
+            {'user_id': str(self.owner.id), 'comm_id': self.community.id},
+        ])
+        self.assertEqual([item['code'] for item in result['results']], [201, 400, 400])
+        self.assertEqual(result['results'][0]['data']['text_content'], 'Hello')
+        self.assertEqual(Posts.objects.filter(comm_id=self.community).count(), 1)
+
+    def test_review_join_requests(self):
+        newcomer, stranger = self.make_user('Newcomer'), self.make_user('Stranger')
+        join_request = JoinRequest.objects.create(admin_id=self.owner, member_id=newcomer, comm_id=self.community)
+        declined = JoinRequest.objects.create(admin_id=self.owner, member_id=stranger, comm_id=self.community)
+        items = [{'id': join_request.id, 'status': ACCEPTED}, {'id': declined.id, 'status': DECLINED}]
+        result = self.post('/api/batch/review_join_requests', items)
+        self.assertEqual([(item['code'], item.get('joined')) for item in result['results']],
+                         [(200, True), (200, False)])
+        self.assertTrue(Join.objects.filter(comm_id=self.community, user_id=newcomer).exists())
+        # Repeating a review is a no-op; reversing it is a conflict.
+        result = self.post('/api/batch/review_join_requests', items)
+        self.assertEqual([(item['code'], item.get('joined')) for item in result['results']],
+                         [(200, False), (200, False)])
+        result = self.post('/api/batch/review_join_requests', [{'id': declined.id, 'status': ACCEPTED}])
+        self.assertEqual(result['results'][0]['code'], 409)
+        # Only the join request's admin may review it, even as a repeat.
+        token, _ = session_tokens.issue(newcomer.id)
+        response = self.client.post('/api/batch/review_join_requests', {'items': items},
+                                    content_type='application/json', HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual([item['code'] for item in response.json()['results']], [403, 403])
+        self.assertEqual(Join.objects.filter(comm_id=self.community, user_id=newcomer).count(), 1)
+        self.assertCountersConsistent()
+
+
+class CounterTests(StatusTestCase):
+    def open_requests(self):
+        return self.client.get(f'/api/community_summary/{self.community.id}').json()['open_requests']
+
+    def public_requests(self):
+        return self.client.get(f'/api/view_public_requests/{self.community.id}').json()
+
+    def test_open_requests_match_the_public_list(self):
+        offer = self.make_offer()
+        self.make_request()
+        self.make_request(offer=offer)
+        self.assertEqual(self.open_requests(), 1)
+        self.assertEqual(len(self.public_requests()), 1)
+
+    def test_setting_an_offer_closes_a_request(self):
+        offer = self.make_offer()
+        accepted, pending = self.make_request(), self.make_request()
+        self.client.put(f'/api/update_request_status/{accepted.id}/{ACCEPTED}/{offer.id}')
+        self.assertEqual(self.open_requests(), 1)
+        self.assertEqual([item['id'] for item in self.public_requests()], [pending.id])
+        # An offer can't be slipped onto a request without moving its status.
+        response = self.client.put(f'/api/update_request_status/{pending.id}/{PENDING}/{offer.id}')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.open_requests(), 1)
+        self.assertCountersConsistent()
+
+    def test_public_request_transition_table(self):
+        offer = self.make_offer()
+        machine = transitions.request_statuses
+        for current in sorted(machine.statuses):
+            for target in sorted(machine.statuses):
+                with self.subTest(current=current, target=target):
+                    request = self.make_request(current)
+                    self.client.put(f'/api/update_request_status/{request.id}/{target}/{offer.id}')
+                    self.assertCountersConsistent()
+
+    def test_batch_setting_offers(self):
+        offer = self.make_offer()
+        requests = [self.make_request() for _ in range(3)]
+        response = self.client.post('/api/batch/update_request_status', {'items': [
+            {'id': requests[0].id, 'status': ACCEPTED, 'offer_id': offer.id},
+            {'id': requests[1].id, 'status': PENDING, 'offer_id': offer.id},
+        ]}, content_type='application/json')
+        self.assertEqual([item['code'] for item in response.json()['results']], [200, 409])
+        self.assertEqual(self.open_requests(), 2)
+        self.assertCountersConsistent()
+
+
+class PaginationTests(StatusTestCase):
+    def setUp(self):
+        super().setUp()
+        self.offers = [self.make_offer() for _ in range(7)]
+        for i in range(7):
+            Posts.objects.create(user_id=self.owner, comm_id=self.community, text_content=f'Post {i}',
+                                 date=date(2025, 1, 1 + i % 3), time=time(9, i))
+
+    def walk(self, url, direction='next', cursor=None):
+        pages = []
+        while True:
+            separator = '&' if '?' in url else '?'
+            response = self.client.get(f'{url}{separator}cursor={cursor}' if cursor else url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([item['id'] for item in response.json()])
+            cursor = response.headers.get('X-Next-Cursor' if direction == 'next' else 'X-Prev-Cursor')
+            if not cursor:
+                return pages, response
+
+    def test_unpaged_lists_return_every_row_in_id_order(self):
+        response = self.client.get(f'/api/get_offers/{self.community.id}')
+        self.assertEqual([item['id'] for item in response.json()], [offer.id for offer in self.offers])
+        self.assertNotIn('Link', response.headers)
+        posts = self.client.get(f'/api/get_posts/{self.community.id}').json()
+        self.assertEqual([post['id'] for post in posts], sorted(post['id'] for post in posts))
+        self.assertEqual(len(posts), 7)
+
+    def test_cursors_walk_forward_and_back(self):
+        url = f'/api/get_offers/{self.community.id}?page_size=3'
+        pages, _ = self.walk(url)
+        expected = sorted((offer.id for offer in self.offers), reverse=True)
+        self.assertEqual(pages, [expected[:3], expected[3:6], expected[6:]])
+        # From the last page, prev cursors lead back to the first.
+        response = self.client.get(url)
+        cursor = response.headers['X-Next-Cursor']
+        last = self.client.get(f'{url}&cursor={cursor}')
+        cursor = last.headers['X-Next-Cursor']
+        last = self.client.get(f'{url}&cursor={cursor}')
+        back, _ = self.walk(url, 'prev', last.headers['X-Prev-Cursor'])
+        self.assertEqual(back, [expected[3:6], expected[:3]])
+
+    def test_posts_page_newest_first(self):
+        pages, _ = self.walk(f'/api/get_posts/{self.community.id}?page_size=2')
+        ids = [post_id for page in pages for post_id in page]
+        expected = list(Posts.objects.filter(comm_id=self.community).order_by('-date', '-time', '-id')
+                        .values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+        self.assertEqual([len(page) for page in pages], [2, 2, 2, 1])
+
+    def test_page_size_alone_starts_paging(self):
+        response = self.client.get(f'/api/get_offers/{self.community.id}?page_size=5')
+        self.assertEqual(len(response.json()), 5)
+        self.assertIn('rel="next"', response.headers['Link'])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(f'/api/get_offers/{self.community.id}?cursor=nonsense')
+        self.assertEqual(response.status_code, 400)
+
+
+class ResponseCacheTests(StatusTestCase):
+    def setUp(self):
+        super().setUp()
+        self.make_offer()
+        self.url = f'/api/get_offers/{self.community.id}'
+
+    def revalidate(self, etag):
+        return self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_matching_etag_is_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.revalidate(etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_writes_change_the_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/create_offer', {
+                'user_id': self.owner.id, 'comm_id': self.community.id, 'offer_type': 'lend',
+                'title': 'Ladder', 'description': 'A ladder',
+            }, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        response = self.revalidate(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual([offer['title'] for offer in response.json()], ['Drill', 'Ladder'])
+
+    def test_renaming_a_profile_changes_the_etag(self):
+        other = self.make_community(self.owner)
+        other_etag = self.client.get(f'/api/get_offers/{other.id}')['ETag']
+        etag = self.client.get(self.url)['ETag']
+        profile = Profile.objects.get(uuid=self.owner)
+        profile.name = 'Renamed'
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.save()
+        response = self.revalidate(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]['user_name'], 'Renamed')
+        response = self.client.get(f'/api/get_offers/{other.id}', HTTP_IF_NONE_MATCH=other_etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_other_users_profiles_leave_the_cache_alone(self):
+        etag = self.client.get(self.url)['ETag']
+        profile = Profile.objects.get(uuid=self.make_user('Stranger'))
+        profile.name = 'Renamed'
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.save()
+        self.assertEqual(self.revalidate(etag).status_code, 304)
+
+
+class RequestWindowTests(StatusTestCase):
+    def create(self, **window):
+        return self.client.post('/api/create_request', {
+            'user_id': str(self.neighbour.id), 'comm_id': self.community.id, 'request_type': 'borrow',
+            'title': 'Drill', 'description': 'Need a drill', **window,
+        }, content_type='application/json')
+
+    def test_times_are_stored_typed_and_shown_as_hh_mm(self):
+        response = self.create(from_time='10:30', to_time='12:00:00', from_date='2025-01-01', to_date='2025-01-02')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual({field: response.json()[field] for field in Requests.WINDOW_FIELDS}, {
+            'from_time': '10:30', 'to_time': '12:00', 'from_date': '2025-01-01', 'to_date': '2025-01-02',
+        })
+        stored = Requests.objects.get(pk=response.json()['id'])
+        self.assertEqual((stored.from_time, stored.to_date), (time(10, 30), date(2025, 1, 2)))
+        listed = self.client.get(f'/api/view_public_requests/{self.community.id}').json()
+        self.assertEqual((listed[0]['from_time'], listed[0]['to_time']), ('10:30', '12:00'))
+
+    def test_untouched_pickers_are_null(self):
+        response = self.create(from_time='', to_time='', from_date='', to_date='')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([response.json()[field] for field in Requests.WINDOW_FIELDS], [None] * 4)
+        listed = self.client.get(f'/api/view_public_requests/{self.community.id}').json()
+        self.assertFalse(set(Requests.WINDOW_FIELDS) & set(listed[0]))
+
+    def test_invalid_values_are_rejected(self):
+        response = self.create(from_time='25:00', to_date='2025-02-30')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()), {'from_time', 'to_date'})
+
+    def test_listing_filters_on_the_window(self):
+        morning = self.create(from_time='09:00', to_time='11:00').json()['id']
+        self.create(from_time='14:00', to_time='16:00')
+        response = self.client.get(f'/api/view_public_requests/{self.community.id}?from_time=10:00&to_time=12:00')
+        self.assertEqual([item['id'] for item in response.json()], [morning])
+
+
+class RequestWindowMigrationTests(TransactionTestCase):
+    before = ('api', '0003_keyset_indexes')
+    after = ('api', '0004_typed_request_window_and_filter_indexes')
+
+    def migrate(self, target):
+        executor = MigrationExecutor(connection)
+        executor.migrate([target])
+        return executor.loader.project_state([target]).apps
+
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes('api')[0])
+
+    def test_legacy_strings_are_parsed_or_dropped(self):
+        apps = self.migrate(self.before)
+        user = apps.get_model('api', 'User').objects.create(email='legacy@example.com')
+        community = apps.get_model('api', 'Community').objects.create(
+            comm_name='Block', admin_id=user, location='Here', latitude=52.52, longtitude=13.40)
+        legacy = {
+            'iso': ('10:30', '2025-01-02', '10:30', date(2025, 1, 2)),
+            'twelve_hour': ('2:15 PM', '02/01/2025', '14:15', date(2025, 1, 2)),
+            'seconds': ('08:05:09', '2025/01/02', '08:05', date(2025, 1, 2)),
+            'unparseable': ('after lunch', 'next week', None, None),
+            'impossible': ('25:00', '2025-02-30', None, None),
+            'blank': ('', '  ', None, None),
+        }
+        requests = apps.get_model('api', 'Requests')
+        for title, (from_time, from_date, _, _) in legacy.items():
+            requests.objects.create(user_id=user, comm_id=community, request_type='borrow', title=title,
+                                    description='', from_time=from_time, to_time=None, from_date=from_date,
+                                    to_date=None)
+
+        requests = self.migrate(self.after).get_model('api', 'Requests')
+        for title, (_, _, from_time, from_date) in legacy.items():
+            with self.subTest(title=title):
+                row = requests.objects.get(title=title)
+                shown = row.from_time.strftime(Requests.WINDOW_TIME_FORMAT) if row.from_time else None
+                self.assertEqual((shown, row.from_date, row.to_time, row.to_date), (from_time, from_date, None, None))
+
+        requests = self.migrate(self.before).get_model('api', 'Requests')
+        self.assertEqual(requests.objects.get(title='twelve_hour').from_time, '14:15')
+        self.assertEqual(requests.objects.get(title='twelve_hour').from_date, '2025-01-02')
+        self.assertIsNone(requests.objects.get(title='unparseable').from_time)
+
+
+class RendererTests(StatusTestCase):
+    data = [{
+        'id': 1, 'price': decimal.Decimal('2.50'), 'when': datetime(2025, 1, 2, 3, 4, 5, 678000),
+        'day': date(2025, 1, 2), 'at': time(10, 30), 'user': uuid.UUID(int=1), 'label': gettext_lazy('Drill'),
+        'text': 'caf\u00e9 \u2028 \u2029 <b>', 'nested': {'none': None, 'flag': True, 'ratio': 0.5},
+    }]
+
+    def test_fast_json_matches_the_stock_renderer(self):
+        self.assertEqual(FastJSONRenderer().render(self.data), JSONRenderer().render(self.data))
+
+    def test_fast_json_falls_back_without_orjson_or_for_indented_output(self):
+        indented = FastJSONRenderer().render(self.data, 'application/json; indent=2')
+        self.assertEqual(indented, JSONRenderer().render(self.data, 'application/json; indent=2'))
+        self.assertIn(b'\n  ', indented)
+        with mock.patch('api.renderers.orjson', None):
+            self.assertEqual(FastJSONRenderer().render(self.data), JSONRenderer().render(self.data))
+
+    def test_msgpack_holds_the_json_values(self):
+        unpacked = msgpack.unpackb(MessagePackRenderer().render(self.data), raw=False)
+        self.assertEqual(unpacked, json.loads(JSONRenderer().render(self.data)))
+        self.assertEqual(MessagePackRenderer().render(None), b'')
+
+    def test_listings_negotiate_msgpack(self):
+        self.make_offer()
+        url = f'/api/get_offers/{self.community.id}'
+        as_json = self.client.get(url)
+        as_msgpack = self.client.get(url, HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(as_msgpack['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(as_msgpack.content, raw=False), as_json.json())
+        # Each format is cached under its own key and ETag.
+        self.assertNotEqual(as_msgpack['ETag'], as_json['ETag'])
+        self.assertEqual(self.client.get(f'{url}?format=msgpack').content, as_msgpack.content)
+        self.assertEqual(self.client.get(url).content, as_json.content)
+
+    def test_values_rows_match_the_serializer_output(self):
+        self.make_offer()
+        self.make_request()
+        Requests.objects.create(user_id=self.owner, comm_id=self.community, request_type='borrow', title='Saw',
+                                description='', from_time=time(9, 15), to_date=date(2025, 1, 2))
+        for name, (queryset, ordering, serializer, columns, formatter) in LISTINGS.items():
+            if name == 'posts':
+                continue
+            with self.subTest(listing=name):
+                rows = queryset.order_by(*ordering)
+                expected = formatter(serializer(rows, many=True).data)
+                self.assertEqual(JSONRenderer().render(formatter(rows.values(*columns))),
+                                 JSONRenderer().render(expected))
+
+    def test_post_rows_match_the_serializer_fields(self):
+        Posts.objects.create(user_id=self.owner, comm_id=self.community, text_content='Hi',
+                             date=date(2025, 1, 1), time=time(9, 0, 0, 123456))
+        queryset, ordering, serializer, columns, formatter = LISTINGS['posts']
+        expected = serializer(queryset.order_by(*ordering), many=True).data
+        rows = formatter(queryset.order_by(*ordering).values(*columns))
+        self.assertEqual(rows, [{field: item[field] for field in rows[0]} for item in expected])
+
+
+class DashboardTests(StatusTestCase):
+    def setUp(self):
+        super().setUp()
+        self.authors = [self.make_user(f'Author {i}') for i in range(4)]
+        for i, author in enumerate(self.authors):
+            Join.objects.create(comm_id=self.community, user_id=author, referral_code='0')
+            Posts.objects.create(user_id=author, comm_id=self.community, text_content=f'Post {i}',
+                                 date=date(2025, 1, 1 + i), time=time(9, 0))
+            Offers.objects.create(user_id=author, comm_id=self.community, offer_type='lend', title=f'Offer {i}',
+                                  description='', status=OPEN)
+            JoinRequest.objects.create(admin_id=self.owner, member_id=author, comm_id=self.community)
+        self.offer = self.make_offer()
+        for _ in range(3):
+            self.make_request()
+        self.make_request(ACCEPTED, self.offer)
+
+    def dashboard(self, query=''):
+        return self.client.get(f'/api/dashboard/{self.community.id}{query}')
+
+    def test_sections_match_the_list_endpoints(self):
+        comm, owner, neighbour = self.community.id, self.owner.id, self.neighbour.id
+        data = self.dashboard(f'?user_id={owner}&page_size=2').json()
+        lists = {
+            'posts': f'/api/get_posts/{comm}',
+            'offers': f'/api/get_offers/{comm}',
+            'public_requests': f'/api/view_public_requests/{comm}',
+            'user_requests': f'/api/view_user_requests/{comm}/{owner}',
+            'join_requests': f'/api/view_join_requests/{comm}/{owner}',
+        }
+        self.assertEqual(list(data), list(dashboard.SECTIONS))
+        for section, url in lists.items():
+            with self.subTest(section=section):
+                response = self.client.get(f'{url}?page_size=2')
+                self.assertEqual(data[section]['items'], response.json())
+                self.assertEqual(data[section]['next_cursor'], response.headers.get('X-Next-Cursor'))
+        # The cursors carry on in the list endpoints.
+        rest = self.client.get(f"{lists['offers']}?page_size=2&cursor={data['offers']['next_cursor']}").json()
+        self.assertEqual(len(rest), 2)
+        self.assertEqual(data['user_requests']['items'], [])
+        self.assertEqual(data['community'], {
+            'id': comm, 'name': 'Block', 'location': 'Here',
+            'open_offers': 5, 'open_requests': 3, 'members': 6, 'pending_join_requests': 4,
+        })
+        neighbours = self.dashboard(f'?user_id={neighbour}&sections=user_requests').json()
+        self.assertEqual(len(neighbours['user_requests']['items']), 4)
+
+    def test_communities_without_counters_show_zeros(self):
+        CommunityStats.objects.filter(comm_id=self.community).delete()
+        community = self.dashboard('?sections=community').json()['community']
+        self.assertEqual({field: community[field] for field in stats.FIELDS}, dict.fromkeys(stats.FIELDS, 0))
+
+    def test_one_query_per_section_however_many_authors(self):
+        with self.assertNumQueries(7):
+            data = dashboard.build(self.community.id, self.owner.id)
+        self.assertEqual(len(data['posts']['items']), 4)
+        for i in range(4, 8):
+            author = self.make_user(f'Author {i}')
+            Posts.objects.create(user_id=author, comm_id=self.community, text_content=f'Post {i}',
+                                 date=date(2025, 2, i), time=time(9, 0))
+        profile_cache.clear()
+        with self.assertNumQueries(7):
+            data = dashboard.build(self.community.id, self.owner.id)
+        self.assertEqual(len(data['posts']['items']), 8)
+
+    def test_sections_can_be_picked(self):
+        data = self.dashboard('?sections=offers, community,offers').json()
+        self.assertEqual(list(data), ['community', 'offers'])
+        profile_cache.clear()
+        with self.assertNumQueries(3):
+            dashboard.build(self.community.id, None, ['offers'])
+
+    def test_anonymous_callers_get_the_shared_sections(self):
+        self.assertEqual(list(self.dashboard().json()), ['community', 'posts', 'offers', 'public_requests'])
+        response = self.dashboard('?sections=join_requests')
+        self.assertEqual(response.status_code, 400)
+
+    def test_session_tokens_pick_the_user(self):
+        token, _ = session_tokens.issue(self.owner.id)
+        data = self.client.get(f'/api/dashboard/{self.community.id}?user_id={self.neighbour.id}',
+                               HTTP_AUTHORIZATION=f'Bearer {token}').json()
+        self.assertEqual(len(data['join_requests']['items']), 4)
+        self.assertEqual(data['user_requests']['items'], [])
+
+    def test_bad_input(self):
+        self.assertEqual(self.dashboard('?sections=nope').status_code, 400)
+        self.assertEqual(self.dashboard('?user_id=not-a-uuid').status_code, 400)
+        self.assertEqual(self.client.get('/api/dashboard/abc').status_code, 400)
+        self.assertEqual(self.client.get('/api/dashboard/999999').status_code, 404)
+
+
+class EnrichmentTests(StatusTestCase):
+    def setUp(self):
+        super().setUp()
+        self.offer = self.make_offer()
+
+    def add_authors(self, count):
+        for _ in range(count):
+            author = self.make_user(f'Author {User.objects.count()}')
+            Join.objects.create(comm_id=self.community, user_id=author, referral_code='0')
+            Offers.objects.create(user_id=author, comm_id=self.community, offer_type='lend', title='Saw',
+                                  description='', status=OPEN)
+            Requests.objects.create(user_id=author, comm_id=self.community, request_type='borrow', title='Saw',
+                                    description='', status=PENDING, offer_id=self.offer)
+            Requests.objects.create(user_id=author, comm_id=self.community, request_type='borrow', title='Saw',
+                                    description='', status=PENDING)
+            JoinRequest.objects.create(admin_id=self.owner, member_id=author, comm_id=self.community)
+
+    def listings(self):
+        comm, owner = self.community.id, self.owner.id
+        return [
+            f'/api/get_offers/{comm}',
+            f'/api/get_offers_for_user/{owner}/{comm}',
+            f'/api/view_public_requests/{comm}',
+            f'/api/view_user_requests/{comm}/{owner}',
+            f'/api/view_request_from_neighbours/{self.offer.id}',
+            f'/api/view_join_requests/{comm}/{owner}',
+        ]
+
+    def count_queries(self, url):
+        caches[settings.RESPONSE_CACHE_ALIAS].clear()
+        profile_cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return len(queries)
+
+    def test_listings_look_up_all_authors_at_once(self):
+        self.add_authors(2)
+        before = {url: self.count_queries(url) for url in self.listings()}
+        self.add_authors(10)
+        for url in self.listings():
+            with self.subTest(url=url):
+                self.assertEqual(self.count_queries(url), before[url])
+        profile_cache.clear()
+        with self.assertNumQueries(2):
+            offers = self.client.get(f'/api/get_offers/{self.community.id}').json()
+        names = {offer['user_name'] for offer in offers}
+        self.assertEqual(len(names), 13)
+        self.assertIn('Owner', names)
+
+    def test_missing_profiles_have_no_name(self):
+        nameless = self.make_user()
+        Offers.objects.create(user_id=nameless, comm_id=self.community, offer_type='lend', title='Saw',
+                              description='', status=OPEN)
+        offers = self.client.get(f'/api/get_offers/{self.community.id}').json()
+        self.assertEqual([offer['user_name'] for offer in offers], ['Owner', None])
+
+    def test_loader_shares_one_query_across_listings(self):
+        self.add_authors(3)
+        offers = Offers.objects.values(*enrichment.OFFER_COLUMNS)
+        requests = Requests.objects.values(*enrichment.REQUEST_COLUMNS)
+        loader = enrichment.ProfileLoader()
+        loader.prime(row['user_id'] for row in offers)
+        loader.prime(row['user_id'] for row in requests)
+        list(offers), list(requests)
+        with self.assertNumQueries(1):
+            enrichment.format_offers(offers, loader)
+            enrichment.format_requests(requests, loader)
+        # The process-wide cache answers the next request without a query.
+        with self.assertNumQueries(0):
+            enrichment.format_offers(offers)
+
+    def test_oldest_profile_wins(self):
+        Profile.objects.create(uuid=self.owner, email='second@example.com', name='Second', age=30, pno='1',
+                               profession='p', user_code='c')
+        profile_cache.clear()
+        self.assertEqual(enrichment.ProfileLoader().get(self.owner.id).name, 'Owner')
+
+
+class FeedTests(StatusTestCase):
+    def test_merges_communities_and_kinds_across_pages(self):
+        other = self.make_community(self.neighbour, members=[self.owner])
+        start = timezone.now()
+        expected = []
+        for i in range(12):
+            community = (self.community, other)[i % 2]
+            # Every third instant is shared by a post and an offer, so ties are ordered by kind.
+            created_at = start - timedelta(minutes=i - i % 3)
+            post = Posts.objects.create(user_id=self.owner, comm_id=community, text_content=f'Post {i}',
+                                        date=date(2025, 1, 1), time=time(9))
+            offer = Offers.objects.create(user_id=self.owner, comm_id=community, offer_type='lend', title='Drill',
+                                          description='A drill', status=OPEN)
+            request = Requests.objects.create(user_id=self.neighbour, comm_id=community, request_type='borrow',
+                                              title='Drill', description='Need a drill', status=PENDING)
+            Posts.objects.filter(id=post.id).update(created_at=created_at)
+            Offers.objects.filter(id=offer.id).update(created_at=created_at)
+            Requests.objects.filter(id=request.id).update(created_at=created_at - timedelta(seconds=30))
+            expected += [(created_at, 0, post.id), (created_at, 1, offer.id),
+                         (created_at - timedelta(seconds=30), 2, request.id)]
+        # Answered requests stay out of the feed.
+        Requests.objects.create(user_id=self.neighbour, comm_id=other, request_type='borrow', title='Saw',
+                                description='Need a saw', status=PENDING, offer_id=self.make_offer())
+        expected.append((Offers.objects.latest('id').created_at, 1, Offers.objects.latest('id').id))
+        kinds = ('post', 'offer', 'request')
+        expected = [(kinds[rank], pk) for _, rank, pk in sorted(expected, reverse=True)]
+
+        token, _ = session_tokens.issue(self.owner.id)
+        url = f'/api/home_feed/{self.owner.id}?page_size=5'
+        seen, cursor = [], None
+        while True:
+            response = self.client.get(f'{url}&cursor={cursor}' if cursor else url,
+                                       HTTP_AUTHORIZATION=f'Bearer {token}')
+            self.assertEqual(response.status_code, 200, response.content)
+            seen += [(item['kind'], item['id']) for item in response.json()]
+            cursor = response.headers.get('X-Next-Cursor')
+            if not cursor:
+                break
+        self.assertEqual(seen, expected)
+
+    def test_query_count_does_not_grow_with_communities(self):
+        self.make_offer()
+        comm_ids = [self.community.id]
+        with CaptureQueriesContext(connection) as queries:
+            feed.page(comm_ids, page_size=10)
+        expected = len(queries)
+        for _ in range(4):
+            other = self.make_community(self.neighbour, members=[self.owner])
+            Posts.objects.create(user_id=self.neighbour, comm_id=other, text_content='Hello',
+                                 date=date(2025, 1, 1), time=time(9, 0))
+            comm_ids.append(other.id)
+        with self.assertNumQueries(expected):
+            items = feed.page(comm_ids, page_size=10).rows
+        self.assertEqual(len(items), 5)
+
+
+class EventBrokerTests(ApiTestCase):
+    def test_local_broker_warns_to_run_one_worker(self):
+        with mock.patch.dict('os.environ', {'WEB_CONCURRENCY': '1'}):
+            self.assertEqual([message.id for message in checks.check_event_broker(None)], ['api.W002'])
+            events.require_single_worker()
+
+    def test_local_broker_refuses_several_workers(self):
+        with mock.patch.dict('os.environ', {'WEB_CONCURRENCY': '4'}):
+            self.assertEqual([message.id for message in checks.check_event_broker(None)], ['api.E002'])
+            with self.assertRaises(ImproperlyConfigured):
+                events.require_single_worker()
+
+    @override_settings(EVENT_BROKER='api.tests.SharedBroker')
+    def test_cross_process_brokers_can_scale_out(self):
+        with mock.patch.dict('os.environ', {'WEB_CONCURRENCY': '4'}):
+            self.assertEqual(checks.check_event_broker(None), [])
+            events.require_single_worker()
+
+
+class SharedBroker(events.LocalBroker):
+    """Stands in for a cross-process broker."""
+
+
+class StreamTests(StatusTestCase):
+    async def test_outsiders_cannot_subscribe(self):
+        outsider = await User.objects.acreate(email='outsider@example.com')
+        token, _ = session_tokens.issue(outsider.id)
+        response = await self.async_client.get(f'/api/stream/{self.community.id}',
+                                               headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(response.status_code, 403)
+
+    async def test_invalid_tokens_are_rejected(self):
+        response = await self.async_client.get(f'/api/stream/{self.community.id}',
+                                               headers={'Authorization': 'Bearer nonsense'})
+        self.assertEqual(response.status_code, 401)
+
+    @override_settings(COMMUNITY_MEMBERSHIP_REQUIRED=True)
+    async def test_anonymous_callers_need_a_token_when_required(self):
+        response = await self.async_client.get(f'/api/stream/{self.community.id}')
+        self.assertEqual(response.status_code, 401)
+
+
+@override_settings(COMMUNITY_MEMBERSHIP_REQUIRED=True)
+class MembershipRequiredTests(StatusTestCase):
+    def setUp(self):
+        super().setUp()
+        self.outsider = self.make_user('Outsider')
+        self.make_community(self.outsider)
+        self.offer = self.make_offer()
+        self.request = self.make_request()
+
+    def routes(self):
+        comm, owner, offer, request = self.community.id, self.owner.id, self.offer.id, self.request.id
+        return [
+            ('get', f'/api/get_posts/{comm}', None),
+            ('get', f'/api/get_offers/{comm}', None),
+            ('get', f'/api/get_offers_for_user/{owner}/{comm}', None),
+            ('get', f'/api/view_public_requests/{comm}', None),
+            ('get', f'/api/view_user_requests/{comm}/{owner}', None),
+            ('get', f'/api/view_request_from_neighbours/{offer}', None),
+            ('get', f'/api/community_summary/{comm}', None),
+            ('get', f'/api/dashboard/{comm}', None),
+            ('get', f'/api/view_join_requests/{comm}/{owner}', None),
+            ('get', f'/api/search/{comm}?q=drill', None),
+            ('get', f'/api/sync/{comm}', None),
+            ('put', f'/api/update_offer_status/{offer}/{DECLINED}', None),
+            ('put', f'/api/update_request_status/{request}/{ACCEPTED}/{offer}', None),
+            ('post', '/api/create_post', {'comm_id': comm, 'text_content': 'Hi'}),
+            ('post', '/api/create_offer', {'comm_id': comm, 'offer_type': 'lend', 'title': 'Saw'}),
+            ('post', '/api/create_request', {'comm_id': comm, 'request_type': 'borrow', 'title': 'Saw'}),
+        ]
+
+    def call(self, method, url, body, user=None):
+        headers = {}
+        if user is not None:
+            headers['HTTP_AUTHORIZATION'] = f'Bearer {session_tokens.issue(user.id)[0]}'
+        if body is not None:
+            body = {**body, 'user_id': str(user.id if user is not None else self.owner.id)}
+        return getattr(self.client, method)(url, body, content_type='application/json', **headers)
+
+    def test_outsiders_get_403_on_every_community_route(self):
+        for method, url, body in self.routes():
+            with self.subTest(url=url):
+                self.assertEqual(self.call(method, url, body, self.outsider).status_code, 403)
+        self.offer.refresh_from_db()
+        self.request.refresh_from_db()
+        self.assertEqual((self.offer.status, self.request.status), (OPEN, PENDING))
+
+    def test_anonymous_callers_get_401(self):
+        for method, url, body in self.routes():
+            with self.subTest(url=url):
+                self.assertEqual(self.call(method, url, body).status_code, 401)
+        self.assertEqual(self.client.get(f'/api/home_feed/{self.owner.id}').status_code, 401)
+
+    def test_members_get_through(self):
+        for method, url, body in self.routes():
+            if method == 'get' and 'view_join_requests' not in url:
+                with self.subTest(url=url):
+                    self.assertEqual(self.call(method, url, body, self.neighbour).status_code, 200)
+        response = self.call('put', f'/api/update_offer_status/{self.offer.id}/{DECLINED}', None, self.owner)
+        self.assertEqual(response.status_code, 200)
+
+    def test_home_feed_is_only_the_callers(self):
+        token, _ = session_tokens.issue(self.outsider.id)
+        response = self.client.get(f'/api/home_feed/{self.owner.id}', HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get(f'/api/home_feed/{self.outsider.id}', HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(response.status_code, 200)
+
+    def test_members_cannot_create_as_someone_else(self):
+        token, _ = session_tokens.issue(self.neighbour.id)
+        response = self.client.post('/api/create_post', {'comm_id': self.community.id, 'user_id': str(self.owner.id),
+                                                         'text_content': 'Hi'},
+                                    content_type='application/json', HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(response.status_code, 403)
+
+    def batch(self, user, url, items):
+        token, _ = session_tokens.issue(user.id)
+        response = self.client.post(f'/api/batch/{url}', {'items': items}, content_type='application/json',
+                                    HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(response.status_code, 200, response.content)
+        return [result['code'] for result in response.json()['results']]
+
+    def test_batches_check_every_item(self):
+        own = Community.objects.get(admin_id=self.outsider)
+        posts = [
+            {'user_id': str(self.outsider.id), 'comm_id': own.id, 'text_content': 'Mine'},
+            {'user_id': str(self.outsider.id), 'comm_id': self.community.id, 'text_content': 'Theirs'},
+            {'user_id': str(self.owner.id), 'comm_id': own.id, 'text_content': 'As someone else'},
+        ]
+        self.assertEqual(self.batch(self.outsider, 'create_posts', posts), [201, 403, 403])
+        offers = [{'user_id': str(self.outsider.id), 'comm_id': self.community.id, 'offer_type': 'lend',
+                   'title': 'Saw', 'description': 'A saw'}]
+        self.assertEqual(self.batch(self.outsider, 'create_offers', offers), [403])
+        self.assertEqual(self.batch(self.outsider, 'update_offer_status', [{'id': self.offer.id, 'status': DECLINED}]),
+                         [403])
+        items = [{'id': self.request.id, 'status': ACCEPTED, 'offer_id': self.offer.id}]
+        self.assertEqual(self.batch(self.outsider, 'update_request_status', items), [403])
+        self.assertEqual(self.batch(self.neighbour, 'update_request_status', items), [200])
+        self.assertFalse(Posts.objects.filter(comm_id=self.community).exists())
+        self.assertCountersConsistent()
+
+    def test_outsiders_cannot_join_themselves_as_admin(self):
+        token, _ = session_tokens.issue(self.outsider.id)
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {token}'}
+        body = {'comm_id': self.community.id, 'user_id': str(self.outsider.id), 'referral_code': '0', 'is_admin': 1}
+        response = self.client.post('/api/create_join', body, content_type='application/json', **headers)
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Join.objects.filter(comm_id=self.community, user_id=self.outsider).exists())
+        response = self.client.get(f'/api/view_join_requests/{self.community.id}/{self.outsider.id}', **headers)
+        self.assertEqual(response.status_code, 403)
+
+    def test_admins_add_members_but_not_admins(self):
+        token, _ = session_tokens.issue(self.owner.id)
+        body = {'comm_id': self.community.id, 'user_id': str(self.outsider.id), 'referral_code': '0', 'is_admin': 1}
+        response = self.client.post('/api/create_join', body, content_type='application/json',
+                                    HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(Join.objects.get(comm_id=self.community, user_id=self.outsider).is_admin, 0)
+
+    async def test_outsiders_cannot_stream(self):
+        token, _ = session_tokens.issue(self.outsider.id)
+        response = await self.async_client.get(f'/api/stream/{self.community.id}',
+                                               headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(response.status_code, 403)
+
+
+class SyncTests(StatusTestCase):
+    def setUp(self):
+        super().setUp()
+        self.offers = [self.make_offer() for _ in range(5)]
+        self.age(Offers)
+
+    def age(self, model):
+        # Move rows out of the overlap window, as if they changed an hour ago.
+        model.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+
+    def sync(self, token=None, **kwargs):
+        return sync.changes(self.community.id, token, **kwargs)
+
+    def test_first_sync_resets_and_later_ones_send_deltas(self):
+        first = self.sync()
+        self.assertTrue(first['reset'])
+        self.assertEqual([offer['id'] for offer in first['offers']], [offer.id for offer in self.offers])
+
+        nothing = self.sync(first['token'])
+        self.assertFalse(nothing['reset'])
+        self.assertEqual((nothing['offers'], nothing['deleted']), ([], []))
+
+        changed, deleted_id = self.offers[1], self.offers[3].id
+        changed.title = 'Saw'
+        changed.save()
+        self.offers[3].delete()
+        delta = self.sync(nothing['token'])
+        self.assertEqual([offer['id'] for offer in delta['offers']], [changed.id])
+        self.assertEqual(delta['deleted'], [{'kind': 'offers', 'id': deleted_id}])
+
+    def test_limit_pages_through_without_gaps(self):
+        token, seen = None, []
+        while True:
+            result = self.sync(token, limit=2)
+            seen += [offer['id'] for offer in result['offers']]
+            token = result['token']
+            if not result['more']:
+                break
+        self.assertEqual(seen, [offer.id for offer in self.offers])
+
+    def test_tokens_past_the_tombstone_retention_reset(self):
+        token = self.sync()['token']
+        with override_settings(SYNC_TOMBSTONE_RETENTION_DAYS=0):
+            self.assertTrue(self.sync(token)['reset'])
+
+    def test_tokens_are_tied_to_their_community(self):
+        other = self.make_community(self.owner)
+        token = self.sync()['token']
+        with self.assertRaises(sync.InvalidSyncToken):
+            sync.changes(other.id, token)
+        with self.assertRaises(sync.InvalidSyncToken):
+            self.sync('not-a-token')
+        response = self.client.get(f'/api/sync/{other.id}?since={token}')
+        self.assertEqual(response.status_code, 400)
+
+    def test_join_requests_only_for_their_admin(self):
+        outsider = self.make_user()
+        JoinRequest.objects.create(admin_id=self.owner, member_id=outsider, comm_id=self.community)
+        self.assertEqual(self.sync()['join_requests'], [])
+        self.assertEqual(len(self.sync(admin_id=self.owner.id)['join_requests']), 1)
+
+
+class SearchTests(StatusTestCase):
+    def offer(self, title, description, user=None):
+        return Offers.objects.create(user_id=user or self.owner, comm_id=self.community, offer_type='lend',
+                                     title=title, description=description, status=OPEN)
+
+    def ids(self, query, **kwargs):
+        return [row['object_id'] for row in search.search(self.community.id, query, **kwargs)]
+
+    def test_title_matches_outrank_body_matches(self):
+        body = self.offer('Tools', 'A cordless drill with two batteries')
+        title = self.offer('Cordless drill', 'Two batteries included')
+        self.assertEqual(self.ids('drill'), [title.id, body.id])
+
+    def test_every_term_must_match(self):
+        both = self.offer('Ladder', 'A tall aluminium ladder')
+        self.offer('Ladder', 'Wooden')
+        self.assertEqual(self.ids('aluminium ladder'), [both.id])
+        self.assertEqual(self.ids('aluminium chainsaw'), [])
+        self.assertEqual(self.ids('the and of'), [])
+
+    def test_plurals_match(self):
+        offer = self.offer('Drills', 'Several')
+        self.assertEqual(self.ids('drill'), [offer.id])
+
+    def test_kinds_and_communities_are_separate(self):
+        offer = self.offer('Tent', 'For two')
+        post = Posts.objects.create(user_id=self.owner, comm_id=self.community, text_content='Who has a tent?',
+                                    date=date(2025, 1, 1), time=time(9))
+        other = self.make_community(self.owner)
+        Posts.objects.create(user_id=self.owner, comm_id=other, text_content='Tent for sale',
+                             date=date(2025, 1, 1), time=time(9))
+        self.assertEqual(sorted(self.ids('tent')), sorted([offer.id, post.id]))
+        self.assertEqual(self.ids('tent', kinds=[SearchDocument.POST]), [post.id])
+
+    def test_offset_and_limit_page_the_ranking(self):
+        for i in range(5):
+            self.offer('Bike', 'bike ' * i)
+        ranking = self.ids('bike')
+        self.assertEqual(len(ranking), 5)
+        self.assertEqual(self.ids('bike', offset=2, limit=2), ranking[2:4])
+
+    def test_deleted_rows_leave_the_index(self):
+        offer = self.offer('Projector', 'HD')
+        offer.delete()
+        self.assertEqual(self.ids('projector'), [])
+
+
+class BulkTests(StatusTestCase):
+    def make_posts(self, count):
+        return [Posts.objects.create(user_id=self.owner, comm_id=self.community, text_content=f'Garden party {i}',
+                                     date=date(2025, 1, 1 + i), time=time(9, i))
+                for i in range(count)]
+
+    def test_export_and_import_round_trip(self):
+        posts = self.make_posts(3)
+        columns = bulk.TABLES['posts'][1]
+        expected = list(Posts.objects.order_by('pk').values_list(*columns))
+        for fmt in bulk.FORMATS:
+            with self.subTest(fmt=fmt):
+                stream = io.StringIO()
+                self.assertEqual(bulk.export_rows('posts', stream, fmt, comm_id=self.community.id).rows, 3)
+                Posts.objects.all().delete()
+                stream.seek(0)
+                result = bulk.import_rows('posts', stream, fmt, batch_size=2)
+                self.assertEqual((result.rows, result.skipped), (3, 0))
+                self.assertEqual(list(Posts.objects.order_by('pk').values_list(*columns)), expected)
+                self.assertEqual(sorted(row['object_id'] for row in search.search(self.community.id, 'garden')),
+                                 [post.id for post in posts])
+
+    def test_imported_posts_keep_their_timestamps(self):
+        stream = io.StringIO(json.dumps({'user_id': str(self.owner.id), 'comm_id': self.community.id,
+                                         'text_content': 'Old', 'date': '2020-05-01', 'time': '08:30:00'}) + '\n')
+        bulk.import_rows('posts', stream, 'jsonl')
+        post = Posts.objects.get()
+        self.assertEqual(post.created_at.isoformat(), '2020-05-01T08:30:00+00:00')
+
+    def test_invalid_rows_stop_the_import_after_committed_batches(self):
+        rows = [{'user_id': str(self.owner.id), 'comm_id': self.community.id, 'text_content': f'Post {i}'}
+                for i in range(3)]
+        rows[2]['comm_id'] = ''
+        stream = io.StringIO(''.join(json.dumps(row) + '\n' for row in rows))
+        with self.assertRaisesMessage(bulk.BulkError, 'line 3: comm_id is required') as caught:
+            bulk.import_rows('posts', stream, 'jsonl', batch_size=2)
+        self.assertEqual(caught.exception.result.rows, 2)
+        self.assertEqual(Posts.objects.count(), 2)
+
+        stream.seek(0)
+        Posts.objects.all().delete()
+        result = bulk.import_rows('posts', stream, 'jsonl', skip_invalid=True)
+        self.assertEqual((result.rows, result.skipped), (2, 1))
+
+    def test_malformed_json_names_the_line(self):
+        with self.assertRaisesMessage(bulk.BulkError, 'line 1: invalid JSON'):
+            bulk.import_rows('posts', io.StringIO('{nope\n'), 'jsonl')
+
+    def test_imported_joins_update_member_counts(self):
+        member = self.make_user()
+        stream = io.StringIO(f'comm_id,user_id,referral_code\n{self.community.id},{member.id},0\n')
+        bulk.import_rows('joins', stream, 'csv')
+        self.assertEqual(stats.summary(self.community.id)['members'], 3)
+        self.assertCountersConsistent()
+
+
+class JoinTests(ApiTestCase):
+    def test_create_join_ignores_is_admin(self):
+        admin, user = self.make_user(), self.make_user()
+        community = self.make_community(admin)
+        response = self.client.post('/api/create_join', {'comm_id': community.id, 'user_id': str(user.id),
+                                                         'referral_code': '0', 'is_admin': 1},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['is_admin'], 0)
+
+    def test_create_community_makes_its_creator_admin(self):
+        user = self.make_user()
+        response = self.client.post(f'/api/create_community/{user.id}', {
+            'comm_name': 'Block', 'admin_id': str(user.id), 'location': 'Here', 'latitude': 52.5, 'longtitude': 13.4,
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()['is_admin'], 1)
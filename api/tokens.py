@@ -0,0 +1,166 @@
+import base64
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+import uuid
+
+from cachetools import TTLCache
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+
+VERSION = 'v1'
+# Cache backends whose entries only live in the process that wrote them.
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+class InvalidToken(Exception):
+    pass
+
+
+class ExpiredToken(InvalidToken):
+    pass
+
+
+class RevokedToken(InvalidToken):
+    pass
+
+
+class Claims:
+    __slots__ = ('user_id', 'expires_at', 'token_id')
+
+    def __init__(self, user_id, expires_at, token_id):
+        self.user_id = user_id
+        self.expires_at = expires_at
+        self.token_id = token_id
+
+
+# Signs tokens in development when no SESSION_TOKEN_SECRET is set, so they
+# never fall back to the committed SECRET_KEY.
+_DEBUG_SECRET = secrets.token_urlsafe(32)
+
+
+def secret_is_usable(secret):
+    return bool(secret) and secret != settings.SECRET_KEY
+
+
+def _key(secret):
+    return hashlib.sha256(b'neighborly.session-token:' + secret.encode()).digest()
+
+
+def _sign(key, message):
+    digest = hmac.new(key, message.encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).decode().rstrip('=')
+
+
+def _revocation_key(token_id):
+    return f'revoked-token:{token_id}'
+
+
+class SessionTokens:
+    """
+    Short-lived HMAC-SHA256 session tokens of the form
+    ``v1.<user id>.<expiry>.<token id>.<signature>``.
+
+    Verifying one is a split, an HMAC and a comparison. Tokens verified
+    recently are kept in a small TTL cache, so repeat requests skip even
+    that; expiry and revocation are still checked on every call. Tokens
+    signed with ``SESSION_TOKEN_SECRET_FALLBACKS`` keep working during a
+    key rotation.
+    """
+
+    def __init__(self, secret=None, ttl=None, cache_size=None, cache_ttl=None, revocation_cache=None):
+        self.secret = secret
+        self.ttl = ttl
+        self.revocation_cache = revocation_cache
+        self._verified = TTLCache(maxsize=cache_size or settings.SESSION_TOKEN_CACHE_SIZE,
+                                  ttl=cache_ttl or settings.SESSION_TOKEN_CACHE_TTL)
+        self._lock = threading.Lock()
+        self._keys = None
+
+    def keys(self):
+        if self._keys is None:
+            if self.secret:
+                secret, fallbacks = self.secret, []
+            else:
+                secret = settings.SESSION_TOKEN_SECRET
+                fallbacks = [fallback for fallback in settings.SESSION_TOKEN_SECRET_FALLBACKS
+                             if secret_is_usable(fallback)]
+                if not secret_is_usable(secret):
+                    if not settings.DEBUG:
+                        raise ImproperlyConfigured('Set SESSION_TOKEN_SECRET to a secret other than SECRET_KEY.')
+                    secret = _DEBUG_SECRET
+            self._keys = [_key(secret)] + [_key(fallback) for fallback in fallbacks]
+        return self._keys
+
+    def get_ttl(self):
+        return self.ttl if self.ttl is not None else settings.SESSION_TOKEN_TTL
+
+    def _revocation_alias(self):
+        return self.revocation_cache if self.revocation_cache is not None else settings.SESSION_TOKEN_REVOCATION_CACHE
+
+    def get_revocation_cache(self):
+        alias = self._revocation_alias()
+        return caches[alias] if alias else None
+
+    def revocation_is_shared(self):
+        """Whether a revocation is seen by every process, not just the one that made it."""
+        alias = self._revocation_alias()
+        return bool(alias) and settings.CACHES[alias]['BACKEND'] not in LOCAL_CACHE_BACKENDS
+
+    def issue(self, user_id, ttl=None):
+        """Return ``(token, expires_at)`` for ``user_id``; ``expires_at`` is a Unix time."""
+        expires_at = int(time.time()) + (ttl if ttl is not None else self.get_ttl())
+        message = f'{VERSION}.{uuid.UUID(str(user_id)).hex}.{expires_at}.{secrets.token_urlsafe(12)}'
+        return f'{message}.{_sign(self.keys()[0], message)}', expires_at
+
+    def _parse(self, token):
+        message, _, signature = token.rpartition('.')
+        parts = message.split('.')
+        if len(parts) != 4 or parts[0] != VERSION:
+            raise InvalidToken('Malformed token.')
+        if not any(hmac.compare_digest(signature, _sign(key, message)) for key in self.keys()):
+            raise InvalidToken('Bad signature.')
+        try:
+            return Claims(uuid.UUID(hex=parts[1]), int(parts[2]), parts[3])
+        except ValueError:
+            raise InvalidToken('Malformed token.')
+
+    def verify(self, token):
+        with self._lock:
+            claims = self._verified.get(token)
+        if claims is None:
+            claims = self._parse(token)
+            with self._lock:
+                self._verified[token] = claims
+        if claims.expires_at <= time.time():
+            raise ExpiredToken('Token expired.')
+        if self.is_revoked(claims.token_id):
+            raise RevokedToken('Token revoked.')
+        return claims
+
+    def revoke(self, claims):
+        cache = self.get_revocation_cache()
+        if cache is None:
+            return False
+        remaining = claims.expires_at - int(time.time())
+        if remaining > 0:
+            cache.set(_revocation_key(claims.token_id), True, timeout=remaining)
+        return True
+
+    def is_revoked(self, token_id):
+        cache = self.get_revocation_cache()
+        return cache is not None and cache.get(_revocation_key(token_id)) is not None
+
+    def clear(self):
+        with self._lock:
+            self._verified.clear()
+        self._keys = None
+
+
+session_tokens = SessionTokens()
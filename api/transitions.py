@@ -0,0 +1,149 @@
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.functions import Now
+
+from . import stats
+from .models import Offers, Requests, JoinRequest, OPEN, PENDING, ACCEPTED, DECLINED
+
+
+class TransitionError(Exception):
+    pass
+
+
+class InvalidTransition(TransitionError):
+    pass
+
+
+class Conflict(TransitionError):
+    def __init__(self, message, current):
+        super().__init__(message)
+        self.current = current
+
+
+class GuardFailed(TransitionError):
+    pass
+
+
+class StatusMachine:
+    """
+    The statuses rows of ``model`` may move between, as a map of status to
+    the statuses reachable from it. The status is kept in ``field``.
+    Writing the status a row already has is an idempotent no-op, unless
+    the caller expected it to move from another status, the write would
+    change other columns, or the status is ``exclusive``: only one caller
+    may move a row there, so a repeat conflicts unless it names the status
+    as ``expected``.
+
+    ``apply`` makes a move with one conditional UPDATE and no prior read,
+    so when two clients race for the same row only one matches it; the
+    other gets a ``Conflict`` carrying the status it lost to. The rows
+    ``stats.COUNTERS`` counts for ``counter`` are kept tallied.
+    """
+
+    def __init__(self, model, transitions, counter=None, field='status', exclusive=()):
+        self.model = model
+        self.transitions = transitions
+        self.exclusive = frozenset(exclusive)
+        self.counter = counter
+        # The rows the counter tallies, as in stats.COUNTERS.
+        self.counted = stats.COUNTERS[counter][1] if counter else {}
+        self.field = field
+        self.statuses = set(transitions).union(*transitions.values())
+
+    def sources(self, target, expected=None):
+        """
+        The statuses a row may move to ``target`` from. Empty when
+        ``expected`` is ``target`` itself, as only a no-op can follow.
+        """
+        if target not in self.statuses:
+            raise InvalidTransition(f'Unknown status {target}.')
+        sources = [status for status, targets in self.transitions.items() if target in targets]
+        if expected is None:
+            return sources
+        if expected == target:
+            return []
+        if expected not in sources:
+            raise InvalidTransition(f'Status cannot move from {expected} to {target}.')
+        return [expected]
+
+    def allowed(self, current, target, expected=None):
+        return current in self.sources(target, expected) or self.is_noop(current, target, expected)
+
+    def is_noop(self, current, target, expected=None):
+        """Whether writing ``target`` over ``current`` leaves the status alone rather than conflicting."""
+        if current != target:
+            return False
+        return expected == target or expected is None and target not in self.exclusive
+
+    def is_counted(self, values):
+        return bool(self.counter) and all(values[name] == value for name, value in self.counted.items())
+
+    def delta(self, before, after):
+        """How a row changing from ``before`` to ``after`` (dicts of its columns) moves the counter."""
+        return self.is_counted(after) - self.is_counted(before)
+
+    def apply(self, pk, target, expected=None, guard=None, **changes):
+        """
+        Move row ``pk`` to ``target`` (from ``expected``, or from any status
+        that may reach it), also setting ``changes``, and return its
+        community id. ``guard`` is an extra condition the row must meet.
+        A no-op (see ``is_noop``) writes nothing, and conflicts when the row
+        holds other values for ``changes``.
+        """
+        sources = self.sources(target, expected)
+        groups = []
+        if sources:
+            condition = Q(**{f'{self.field}__in': sources})
+            # Counted rows are tried on their own, so a match tells whether
+            # the row was counted without reading it first.
+            groups = [(True, condition & Q(**self.counted)), (False, condition & ~Q(**self.counted))] \
+                if self.counter else [(False, condition)]
+        with transaction.atomic():
+            for was_counted, group in groups:
+                rows = self.model.objects.filter(group, pk=pk)
+                if guard is not None:
+                    rows = rows.filter(guard)
+                if rows.update(**{self.field: target}, updated_at=Now(), **changes):
+                    row = self.model.objects.values('comm_id', *self.counted).get(pk=pk)
+                    if self.counter:
+                        stats.adjust(row['comm_id'], **{self.counter: self.is_counted(row) - was_counted})
+                    return row['comm_id']
+        # Nothing matched; only now look at the row to say why.
+        row = self.model.objects.filter(pk=pk).values(self.field, 'comm_id', *changes).first()
+        if row is None:
+            raise self.model.DoesNotExist
+        current = row[self.field]
+        if self.is_noop(current, target, expected):
+            differing = [name for name, value in changes.items() if row[name] != value]
+            if differing:
+                raise Conflict(f'Status is already {current} with another {" and ".join(differing)}.', current)
+            return row['comm_id']
+        if current not in sources:
+            raise Conflict(f'Status is {current}, not {" or ".join(map(str, sources or [target]))}.', current)
+        raise GuardFailed
+
+
+# An offer is open until its owner answers a neighbour's request on it. A
+# declined offer can still go to the next neighbour, and an accepted one
+# can be called off, but it never reopens and only one neighbour can take
+# it at a time.
+offer_statuses = StatusMachine(Offers, {
+    OPEN: {ACCEPTED, DECLINED},
+    DECLINED: {ACCEPTED},
+    ACCEPTED: {DECLINED},
+}, counter='open_offers', exclusive={ACCEPTED})
+
+# A lender accepts a request with their offer, which the offer's owner can
+# still decline; a request that fell through can be reopened. Once accepted,
+# another lender's offer conflicts.
+request_statuses = StatusMachine(Requests, {
+    PENDING: {ACCEPTED, DECLINED},
+    ACCEPTED: {PENDING, DECLINED},
+    DECLINED: {PENDING},
+}, counter='open_requests', exclusive={ACCEPTED})
+
+# A join request is settled once; accepting it also adds the member (see
+# batch.review_join_requests).
+join_request_statuses = StatusMachine(JoinRequest, {
+    PENDING: {ACCEPTED, DECLINED},
+}, counter='pending_join_requests', field='accepted')
@@ -16,11 +16,24 @@ urlpatterns = [
     path('view_public_requests/<comm_id>', views.view_public_requests),
     path('view_user_requests/<comm_id>/<user_id>', views.view_user_requests),
     path('get_user_communities/<user_id>', views.get_user_communities),
+    path('community_summary/<comm_id>', views.community_summary),
+    path('dashboard/<comm_id>', views.community_dashboard),
+    path('home_feed/<user_id>', views.home_feed),
     path('send_join_request', views.send_join_request),
     path('view_join_requests/<comm_id>/<user_id>', views.view_join_requests),
     path('get_profile/<user_id>', views.get_profile),
     path('update_offer_status/<offer_id>/<status>', views.update_offer_status),
     path('update_request_status/<request_id>/<status>/<offer_id>', views.update_request_status),
     path('get_communities/<latitude>/<longtitude>', views.get_communities),
-    path('auth/auth0/', views.Auth0LoginView.as_view())
+    path('get_community_map/<zoom>/<min_lat>/<min_lon>/<max_lat>/<max_lon>', views.get_community_map),
+    path('batch/create_posts', views.batch_create_posts),
+    path('batch/create_offers', views.batch_create_offers),
+    path('batch/update_offer_status', views.batch_update_offer_status),
+    path('batch/update_request_status', views.batch_update_request_status),
+    path('batch/review_join_requests', views.batch_review_join_requests),
+    path('search/<comm_id>', views.search_community),
+    path('sync/<comm_id>', views.sync_community),
+    path('stream/<comm_id>', views.stream_events),
+    path('auth/auth0/', views.Auth0LoginView.as_view()),
+    path('auth/logout/', views.LogoutView.as_view()),
 ]
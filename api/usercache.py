@@ -0,0 +1,79 @@
+import threading
+import uuid
+
+from cachetools import TTLCache
+
+_ABSENT = object()
+
+
+def user_key(user_id):
+    # Ids come as UUIDs from tokens and rows but as strings from URLs.
+    return user_id if isinstance(user_id, uuid.UUID) else uuid.UUID(str(user_id))
+
+
+class UserCache:
+    """
+    Per-process values keyed by user id, in a bounded LRU cache whose
+    entries expire after ``ttl`` seconds. Subclasses load the values and
+    drop a user's entry with ``invalidate`` when it changes in this
+    process; ``ttl`` bounds how long another process's changes go unseen.
+
+    ``metric`` names the Prometheus series and ``description`` what is
+    looked up, for their help text.
+    """
+
+    metric = None
+    description = None
+
+    def __init__(self, maxsize, ttl):
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        # Bumped by every invalidation, so a read that raced one isn't cached.
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def cached(self, keys):
+        """
+        The cached values among ``keys``, the keys that need loading, and
+        the generation to hand to ``store`` with what was loaded.
+        """
+        found, missing = {}, []
+        with self._lock:
+            for key in keys:
+                value = self._entries.get(key, _ABSENT)
+                if value is _ABSENT:
+                    missing.append(key)
+                else:
+                    found[key] = value
+            self.hits += len(found)
+            self.misses += len(missing)
+            return found, missing, self._generation
+
+    def store(self, values, generation):
+        with self._lock:
+            if generation == self._generation:
+                self._entries.update(values)
+
+    def invalidate(self, *user_ids):
+        with self._lock:
+            self._generation += 1
+            for user_id in user_ids:
+                self._entries.pop(user_key(user_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def collect(self, lines):
+        with self._lock:
+            hits, misses, size = self.hits, self.misses, len(self._entries)
+        lines.append(f'# HELP {self.metric}_requests_total {self.description} lookups by cache result.')
+        lines.append(f'# TYPE {self.metric}_requests_total counter')
+        lines.append(f'{self.metric}_requests_total{{result="hit"}} {hits}')
+        lines.append(f'{self.metric}_requests_total{{result="miss"}} {misses}')
+        lines.append(f'# HELP {self.metric}_entries Users with a cached {self.description.lower()}.')
+        lines.append(f'# TYPE {self.metric}_entries gauge')
+        lines.append(f'{self.metric}_entries {size}')
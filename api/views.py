@@ -1,52 +1,61 @@
 from django.shortcuts import render
-from django.http import HttpResponse
-from rest_framework.decorators import api_view
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.conf import settings
+from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework import status
-from .serializer import UserSerializer, CommunitySerializer, JoinSerializer, PostsSerializer, OffersSerializer, RequestsSerializer,ProfileSerializer,JoinRequestSerializer
-from .models import User,Community,Join,Posts,Offers,Requests,Profile,JoinRequest
+from .serializer import UserSerializer, CommunitySerializer, JoinSerializer, PostsSerializer, OffersSerializer, RequestsSerializer,ProfileSerializer,JoinRequestSerializer,RequestWindowSerializer
+from .models import User,Community,Join,Posts,Offers,Requests,JoinRequest,SearchDocument
+from . import batch, clusters, dashboard, feed, geo, search, stats, sync, transitions
+from .enrichment import (format_posts, format_offers, format_requests, format_join_requests, format_search_results,
+                         format_user_communities, POST_COLUMNS, OFFER_COLUMNS, REQUEST_COLUMNS, JOIN_REQUEST_COLUMNS,
+                         USER_COMMUNITY_COLUMNS)
+from .membership import memberships
+from .profiles import profile_cache
+from .permissions import IsCommunityMember, IsCommunityAdmin, acommunity_denied, member_of_row
+from .pagination import paginate, paginated_response, get_page_size, Offset, POSTS_ORDERING, CURSOR_PARAM
+from .caching import cached_response, communities_scope, invalidate_community, invalidate_communities
+from .metrics import registry
+from .events import hub, publish_event, RESET
+from .jwks import jwks_cache, JWKSUnavailable
+from .tokens import session_tokens
 from functools import wraps
+from django.db import transaction
+from django.db.models import Exists, Q
+import heapq
+import hmac
+import uuid
 from rest_framework.response import Response
 from rest_framework import status
-from math import radians, cos, sin, asin, sqrt
 from rest_framework.views import APIView
-from jose import jwt
-import requests
-from dotenv import load_dotenv
-import os
+from rest_framework.permissions import IsAuthenticated
 
-load_dotenv('.env')
-AUTH0_DOMAIN = os.getenv("AUTH0_DOMAIN")
 API_IDENTIFIER = 'https://neighborly.api'
 ALGORITHMS = ["RS256"]
 
 
 class Auth0LoginView(APIView):
+    # A stale session token must not get in the way of logging in again.
+    authentication_classes = []
+
     def post(self, request):
+        from jose import jwt
+
         id_token = request.data.get('id_token')
 
         if not id_token:
             return Response({'success': False, 'error': 'Missing ID token'}, status=400)
 
-        jwks_url = f'https://{AUTH0_DOMAIN}/.well-known/jwks.json'
-        jwks = requests.get(jwks_url).json()
-
         try:
             unverified_header = jwt.get_unverified_header(id_token)
         except Exception:
             return Response({'success': False, 'error': 'Invalid token header'}, status=400)
 
-        rsa_key = {}
-        for key in jwks['keys']:
-            if key['kid'] == unverified_header['kid']:
-                rsa_key = {
-                    'kty': key['kty'],
-                    'kid': key['kid'],
-                    'use': key['use'],
-                    'n': key['n'],
-                    'e': key['e']
-                }
-                break
+        try:
+            rsa_key = jwks_cache.get_key(unverified_header.get('kid'))
+        except JWKSUnavailable:
+            return Response({'success': False, 'error': 'Signing keys unavailable'}, status=503)
 
         if not rsa_key:
             return Response({'success': False, 'error': 'RSA key not found'}, status=400)
@@ -56,7 +65,7 @@ class Auth0LoginView(APIView):
             id_token,
             rsa_key,
             algorithms=ALGORITHMS,
-            issuer=f"https://{AUTH0_DOMAIN}/",
+            issuer=f"https://{settings.AUTH0_DOMAIN}/",
             options={
                 "verify_aud": False,
                 "verify_at_hash": False,  
@@ -68,10 +77,13 @@ class Auth0LoginView(APIView):
                 return Response({'success': False, 'error': 'Email not found in token'}, status=400)
 
             user, _ = User.objects.get_or_create(email=email)
+            token, expires_at = session_tokens.issue(user.id)
             return Response({
                 'success': True,
                 'email': user.email,
-                'uuid': str(user.id)
+                'uuid': str(user.id),
+                'token': token,
+                'expires_at': expires_at,
             })
 
         except jwt.ExpiredSignatureError:
@@ -80,12 +92,76 @@ class Auth0LoginView(APIView):
             return Response({'success': False, 'error': f'Invalid claims: {str(e)}'}, status=401)
         except Exception as e:
             return Response({'success': False, 'error': f'Invalid token: {str(e)}'}, status=401)
-        
+
+
+class LogoutView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        if not session_tokens.revoke(request.auth):
+            return Response({'success': False, 'error': 'Token revocation is disabled'}, status=501)
+        if not session_tokens.revocation_is_shared():
+            # A local-memory revocation cache only reaches this process.
+            return Response({'success': True, 'revoked_everywhere': False,
+                             'warning': 'The token is revoked on this server process only and stays valid '
+                                        'elsewhere until it expires.'})
+        return Response({'success': True, 'revoked_everywhere': True})
+
 
 @api_view(['GET','HEAD'])
 def home(request):
     return HttpResponse("Hello World")
 
+async def stream_events(request, comm_id):
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'error': 'Event streams need the ASGI server'}, status=503)
+    denied = await acommunity_denied(request, comm_id)
+    if denied is not None:
+        return JsonResponse({'detail': denied[1]}, status=denied[0])
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        return JsonResponse({'error': 'Invalid Last-Event-ID'}, status=400)
+
+    async def events():
+        subscription, replay = hub.subscribe(comm_id, last_event_id)
+        try:
+            yield f'retry: {settings.SSE_RETRY_MS}\n\n'
+            if replay is None:
+                yield 'event: reset\ndata: {}\n\n'
+                replay = []
+            for event in replay:
+                yield event.encode()
+            while True:
+                event = await subscription.next(settings.SSE_HEARTBEAT_SECONDS)
+                if event is None:
+                    yield ': heartbeat\n\n'
+                elif event == RESET:
+                    yield 'event: reset\ndata: {}\n\n'
+                    return
+                else:
+                    yield event.encode()
+        finally:
+            subscription.close()
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+def _may_scrape(request):
+    if request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS:
+        return True
+    token = settings.METRICS_TOKEN
+    header = request.headers.get('Authorization', '')
+    return bool(token) and hmac.compare_digest(header.encode(), f'Bearer {token}'.encode())
+
+def metrics(request):
+    if not _may_scrape(request):
+        return HttpResponse('Forbidden', status=403, content_type='text/plain')
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 @api_view(['POST'])
 def create_profile(request):
     new_profile = ProfileSerializer(data = request.data)
@@ -97,52 +173,92 @@ def create_profile(request):
 @api_view(['GET'])
 def get_profile(request, user_id):
     try:
-        profile = Profile.objects.get(uuid=user_id)
-    except Profile.DoesNotExist:
+        profile = profile_cache.get(user_id)
+    except ValueError:
+        profile = None
+    if profile is None:
         return Response(
             {"detail": "Profile not found."},
             status=status.HTTP_404_NOT_FOUND
         )
-    serializer = ProfileSerializer(profile)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    return Response(profile.as_dict(), status=status.HTTP_200_OK)
 
 @api_view(['POST'])
+@transaction.atomic
 def create_community(request, user_id):
     new_community = CommunitySerializer(data=request.data)
     
     if new_community.is_valid():
         community_instance = new_community.save()
+        invalidate_communities()
         comm_id = community_instance.id 
         body = {
             "comm_id": comm_id,
             "user_id": user_id,
             "referral_code": "0",
-            "is_admin": 1
         }
         new_join = JoinSerializer(data=body)
         if new_join.is_valid():
-            new_join.save()
+            new_join.save(is_admin=1)
             return Response(new_join.data, status=status.HTTP_201_CREATED)
         return Response(new_join.errors, status=status.HTTP_400_BAD_REQUEST)
     return Response(new_community.errors, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['GET'])
 def get_user_communities(request, user_id):
-    communities = Join.objects.filter(user_id = user_id)
-    serializer = JoinSerializer(communities, many = True)
-    community_datas = []
-    for data in serializer.data:
-        community_details = Community.objects.get(id = data['comm_id'])
-        community_data = {}
-        community_data['id'] = data['id']
-        community_data['name'] = community_details.comm_name
-        community_data['location'] = community_details.location
-        community_data['is_admin'] = data["is_admin"]
-        community_datas.append(community_data)
-    return Response(community_datas)
+    communities = Join.objects.filter(user_id = user_id).values(*USER_COMMUNITY_COLUMNS)
+    return Response(format_user_communities(communities))
+
+@api_view(['GET'])
+@permission_classes([IsCommunityMember])
+def community_summary(request, comm_id):
+    try:
+        summary = stats.summary(int(comm_id))
+    except ValueError:
+        summary = None
+    if summary is None:
+        return Response({'error': 'Community not found'}, status=404)
+    return Response({'comm_id': int(comm_id), **summary})
+
+@api_view(['GET'])
+@permission_classes([IsCommunityMember])
+def home_feed(request, user_id):
+    try:
+        user_id = uuid.UUID(str(user_id))
+    except ValueError:
+        return Response({'error': 'Invalid user id'}, status=400)
+    if request.user.is_authenticated and request.user.id != user_id:
+        return Response({'error': 'You can only read your own feed.'}, status=403)
+    page = feed.page(list(memberships.get(user_id)), request.query_params.get(CURSOR_PARAM), get_page_size(request))
+    return paginated_response(request, page.rows, page)
+
+@api_view(['GET'])
+@permission_classes([IsCommunityMember])
+def community_dashboard(request, comm_id):
+    # The caller's own sections need a user: the session token's, or ?user_id=.
+    if request.user.is_authenticated:
+        user_id = request.user.id
+    else:
+        user_id = request.query_params.get('user_id') or None
+    sections = [name.strip() for name in request.query_params.get('sections', '').split(',') if name.strip()]
+    try:
+        comm_id = int(comm_id)
+        if user_id is not None:
+            user_id = uuid.UUID(str(user_id))
+        data = dashboard.build(comm_id, user_id, sections, get_page_size(request))
+    except ValueError:
+        return Response({'error': 'Invalid community or user id'}, status=400)
+    except dashboard.InvalidSections as e:
+        return Response({'error': str(e)}, status=400)
+    if data is None:
+        return Response({'error': 'Community not found'}, status=404)
+    return Response(data)
 
 @api_view(['POST'])
+@permission_classes([IsCommunityAdmin])
+@transaction.atomic
 def create_join(request):
+    # Admins add members directly; everyone else asks with send_join_request.
     new_join = JoinSerializer(data = request.data)
     if new_join.is_valid():
         new_join.save()
@@ -150,148 +266,106 @@ def create_join(request):
     return Response(new_join.errors, status = status.HTTP_400_BAD_REQUEST)
 
 @api_view(['POST'])
+@permission_classes([IsCommunityMember])
 def create_post(request):
     new_post = PostsSerializer(data = request.data)
     if new_post.is_valid():
-        new_post.save()
+        instance = new_post.save()
+        invalidate_community(instance.comm_id_id)
+        publish_event(instance.comm_id_id, 'post.created', new_post.data)
         return Response(new_post.data, status = status.HTTP_201_CREATED)
     return Response(new_post.errors, status = status.HTTP_400_BAD_REQUEST)
 
 @api_view(['GET'])
+@permission_classes([IsCommunityMember])
+@cached_response('get_posts')
 def get_posts(request, comm_id):
-    posts = Posts.objects.filter(comm_id= comm_id)
-    serializer = PostsSerializer(posts, many = True)
-    return Response(serializer.data)
+    posts = Posts.objects.filter(comm_id= comm_id).values(*POST_COLUMNS)
+    page = paginate(posts, request, POSTS_ORDERING)
+    return paginated_response(request, format_posts(page.rows), page)
 
 @api_view(['POST'])
+@permission_classes([IsCommunityMember])
+@transaction.atomic
 def create_offer(request):
     new_offer = OffersSerializer(data = request.data)
     if new_offer.is_valid():
-        new_offer.save()
+        instance = new_offer.save()
+        invalidate_community(instance.comm_id_id)
+        publish_event(instance.comm_id_id, 'offer.created', new_offer.data)
         return Response(new_offer.data, status = status.HTTP_201_CREATED)
     return Response(new_offer.errors, status = status.HTTP_400_BAD_REQUEST)
 
 @api_view(['GET'])
+@permission_classes([IsCommunityMember])
+@cached_response('get_offers')
 def get_offers(request, comm_id):
-    offers = Offers.objects.filter(comm_id= comm_id)
-    serializer = OffersSerializer(offers, many = True)
-    offer_datas = []
-    for data in serializer.data:
-        user_details = Profile.objects.get(uuid=data['user_id'])
-        offer_data = {}
-        offer_data['id'] = data['id']
-        offer_data['user_name'] = user_details.name
-        offer_data['offer_type'] = data['offer_type']
-        offer_data['title'] = data['title']
-        offer_data['description'] = data['description']
-        offer_data['status'] = data['status']
-        offer_datas.append(offer_data)
-        
-    return Response(offer_datas)
+    offers = Offers.objects.filter(comm_id= comm_id).values(*OFFER_COLUMNS)
+    page = paginate(offers, request)
+    return paginated_response(request, format_offers(page.rows), page)
 
 @api_view(['GET'])
+@permission_classes([IsCommunityMember])
 def get_offers_for_user(request, user_id, comm_id):
-    offers = Offers.objects.filter(user_id = user_id).filter(comm_id = comm_id)
-    serializer = OffersSerializer(offers, many = True)
-    offer_datas = []
-    for data in serializer.data:
-        user_details = Profile.objects.get(uuid=data['user_id'])
-        offer_data = {}
-        offer_data['id'] = data['id']
-        offer_data['user_name'] = user_details.name
-        offer_data['offer_type'] = data['offer_type']
-        offer_data['title'] = data['title']
-        offer_data['description'] = data['description']
-        offer_data['status'] = data['status']
-        offer_datas.append(offer_data)
-        
-    return Response(offer_datas)
+    offers = Offers.objects.filter(user_id = user_id).filter(comm_id = comm_id).values(*OFFER_COLUMNS)
+    page = paginate(offers, request)
+    return paginated_response(request, format_offers(page.rows), page)
 
 @api_view(['POST'])
+@permission_classes([IsCommunityMember])
+@transaction.atomic
 def create_request(request):
     create_request = RequestsSerializer(data = request.data)
     if create_request.is_valid():
-        create_request.save()
+        instance = create_request.save()
+        invalidate_community(instance.comm_id_id)
+        publish_event(instance.comm_id_id, 'request.created', create_request.data)
         return Response(create_request.data, status = status.HTTP_201_CREATED)
     return Response(create_request.errors, status = status.HTTP_400_BAD_REQUEST)
 
+def overlapping_window(from_date=None, to_date=None, from_time=None, to_time=None, status=None):
+    # Missing bounds are open-ended, except that a request with only a start
+    # date is for that single day.
+    window = Q()
+    if status is not None:
+        window &= Q(status=status)
+    if to_date is not None:
+        window &= Q(from_date__lte=to_date) | Q(from_date__isnull=True)
+    if from_date is not None:
+        window &= Q(to_date__gte=from_date) | Q(to_date__isnull=True, from_date__gte=from_date) | Q(to_date__isnull=True, from_date__isnull=True)
+    if to_time is not None:
+        window &= Q(from_time__lte=to_time) | Q(from_time__isnull=True)
+    if from_time is not None:
+        window &= Q(to_time__gte=from_time) | Q(to_time__isnull=True)
+    return window
+
 @api_view(['GET'])
+@permission_classes([IsCommunityMember])
+@cached_response('view_public_requests')
 def view_public_requests(request, comm_id):
-    requests = Requests.objects.filter(comm_id=comm_id).filter(offer_id = None)
-    serializer = RequestsSerializer(requests, many = True)
-    request_datas = []
-    for data in serializer.data:
-        user_details = Profile.objects.get(uuid=data['user_id'])
-        request_data = {}
-        request_data['id'] = data['id']
-        request_data['user_name'] = user_details.name
-        request_data['request_type'] = data['request_type']
-        request_data['title'] = data['title']
-        request_data['description'] = data['description']
-        if data['from_time']:
-            request_data['from_time'] = data['from_time']
-        if data['to_time']:
-            request_data['to_time'] = data['to_time']
-        if data['from_date']:
-            request_data['from_date'] = data['from_date']
-        if data['to_date']:
-            request_data['to_date'] = data['to_date']
-        request_data['status'] = data['status']
-        request_datas.append(request_data)
-    return Response(request_datas)
+    window = RequestWindowSerializer(data=request.query_params)
+    window.is_valid(raise_exception=True)
+    requests = Requests.objects.filter(comm_id=comm_id).filter(offer_id = None).filter(overlapping_window(**window.validated_data))
+    page = paginate(requests.values(*REQUEST_COLUMNS), request)
+    return paginated_response(request, format_requests(page.rows), page)
 
 
 @api_view(['GET'])
+@permission_classes([IsCommunityMember])
 def view_user_requests(request, comm_id, user_id):
-    requests = Requests.objects.filter(comm_id = comm_id).filter(user_id=user_id)
-    serializer = RequestsSerializer(requests, many = True)
-    request_datas = []
-    for data in serializer.data:
-        user_details = Profile.objects.get(uuid=data['user_id'])
-        request_data = {}
-        request_data['id'] = data['id']
-        request_data['user_name'] = user_details.name
-        request_data['request_type'] = data['request_type']
-        request_data['title'] = data['title']
-        request_data['description'] = data['description']
-        if data['from_time']:
-            request_data['from_time'] = data['from_time']
-        if data['to_time']:
-            request_data['to_time'] = data['to_time']
-        if data['from_date']:
-            request_data['from_date'] = data['from_date']
-        if data['to_date']:
-            request_data['to_date'] = data['to_date']
-        request_data['status'] = data['status']
-        request_datas.append(request_data)
-    return Response(request_datas)
+    requests = Requests.objects.filter(comm_id = comm_id).filter(user_id=user_id).values(*REQUEST_COLUMNS)
+    page = paginate(requests, request)
+    return paginated_response(request, format_requests(page.rows), page)
 
 @api_view(['GET'])
+@permission_classes([member_of_row(Offers, 'offer_id')])
 def view_request_from_neighbours(request, offer_id):
-    requests = Requests.objects.filter(offer_id = offer_id)
-    serializer = RequestsSerializer(requests, many = True)
-    request_datas = []
-    for data in serializer.data:
-        user_details = Profile.objects.get(uuid=data['user_id'])
-        request_data = {}
-        request_data['id'] = data['id']
-        request_data['user_name'] = user_details.name
-        request_data['request_type'] = data['request_type']
-        request_data['title'] = data['title']
-        request_data['description'] = data['description']
-        if data['from_time']:
-            request_data['from_time'] = data['from_time']
-        if data['to_time']:
-            request_data['to_time'] = data['to_time']
-        if data['from_date']:
-            request_data['from_date'] = data['from_date']
-        if data['to_date']:
-            request_data['to_date'] = data['to_date']
-        request_data['status'] = data['status']
-        request_datas.append(request_data)
-    return Response(request_datas)
+    requests = Requests.objects.filter(offer_id = offer_id).values(*REQUEST_COLUMNS)
+    page = paginate(requests, request)
+    return paginated_response(request, format_requests(page.rows), page)
 
 @api_view(['POST'])
+@transaction.atomic
 def send_join_request(request):
     new_join_request = JoinRequestSerializer(data = request.data)
     if new_join_request.is_valid():
@@ -300,78 +374,229 @@ def send_join_request(request):
     return Response(new_join_request.errors, status = status.HTTP_400_BAD_REQUEST)
 
 @api_view(['GET'])
+@permission_classes([IsCommunityAdmin])
 def view_join_requests(request, comm_id, user_id):
-    join_requests = JoinRequest.objects.filter(comm_id= comm_id).filter(admin_id = user_id)
-    serializer = JoinRequestSerializer(join_requests, many = True)
-    profile_infos = []
-    for data in serializer.data:
-        profile_data = Profile.objects.get(uuid=data['member_id'])
-        profile_info = {}
-        profile_info['id'] = data['id']
-        profile_info['accepted'] = data['accepted']
-        profile_info['email'] = profile_data.email
-        profile_info['name'] = profile_data.name
-        profile_info['age'] = profile_data.age
-        profile_info['profession'] = profile_data.profession
-        profile_info['pno'] = profile_data.pno
-        profile_infos.append(profile_info)
-        
-    return Response(profile_infos)
+    join_requests = JoinRequest.objects.filter(comm_id= comm_id).filter(admin_id = user_id).values(*JOIN_REQUEST_COLUMNS)
+    page = paginate(join_requests, request)
+    return paginated_response(request, format_join_requests(page.rows), page)
+
+
+def _transition(machine, not_found, pk, status, expected, **kwargs):
+    """
+    Apply a status transition and turn its failures into responses. Returns
+    ``(comm_id, None)`` on success and ``(None, response)`` otherwise.
+    """
+    try:
+        pk, status = int(pk), int(status)
+        expected = int(expected) if expected not in (None, '') else None
+    except ValueError:
+        return None, Response({'error': 'Invalid id or status'}, status=400)
+    try:
+        return machine.apply(pk, status, expected, **kwargs), None
+    except machine.model.DoesNotExist:
+        return None, Response({'error': not_found}, status=404)
+    except transitions.InvalidTransition as e:
+        return None, Response({'error': str(e)}, status=400)
+    except transitions.Conflict as e:
+        return None, Response({'error': str(e), 'status': e.current}, status=409)
 
 
 @api_view(['PUT'])
+@permission_classes([member_of_row(Offers, 'offer_id')])
 def update_offer_status(request, offer_id, status):
-    try:
-        offer = Offers.objects.get(id=int(offer_id))
-        offer.status = status
-        offer.save()
-        return Response({'message': 'Status updated'}, status=200)
-    except Offers.DoesNotExist:
-        return Response({'error': 'Offer not found'}, status=404)
-    
+    comm_id, error = _transition(transitions.offer_statuses, 'Offer not found', offer_id, status,
+                                 request.query_params.get('expected'))
+    if error:
+        return error
+    invalidate_community(comm_id)
+    publish_event(comm_id, 'offer.updated', {'id': int(offer_id), 'status': int(status)})
+    return Response({'message': 'Status updated'}, status=200)
+
 
 @api_view(['PUT'])
+@permission_classes([member_of_row(Requests, 'request_id')])
 def update_request_status(request, request_id, status, offer_id):
     try:
-        request = Requests.objects.get(id=request_id)
-        offer = Offers.objects.get(pk=offer_id)
-        request.status = status
-        request.offer = offer
-        request.save()
-        return Response({'message': 'Status updated'}, status=200)
-    except Offers.DoesNotExist:
-        return Response({'error': 'Request not found'}, status=404)
-    
+        offer_id = int(offer_id)
+    except ValueError:
+        return Response({'error': 'Invalid offer id'}, status=400)
+    try:
+        comm_id, error = _transition(transitions.request_statuses, 'Request not found', request_id, status,
+                                     request.query_params.get('expected'),
+                                     guard=Exists(Offers.objects.filter(pk=offer_id)), offer_id=offer_id)
+    except transitions.GuardFailed:
+        return Response({'error': 'Offer not found'}, status=404)
+    if error:
+        return error
+    invalidate_community(comm_id)
+    publish_event(comm_id, 'request.updated', {'id': int(request_id), 'status': int(status), 'offer_id': offer_id})
+    return Response({'message': 'Status updated'}, status=200)
 
-def haversine(lat1, lon1, lat2, lon2):
-    lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
-    
-    dlat = lat2 - lat1 
-    dlon = lon2 - lon1 
-    a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-    c = 2 * asin(sqrt(a)) 
-    r = 6371 
-    return c * r
 
+def _batch_response(request, apply):
+    try:
+        results = apply(batch.get_items(request.data))
+    except batch.BatchError as e:
+        return Response({'error': str(e)}, status=400)
+    failed = sum(1 for result in results if result['code'] >= 400)
+    return Response({'succeeded': len(results) - failed, 'failed': failed, 'results': results})
 
-@api_view(['GET'])
-def get_communities(request, latitude, longtitude):
+
+def _caller_id(request):
+    # Batch items name their own communities, so they are checked per item.
+    return request.user.id if request.user.is_authenticated else None
+
+
+@api_view(['POST'])
+@permission_classes([IsCommunityMember])
+def batch_create_posts(request):
+    return _batch_response(request, lambda items: batch.create_many(SearchDocument.POST, items, _caller_id(request)))
+
+
+@api_view(['POST'])
+@permission_classes([IsCommunityMember])
+def batch_create_offers(request):
+    return _batch_response(request, lambda items: batch.create_many(SearchDocument.OFFER, items, _caller_id(request)))
+
+
+@api_view(['POST'])
+@permission_classes([IsCommunityMember])
+def batch_update_offer_status(request):
+    return _batch_response(request, lambda items: batch.update_offer_statuses(items, _caller_id(request)))
+
+
+@api_view(['POST'])
+@permission_classes([IsCommunityMember])
+def batch_update_request_status(request):
+    return _batch_response(request, lambda items: batch.update_request_statuses(items, _caller_id(request)))
+
+
+@api_view(['POST'])
+@permission_classes([IsCommunityMember])
+def batch_review_join_requests(request):
+    # With a session token, only the caller's own join requests can be reviewed.
+    return _batch_response(request, lambda items: batch.review_join_requests(items, _caller_id(request)))
+
+
+NEARBY_RADIUS_KM = 1.0
+MAX_NEARBY_RADIUS_KM = 50.0
+NEARBY_LIMIT = 100
+MAX_NEARBY_LIMIT = 500
+
+
+def nearby_params(latitude, longtitude, params):
     try:
         user_lat = float(latitude)
         user_lon = float(longtitude)
+        radius = float(params.get('radius', NEARBY_RADIUS_KM))
+        limit = int(params.get('limit', NEARBY_LIMIT))
     except ValueError:
-        return Response({"error": "Invalid latitude/longitude"}, status=400)
+        return None
+    if not (-90 <= user_lat <= 90 and -180 <= user_lon <= 180) or not radius > 0 or limit <= 0:
+        return None
+    return user_lat, user_lon, min(radius, MAX_NEARBY_RADIUS_KM), min(limit, MAX_NEARBY_LIMIT)
 
+
+def nearby_candidates(user_lat, user_lon, radius):
+    return box_candidates(*geo.bounding_box(user_lat, user_lon, radius))
+
+
+def box_candidates(min_lat, min_lon, max_lat, max_lon):
+    cells = Q()
+    for cell in geo.covering_cells(min_lat, min_lon, max_lat, max_lon):
+        cells |= Q(geohash__startswith=cell)
+    candidates = Community.objects.filter(cells, latitude__range=(min_lat, max_lat))
+    if -180 <= min_lon and max_lon <= 180:
+        candidates = candidates.filter(longtitude__range=(min_lon, max_lon))
+    return candidates
+
+
+def nearest_communities(candidates, user_lat, user_lon, radius, limit):
     nearby = []
-    for community in Community.objects.all():
-        try:
-            comm_lat = float(community.latitude)
-            comm_lon = float(community.longtitude)
-            distance = haversine(user_lat, user_lon, comm_lat, comm_lon)
-            if distance <= 1.0: 
-                nearby.append(community)
-        except ValueError:
-            continue
-
-    serializer = CommunitySerializer(nearby, many=True)
-    return Response(serializer.data)
\ No newline at end of file
+    for community in candidates:
+        distance = geo.haversine(user_lat, user_lon, community.latitude, community.longtitude)
+        if distance <= radius:
+            nearby.append((distance, community.id, community))
+    nearby = heapq.nsmallest(limit, nearby)
+
+    serializer = CommunitySerializer([community for _, _, community in nearby], many=True)
+    for data, (distance, _, _) in zip(serializer.data, nearby):
+        data['distance'] = round(distance, 3)
+    return serializer.data
+
+
+@api_view(['GET'])
+@cached_response('get_communities', communities_scope)
+def get_communities(request, latitude, longtitude):
+    params = nearby_params(latitude, longtitude, request.query_params)
+    if params is None:
+        return Response({"error": "Invalid latitude/longitude"}, status=400)
+    user_lat, user_lon, radius, limit = params
+    candidates = nearby_candidates(user_lat, user_lon, radius)
+    return Response(nearest_communities(candidates, user_lat, user_lon, radius, limit))
+
+
+MAP_CLUSTER_MAX_ZOOM = 14
+MAP_MAX_ZOOM = 22
+MAP_COMMUNITY_LIMIT = 500
+
+
+def map_box(min_lat, min_lon, max_lat, max_lon):
+    try:
+        box = [float(min_lat), float(min_lon), float(max_lat), float(max_lon)]
+    except ValueError:
+        return None
+    if not all(-90 <= lat <= 90 for lat in box[::2]) or not all(-180 <= lon <= 180 for lon in box[1::2]):
+        return None
+    if box[0] > box[2]:
+        return None
+    # A view across the antimeridian has min_lon > max_lon.
+    if box[1] > box[3]:
+        box[3] += 360.0
+    return box
+
+
+@api_view(['GET'])
+@cached_response('get_community_map', communities_scope)
+def get_community_map(request, zoom, min_lat, min_lon, max_lat, max_lon):
+    # Zoomed out, communities come as clusters per grid cell; zoomed in, one by one.
+    box = map_box(min_lat, min_lon, max_lat, max_lon)
+    try:
+        zoom = int(zoom)
+    except ValueError:
+        box = None
+    if box is None or not 0 <= zoom <= MAP_MAX_ZOOM:
+        return Response({"error": "Invalid zoom or bounding box"}, status=400)
+    if zoom > MAP_CLUSTER_MAX_ZOOM:
+        communities = box_candidates(*box).order_by('id')[:MAP_COMMUNITY_LIMIT]
+        return Response({'zoom': zoom, 'precision': None, 'clusters': [],
+                         'communities': CommunitySerializer(communities, many=True).data})
+    precision, cells = clusters.in_box(*box)
+    return Response({'zoom': zoom, 'precision': precision, 'clusters': cells, 'communities': []})
+
+@api_view(['GET'])
+@permission_classes([IsCommunityMember])
+@cached_response('search')
+def search_community(request, comm_id):
+    query = request.query_params.get('q', '').strip()
+    if not query:
+        return Response({"error": "Missing search query"}, status=400)
+    kinds = [kind for kind in request.query_params.get('kind', '').split(',') if kind]
+    unknown = set(kinds) - set(search.SOURCES)
+    if unknown:
+        return Response({"error": f"Unknown kind: {', '.join(sorted(unknown))}"}, status=400)
+    window = Offset(request)
+    rows = search.search(comm_id, query, kinds, window.offset, window.limit)
+    page = window.page(rows)
+    return paginated_response(request, format_search_results(page.rows), page)
+
+
+@api_view(['GET'])
+@permission_classes([IsCommunityMember])
+def sync_community(request, comm_id):
+    # Join requests are only included for their admin, identified by a session token.
+    admin_id = request.user.id if request.user.is_authenticated else None
+    try:
+        return Response(sync.changes(comm_id, request.query_params.get('since'), admin_id))
+    except sync.InvalidSyncToken as e:
+        return Response({"error": str(e)}, status=400)
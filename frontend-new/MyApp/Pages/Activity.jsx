@@ -139,7 +139,8 @@ const Activity = () => {
       if (!firstResponse.ok) throw new Error("First request failed");
 
       const secondResponse = await fetch(
-        `https://neighborly-jek2.onrender.com/api/update_request_status/${request_id}/${status}/${offer_id}`,
+        // Lending already accepted the request; say so, or a repeat accept conflicts.
+        `https://neighborly-jek2.onrender.com/api/update_request_status/${request_id}/${status}/${offer_id}?expected=2`,
         {
           method: "PUT",
           headers: {
@@ -29,6 +29,7 @@ export default function JoinCommunities() {
   const [referralCode, setReferralCode] = useState("");
   const [pendingCommId, setPendingCommId] = useState(null);
   const [pendingCommName, setPendingCommName] = useState("");
+  const [pendingAdminId, setPendingAdminId] = useState(null);
   const [userId, setUserId] = useState(null);
   const [uuidChecked, setUuidChecked] = useState(false); // 🔐 new state
   const mapRef = useRef(null);
@@ -60,6 +61,7 @@ export default function JoinCommunities() {
         latitude: item.latitude,
         longitude: item.longtitude,
         location: item.location,
+        adminId: item.admin_id,
       }));
 
       setCommunityData(formatted);
@@ -118,11 +120,12 @@ export default function JoinCommunities() {
     }, [])
   );
 
-  const handleSelect = async (id, name) => {
+  const handleSelect = async (id, name, adminId) => {
     try {
       await SecureStore.setItemAsync("comm_id", id);
       setPendingCommId(id);
       setPendingCommName(name);
+      setPendingAdminId(adminId);
       setReferralModalVisible(true);
     } catch (error) {
       Alert.alert("Error", "Failed to store community ID.");
@@ -137,15 +140,14 @@ export default function JoinCommunities() {
 
     try {
       const res = await fetch(
-        "https://neighborly-jek2.onrender.com/api/create_join",
+        "https://neighborly-jek2.onrender.com/api/send_join_request",
         {
           method: "POST",
           headers: { "Content-Type": "application/json" },
           body: JSON.stringify({
-            user_id: userId,
+            admin_id: pendingAdminId,
+            member_id: userId,
             comm_id: comm_id,
-            referral_code: referral_code,
-            is_admin: 0,
           }),
         }
       );
@@ -153,7 +155,10 @@ export default function JoinCommunities() {
       const result = await res.json();
 
       if (res.ok) {
-        Alert.alert("Joined!", `You’ve successfully joined ${pendingCommName}`);
+        Alert.alert(
+          "Request sent",
+          `The admin of ${pendingCommName} will review your request to join.`
+        );
         setReferralModalVisible(false);
         setReferralCode("");
         navigation.navigate("MainTabs", { screen: "Home" });
@@ -167,7 +172,7 @@ export default function JoinCommunities() {
 
   const renderItem = ({ item }) => (
     <TouchableOpacity
-      onPress={() => handleSelect(item.id, item.name)}
+      onPress={() => handleSelect(item.id, item.name, item.adminId)}
       style={styles.item}
     >
       <Text style={styles.itemText}>{item.name}</Text>
@@ -215,7 +220,9 @@ export default function JoinCommunities() {
                 latitude: community.latitude,
                 longitude: community.longitude,
               }}
-              onPress={() => handleSelect(community.id, community.name)}
+              onPress={() =>
+                handleSelect(community.id, community.name, community.adminId)
+              }
             >
               <MaterialIcons name="maps-home-work" size={36} color="#6C63FF" />
               <Callout tooltip>
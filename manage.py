@@ -22,6 +22,8 @@ def main():
 if __name__ == '__main__':
     os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'neighborly.settings')
     
-    port = os.getenv('PORT', '8000')
-    execute_from_command_line(['manage.py', 'runserver', f'0.0.0.0:{port}'])
-    main()
+    if len(sys.argv) == 1:
+        port = os.getenv('PORT', '8000')
+        execute_from_command_line(['manage.py', 'runserver', f'0.0.0.0:{port}'])
+    else:
+        main()
@@ -2,6 +2,14 @@
 ASGI config for neighborly project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+The event streams (api/stream/<comm_id>) need it:
+
+    uvicorn neighborly.asgi:application --host 0.0.0.0 --port 8000
+
+Keep it to one worker process while EVENT_BROKER is the default
+LocalBroker: event ids and replay history are per process, and a stream
+only sees writes handled by its own worker. Startup fails if
+WEB_CONCURRENCY asks for more.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
@@ -14,3 +22,7 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'neighborly.settings')
 
 application = get_asgi_application()
+
+from api.events import require_single_worker  # noqa: E402 (needs the apps loaded)
+
+require_single_worker()
@@ -18,6 +18,9 @@ import os
 load_dotenv('.env')
 database_url = os.getenv("DATABASE_URL")
 
+AUTH0_DOMAIN = os.getenv("AUTH0_DOMAIN")
+AUTH0_JWKS_TTL = int(os.getenv("AUTH0_JWKS_TTL", 600))
+
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -50,6 +53,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.security.SecurityMiddleware',
@@ -67,6 +71,8 @@ CORS_ALLOWED_ORIGINS = [
 
 CORS_ALLOW_ALL_ORIGINS = True
 
+CORS_EXPOSE_HEADERS = ['Link', 'X-Next-Cursor', 'X-Prev-Cursor']
+
 ROOT_URLCONF = 'neighborly.urls'
 
 TEMPLATES = [
@@ -98,6 +104,41 @@ DATABASES = {
 }
 
 
+# Caches
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# RESPONSE_CACHE_URL picks the backend for cached API responses:
+# locmem:// (default), file:///path/to/dir or redis://host:port/db
+
+response_cache_url = os.getenv("RESPONSE_CACHE_URL", "locmem://")
+
+if response_cache_url.startswith(("redis://", "rediss://")):
+    response_cache = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': response_cache_url,
+    }
+elif response_cache_url.startswith("file://"):
+    response_cache = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': response_cache_url[len("file://"):],
+    }
+else:
+    response_cache = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'responses',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'responses': response_cache,
+}
+
+RESPONSE_CACHE_ALIAS = 'responses'
+RESPONSE_CACHE_TIMEOUT = int(os.getenv("RESPONSE_CACHE_TIMEOUT", 300))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -140,8 +181,109 @@ STATIC_URL = 'static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
+# Request metrics (api.middleware.MetricsMiddleware, served on /metrics).
+# /metrics answers callers from METRICS_ALLOWED_IPS, or with
+# ``Authorization: Bearer $METRICS_TOKEN``; everyone else gets 403.
+
+SLOW_REQUEST_THRESHOLD_MS = int(os.getenv("SLOW_REQUEST_THRESHOLD_MS", 500))
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+METRICS_ALLOWED_IPS = [ip.strip() for ip in os.getenv("METRICS_ALLOWED_IPS", "127.0.0.1,::1").split(",") if ip.strip()]
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'api.slow_requests': {'handlers': ['console'], 'level': 'WARNING'},
+    },
+}
+
+
+# Live community events (api/stream/<comm_id>). Streams only run under the
+# ASGI server (`uvicorn neighborly.asgi:application`, see neighborly/asgi.py)
+# and check membership like the other community views. The default
+# LocalBroker only fans out within one process, so it needs a single server
+# worker handling every request; scaling out needs a cross-process broker.
+
+EVENT_BROKER = os.getenv("EVENT_BROKER", "api.events.LocalBroker")
+EVENT_HISTORY_SIZE = int(os.getenv("EVENT_HISTORY_SIZE", 1000))
+SSE_HEARTBEAT_SECONDS = int(os.getenv("SSE_HEARTBEAT_SECONDS", 15))
+SSE_RETRY_MS = 5000
+
+
+# Delta sync (api/sync/<comm_id>). Tokens older than the tombstone retention
+# get a full resync instead of a delta.
+
+SYNC_LIMIT = 500
+SYNC_OVERLAP_SECONDS = 5
+SYNC_TOMBSTONE_RETENTION_DAYS = int(os.getenv("SYNC_TOMBSTONE_RETENTION_DAYS", 30))
+
+# Batch write endpoints (api/batch/...).
+
+BATCH_MAX_ITEMS = 500
+
+
+# Session tokens issued by auth/auth0/ (see api/tokens.py). Revoked token
+# ids live in SESSION_TOKEN_REVOCATION_CACHE, or set it to "" to disable
+# revocation. The default local-memory cache only revokes a token in the
+# process that handled the logout: with more than one worker, point it at a
+# shared cache (e.g. "responses" with RESPONSE_CACHE_URL=redis://...).
+# auth/logout/ reports which one it got, and `check --deploy` warns.
+#
+# Tokens are signed with SESSION_TOKEN_SECRET, which must come from the
+# environment and differ from SECRET_KEY (committed above), or anyone with
+# the source could mint tokens. Without one the server refuses to issue or
+# verify tokens unless DEBUG is on, where a random per-process secret is
+# used. To rotate it, move the old secret to SESSION_TOKEN_SECRET_FALLBACKS
+# (comma-separated) until the tokens it signed have expired.
+
+SESSION_TOKEN_SECRET = os.getenv("SESSION_TOKEN_SECRET", "")
+SESSION_TOKEN_SECRET_FALLBACKS = [secret for secret in os.getenv("SESSION_TOKEN_SECRET_FALLBACKS", "").split(",")
+                                  if secret]
+SESSION_TOKEN_TTL = int(os.getenv("SESSION_TOKEN_TTL", 3600))
+SESSION_TOKEN_CACHE_SIZE = 10000
+SESSION_TOKEN_CACHE_TTL = 300
+SESSION_TOKEN_REVOCATION_CACHE = os.getenv("SESSION_TOKEN_REVOCATION_CACHE", "default")
+
+
+# Community membership checks (api/permissions.py). Each user's communities
+# are cached per process; create_join and join approvals invalidate them
+# here, other processes pick changes up within MEMBERSHIP_CACHE_TTL seconds.
+# Until every client sends a session token, callers without one are only
+# checked when COMMUNITY_MEMBERSHIP_REQUIRED is on.
+
+COMMUNITY_MEMBERSHIP_REQUIRED = os.getenv("COMMUNITY_MEMBERSHIP_REQUIRED", "").lower() in ("1", "true", "yes")
+MEMBERSHIP_CACHE_SIZE = 10000
+MEMBERSHIP_CACHE_TTL = 60
+
+
+# Display names and get_profile/ read profiles through a per-process cache
+# (api/profiles.py). Saving or deleting a Profile drops its entry here;
+# other processes see the change within PROFILE_CACHE_TTL seconds. Users
+# without a profile aren't cached, so one created on another worker is
+# found straight away.
+
+PROFILE_CACHE_SIZE = 10000
+PROFILE_CACHE_TTL = 300
+
+
+# OpenAPI schema written by `manage.py build_schema` and served by schema/.
+# Without the file, schema/ generates it per request when DEBUG is on.
+
+OPENAPI_SCHEMA_FILE = os.getenv("OPENAPI_SCHEMA_FILE", BASE_DIR / 'openapi.json')
+
+
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'api.authentication.SessionTokenAuthentication',
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'api.renderers.MessagePackRenderer',
+    ],
 }
 
 CORS_ALLOWED_ORIGINS = [